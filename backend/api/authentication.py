@@ -1,6 +1,7 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from backend.database import get_db
@@ -9,7 +10,7 @@ from backend.models.schemas import Token, UserCreate, User as UserSchema
 from backend.utils.auth import (
     authenticate_user, 
     create_access_token, 
-    get_password_hash, 
+    get_password_hash_async, 
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
@@ -20,24 +21,24 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     """
     Register a new user
     """
-    # Check if email already exists
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+    # Check if email or username already exists in a single query
+    # (at most two rows can match: one by email, one by username)
+    existing_users = db.query(User).filter(
+        or_(User.email == user.email, User.username == user.username)
+    ).limit(2).all()
+    if any(u.email == user.email for u in existing_users):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    
-    # Check if username already exists
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if db_user:
+    if existing_users:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+    # Create new user (bcrypt runs on the password executor, off the event loop)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         email=user.email,
         username=user.username,
@@ -55,7 +56,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     """
     Authenticate and generate JWT token
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,40 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Response, Query, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from typing import List
+from starlette.concurrency import run_in_threadpool
 import os
+import asyncio
+import time
+import hashlib
 
 from backend.database import get_db
 from backend.models.database_models import User, Prediction
 from backend.models.schemas import (
     Prediction as PredictionSchema,
-    PredictionResponse
+    PredictionResponse,
+    SimilarCase
 )
 from backend.utils.auth import get_current_active_user
 from backend.utils.image_processing import save_uploaded_image
-from backend.models.inference import analyzer
+from backend.utils.storage import storage, key_for_digest, IMMUTABLE_CACHE_CONTROL
+from backend.utils.mask_encoding import decode_mask, render_mask_png, MASK_EXT
+from backend.utils.mask_analysis import pack_boxes
+from backend.utils.embedding_index import embedding_store
+from backend.utils.http_cache import user_etag, cache_headers, is_not_modified, not_modified
+from backend.utils.medical_images import UPLOAD_EXTENSIONS
+from backend.models.analyzers import analyzer
+from backend.models.scheduler import inference_scheduler, PRIORITIES
 
 router = APIRouter()
 
 @router.post("/analyze", response_model=PredictionResponse)
 async def analyze_image(
     file: UploadFile = File(...),
+    priority: str = Form("routine"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Analyze a medical image and save the prediction
+
+    `priority` (stat, routine or bulk) decides the image's place in the inference queue.
     """
+    if priority not in PRIORITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Priority must be one of: {', '.join(PRIORITIES)}"
+        )
+    
     # Check file extension
     file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in [".jpg", ".jpeg", ".png"]:
+    if file_ext not in UPLOAD_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Only JPG, JPEG, and PNG files are supported"
+            detail="Only JPG, JPEG, PNG, TIFF, and DICOM files are supported"
         )
     
     # Save uploaded image
     try:
-        image_path = save_uploaded_image(file)
+        image_key = save_uploaded_image(file)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -43,7 +65,9 @@ async def analyze_image(
     
     # Analyze image
     try:
-        result = analyzer.analyze_image(image_path)
+        result = await inference_scheduler.analyze(
+            storage.local_path(image_key), priority=priority, user_id=current_user.id
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -55,15 +79,35 @@ async def analyze_image(
             detail=f"Error analyzing image: {str(e)}"
         )
     
+    # Artifacts are still being encoded and written (the heatmap may still be rendering); the row
+    # must only reference stored ones, so a failed write leaves the prediction without it
+    artifact_paths = {}
+    for artifact in ("segmentation", "heatmap"):
+        artifact_paths[artifact] = result.get(f"{artifact}_path")
+        if result.get(f"{artifact}_future") is not None:
+            try:
+                await asyncio.wrap_future(result[f"{artifact}_future"])
+            except Exception as e:
+                print(f"WARNING: Could not save {artifact} for {image_key}: {e}")
+                artifact_paths[artifact] = None
+    
     # Save prediction to database
+    lesion_stats = result.get("lesion_stats") or {}
     try:
         db_prediction = Prediction(
             user_id=current_user.id,
-            image_path=image_path,
+            image_path=image_key,
             prediction_result=result["prediction"],
             confidence_score=result["confidence"],
-            segmentation_path=result.get("segmentation_path"),
-            heatmap_path=result.get("heatmap_path")
+            uncertainty_score=result.get("uncertainty"),
+            mc_samples=result.get("mc_samples"),
+            classified_by=result.get("classified_by"),
+            segmentation_path=artifact_paths["segmentation"],
+            heatmap_path=artifact_paths["heatmap"],
+            lesion_count=lesion_stats.get("lesion_count"),
+            lesion_area=lesion_stats.get("lesion_area"),
+            involvement_pct=lesion_stats.get("involvement_pct"),
+            lesion_boxes=pack_boxes(lesion_stats["lesions"]) if lesion_stats else None
         )
         
         db.add(db_prediction)
@@ -75,41 +119,162 @@ async def analyze_image(
             detail=f"Error saving prediction: {str(e)}"
         )
     
-    # Convert paths to URLs
-    segmentation_url = None
-    if result.get("segmentation_path"):
-        segmentation_url = f"/static/images/segmentations/{os.path.basename(result['segmentation_path'])}"
-    
-    heatmap_url = None
-    if result.get("heatmap_path"):
-        heatmap_url = f"/static/images/heatmaps/{os.path.basename(result['heatmap_path'])}"
+    # Index the image embedding for similar-case retrieval (best effort)
+    if result.get("embedding") is not None:
+        try:
+            embedding_store.add(db_prediction.id, current_user.id, result["embedding"])
+        except Exception as e:
+            print(f"WARNING: Could not index embedding for prediction {db_prediction.id}: {e}")
     
     return {
         "prediction": result["prediction"],
         "confidence": result["confidence"],
-        "segmentation_url": segmentation_url,
-        "heatmap_url": heatmap_url
+        "uncertainty": result.get("uncertainty"),
+        "mc_samples": result.get("mc_samples"),
+        "classified_by": result.get("classified_by"),
+        "segmentation_url": db_prediction.segmentation_url,
+        "heatmap_url": db_prediction.heatmap_url,
+        "lesion_count": db_prediction.lesion_count,
+        "lesion_area": db_prediction.lesion_area,
+        "involvement_pct": db_prediction.involvement_pct,
+        "lesion_bboxes": db_prediction.lesion_bboxes
     }
 
+# Fields of the prediction schema, read straight off the ORM rows for the polled read endpoints
+PREDICTION_FIELDS = tuple(PredictionSchema.model_fields)
+# Artifact URLs depend on the storage configuration, so it is part of the cached representation
+REPRESENTATION_TAG = hashlib.sha256(repr((
+    PREDICTION_FIELDS, type(storage).__name__, getattr(storage, "url_prefix", None),
+    getattr(storage, "bucket", None), getattr(storage, "public_base_url", None)
+)).encode()).hexdigest()[:8]
+
+def cache_validators(user, *parts):
+    """
+    ETag and Last-Modified for a read of the user's predictions
+
+    With presigned artifact URLs the ETag also rolls over every half URL lifetime (and
+    there is no Last-Modified), so a 304 never keeps a client on expired links.
+    """
+    if storage.url_expires is None:
+        return user_etag(user, *parts, REPRESENTATION_TAG), user.history_updated_at
+    window = int(time.time()) // (storage.url_expires // 2)
+    return user_etag(user, *parts, REPRESENTATION_TAG, window), None
+
+def prediction_dict(prediction):
+    """
+    A prediction as PredictionSchema would serialize it, without the pydantic round trip
+    """
+    return {field: getattr(prediction, field) for field in PREDICTION_FIELDS}
+
 @router.get("/history", response_model=List[PredictionSchema])
 async def get_prediction_history(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Get prediction history for the current user
+
+    Supports conditional requests: an unchanged history answers 304 without a query.
     """
+    etag, last_modified = cache_validators(current_user, "history")
+    headers = cache_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(headers)
+    
     predictions = db.query(Prediction).filter(Prediction.user_id == current_user.id).all()
-    return predictions
+    return ORJSONResponse([prediction_dict(p) for p in predictions], headers=headers)
+
+@router.get("/scheduler")
+async def get_scheduler_stats(current_user: User = Depends(get_current_active_user)):
+    """
+    Inference queue depth and recent latency percentiles per priority, against their SLOs
+    """
+    return inference_scheduler.stats()
+
+@router.get("/cascade")
+async def get_cascade_stats(current_user: User = Depends(get_current_active_user)):
+    """
+    Triage escalation rate and agreement with the full classifier (cascaded inference)
+    """
+    return analyzer.cascade_stats()
+
+@router.get("/similar/{prediction_id}", response_model=List[SimilarCase])
+async def get_similar_cases(
+    prediction_id: int,
+    k: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the current user's prior predictions whose images are most similar to this one
+    """
+    prediction = db.query(Prediction).filter(
+        Prediction.id == prediction_id,
+        Prediction.user_id == current_user.id
+    ).first()
+    
+    if prediction is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Prediction not found"
+        )
+    
+    query = embedding_store.vector(prediction_id)
+    if query is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No embedding stored for this prediction"
+        )
+    
+    # Matrix search is CPU-bound; keep it off the event loop
+    matches = await run_in_threadpool(
+        embedding_store.search, query, k, user_id=current_user.id, exclude_ids=[prediction_id]
+    )
+    scores = dict(matches)
+    similar = db.query(Prediction).filter(Prediction.id.in_(list(scores))).all()
+    similar.sort(key=lambda p: scores[p.id], reverse=True)
+    return [{"score": scores[p.id], "prediction": p} for p in similar]
+
+@router.get("/masks/{digest}.png")
+async def render_segmentation_mask(digest: str, overlay: bool = False):
+    """
+    Render a stored segmentation mask as PNG (grayscale, or a transparent overlay)
+    """
+    # Masks are content-addressed; the digest is the only way to reach one
+    if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Mask not found"
+        )
+    
+    try:
+        data = storage.get(key_for_digest("segmentations", digest, MASK_EXT))
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Mask not found"
+        )
+    
+    mask, _ = decode_mask(data)
+    return Response(
+        content=render_mask_png(mask, overlay=overlay),
+        media_type="image/png",
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    )
 
 @router.get("/{prediction_id}", response_model=PredictionSchema)
 async def get_prediction(
     prediction_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Get a specific prediction
+    Get a specific prediction (conditional requests supported, like /history)
+
+    The row is looked up first, so validators (including If-None-Match: *) never
+    answer 304 for an id that doesn't exist or belongs to another user.
     """
     prediction = db.query(Prediction).filter(
         Prediction.id == prediction_id,
@@ -122,4 +287,9 @@ async def get_prediction(
             detail="Prediction not found"
         )
     
-    return prediction 
\ No newline at end of file
+    etag, last_modified = cache_validators(current_user, "prediction", prediction_id)
+    headers = cache_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(headers)
+    
+    return ORJSONResponse(prediction_dict(prediction), headers=headers)
\ No newline at end of file
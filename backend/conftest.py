@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .main import app
+from .database import Base, get_db
+
+@pytest.fixture
+def temp_db(tmp_path):
+    """
+    Session factory for a fresh SQLite database, which the API uses for the test's duration
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+    app.dependency_overrides[get_db] = override_get_db
+    yield Session
+    app.dependency_overrides.pop(get_db, None)
+    engine.dispose()
@@ -0,0 +1,82 @@
+import os
+import argparse
+import torch
+from torchvision import transforms, datasets
+
+from backend.models.classification_model import load_model
+from backend.utils.shards import shards_exist, ShardDataset, normalize_batch
+from backend.utils.metrics import ConfusionMatrix
+from backend.utils.precision import precision as default_precision
+from backend.utils.distributed import all_reduce_sum
+
+def run_evaluation(model, loader, device, num_classes, criterion=None, normalize=False, precision=None):
+    """
+    Run a model over a loader, returns (mean loss or None, ConfusionMatrix)
+
+    Everything is accumulated on device; the only host sync is the final loss.
+    Under torchrun the loss and confusion matrix are summed across ranks.
+    Set normalize=True when the loader yields uint8 batches (memmap shards).
+    """
+    precision = precision or default_precision
+    model.eval()
+    metrics = ConfusionMatrix(num_classes, device)
+    loss_sum = torch.zeros((), device=device)
+
+    with torch.inference_mode():
+        for inputs, labels in loader:
+            inputs, labels = inputs.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+            if normalize:
+                inputs = normalize_batch(inputs)
+            inputs = precision.prepare_input(inputs)
+
+            with precision.autocast(device):
+                outputs = model(inputs)
+                if criterion is not None:
+                    loss_sum += criterion(outputs, labels).float()
+            metrics.update(outputs.argmax(dim=1), labels)
+
+    # Combine per-rank results when running under torchrun
+    metrics.reduce()
+    num_batches = all_reduce_sum(torch.tensor(float(len(loader)), device=device))
+    mean_loss = (all_reduce_sum(loss_sum) / num_batches.clamp(min=1)).item() if criterion is not None else None
+    return mean_loss, metrics
+
+def main():
+    # Defaults come from the training configuration
+    from backend.train import CONFIG, make_loader
+
+    parser = argparse.ArgumentParser(description="Evaluate a trained classifier on a labelled dataset")
+    parser.add_argument("--weights", default=CONFIG["classifier"]["model_save_path"],
+                        help="Path to classifier weights")
+    parser.add_argument("--data-dir", default=CONFIG["data"]["val_dir"],
+                        help="ImageFolder-style directory, or a shard directory from --prepare-data")
+    parser.add_argument("--batch-size", type=int, default=CONFIG["classifier"]["batch_size"])
+    args = parser.parse_args()
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    num_classes = CONFIG["classifier"]["num_classes"]
+
+    use_shards = shards_exist(args.data_dir)
+    if use_shards:
+        dataset = ShardDataset(args.data_dir)
+    else:
+        dataset = datasets.ImageFolder(args.data_dir, transform=transforms.Compose([
+            transforms.Resize((224, 224)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        ]))
+    loader = make_loader(dataset, device, batch_size=args.batch_size)
+
+    model = default_precision.prepare_model(load_model(args.weights, device, num_classes=num_classes).to(device))
+    _, metrics = run_evaluation(model, loader, device, num_classes, normalize=use_shards)
+    results = metrics.compute_host()
+
+    print(f"Evaluated {len(dataset)} images from {args.data_dir} with {os.path.basename(args.weights)}")
+    print(f"Accuracy: {results['accuracy']:.4f}, Precision: {results['precision']:.4f}, "
+          f"Recall: {results['recall']:.4f}, F1: {results['f1']:.4f}")
+    print("Confusion matrix (rows = true, columns = predicted):")
+    for row in metrics.matrix.cpu().tolist():
+        print("  " + " ".join(f"{v:8d}" for v in row))
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,31 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 import uvicorn
 import os
 
+from backend.utils.runtime import runtime
+
+# Size (and optionally pin) this worker's threads before anything, model loading included, starts them
+runtime.apply()
+
 from backend.api import authentication, predictions, users
 from backend.database import engine, Base
+from backend.models.database_models import User, migrate_schema
+from backend.utils.auth import password_executor, get_current_active_user
+from backend.utils.storage import ImmutableStaticFiles
+from backend.utils.compression import CompressionMiddleware
+from backend.utils.artifact_writer import artifact_writer
+from backend.utils.retention import retention, RETENTION_INTERVAL
+from backend.models.scheduler import inference_scheduler, preprocess_executor
+from backend.models.analyzers import analyzer
 
-# Create database tables
+# Create database tables, and add columns introduced since an existing database was created
 Base.metadata.create_all(bind=engine)
+migrate_schema(engine)
 
-app = FastAPI(title="Medical Image Analysis API")
+# orjson renders responses several times faster than the standard json module
+app = FastAPI(title="Medical Image Analysis API", default_response_class=ORJSONResponse)
 
 # Configure CORS
 # In production, replace with specific origins of your frontend application
@@ -25,19 +40,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified"],
 )
 
+# gzip/brotli for JSON responses (large prediction histories)
+app.add_middleware(CompressionMiddleware)
+
 # Include API routers
 app.include_router(authentication.router, tags=["Authentication"], prefix="/api")
 app.include_router(users.router, tags=["Users"], prefix="/api/users")
 app.include_router(predictions.router, tags=["Predictions"], prefix="/api/predictions")
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="backend/public"), name="static")
+# Mount static files (artifacts are content-addressed, so they are served as immutable)
+os.makedirs(os.path.join("backend", "public", "images"), exist_ok=True)
+app.mount("/static", ImmutableStaticFiles(directory="backend/public"), name="static")
+
+@app.on_event("startup")
+def start_retention():
+    if RETENTION_INTERVAL > 0:
+        retention.start(RETENTION_INTERVAL)
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    retention.stop()
+    password_executor.shutdown(wait=True)
+    inference_scheduler.shutdown()  # Finish queued analyses before flushing their artifacts
+    preprocess_executor.shutdown(wait=True)
+    artifact_writer.shutdown()  # Flush queued heatmap/mask writes before exiting
 
 @app.get("/", tags=["Root"])
 async def root():
     return {"message": "Welcome to the Medical Image Analysis API"}
 
+@app.get("/metrics", tags=["Root"])
+async def metrics(current_user: User = Depends(get_current_active_user)):
+    # Per worker process: each one reports its own threads, affinity and queues.
+    # Authenticated like /api/predictions/scheduler: it exposes process and deployment details
+    return {
+        "runtime": runtime.describe(),
+        "scheduler": inference_scheduler.stats(),
+        "cascade": analyzer.cascade_stats(),
+        "models": analyzer.residency_stats(),
+        "retention": retention.stats()
+    }
+
 if __name__ == "__main__":
     uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
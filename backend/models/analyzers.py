@@ -0,0 +1,112 @@
+import os
+import time
+import hashlib
+from types import SimpleNamespace
+from typing import Protocol, runtime_checkable
+
+import numpy as np
+
+# Analyzer behind the API, the inference scheduler and batch scoring:
+# "torch" loads the ResNet-50/UNet models (backend.models.inference); "stub" answers
+# deterministically after a fake delay without torch models, so the API layer (FastAPI,
+# auth, database, file I/O) can be load-tested on its own
+ANALYZER_BACKEND = os.getenv("ANALYZER_BACKEND", "torch")
+STUB_CALL_MS = float(os.getenv("STUB_CALL_MS", "40"))  # Fake cost per analyze_batch call
+STUB_IMAGE_MS = float(os.getenv("STUB_IMAGE_MS", "25"))  # Plus this per image
+STUB_POSITIVE_RATE = float(os.getenv("STUB_POSITIVE_RATE", "0.3"))
+
+ANALYZER_BACKENDS = ("torch", "stub")
+
+@runtime_checkable
+class Analyzer(Protocol):
+    """
+    What the API, the scheduler and batch scoring need from an analyzer backend;
+    inference.MedicalImageAnalyzer and StubAnalyzer both conform
+
+    analyze_batch() takes prepared images (N, 3, 224, 224) and their paths and returns
+    one dict per image with prediction, confidence, uncertainty, mc_samples,
+    classified_by, embedding (or None), segmentation_path, heatmap_path and
+    lesion_stats (None unless segmented; see mask_analysis.quantify_lesions), plus
+    segmentation_future / heatmap_future for artifacts still being written.
+    """
+    device: object  # Has .type ("cpu" or "cuda"), like torch.device
+
+    def analyze_batch(self, img_tensor, image_paths, segment=True, gradcam=True): ...
+
+    def model_version(self): ...
+
+    def cascade_stats(self): ...
+
+    def residency_stats(self): ...
+
+class StubAnalyzer:
+    """
+    Deterministic fake analyzer: results are a function of the image path alone
+
+    Uploads are stored under content-addressed keys, so the same image always gets the
+    same answer. Sleeps call_ms + image_ms per image instead of computing (the sleep
+    releases the GIL, like the real models do), writes no artifacts.
+    """
+    device = SimpleNamespace(type="cpu")
+
+    def __init__(self, call_ms=STUB_CALL_MS, image_ms=STUB_IMAGE_MS, positive_rate=STUB_POSITIVE_RATE,
+                 class_labels=("Normal", "Pneumonia"), embedding_dim=2048):
+        self.call_ms = call_ms
+        self.image_ms = image_ms
+        self.positive_rate = positive_rate
+        self.class_labels = class_labels
+        self.embedding_dim = embedding_dim
+
+    def analyze_batch(self, img_tensor, image_paths, segment=True, gradcam=True):
+        time.sleep((self.call_ms + self.image_ms * len(image_paths)) / 1000)
+        return [self._result(path, segment) for path in image_paths]
+
+    def _result(self, image_path, segment):
+        digest = hashlib.sha256(os.path.basename(str(image_path)).encode()).digest()
+        positive = digest[0] < 256 * self.positive_rate
+        rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+        lesion_stats = None
+        if positive and segment:
+            x, y = (int(v) for v in rng.integers(0, 160, size=2))
+            area = int(rng.integers(50, 2000))
+            lesion_stats = {
+                "lesion_count": 1,
+                "lesion_area": area,
+                "involvement_pct": 100.0 * area / (224 * 224),
+                "lesions": [{"bbox": [x, y, 48, 48], "area": area, "centroid": [x + 24.0, y + 24.0]}]
+            }
+        return {
+            "prediction": self.class_labels[1 if positive else 0],
+            "confidence": 0.5 + digest[1] / 512,
+            "uncertainty": digest[2] / 25600,
+            "mc_samples": 8,
+            "classified_by": "stub",
+            "embedding": rng.standard_normal(self.embedding_dim).astype(np.float16),
+            "segmentation_path": None,
+            "heatmap_path": None,
+            "lesion_stats": lesion_stats
+        }
+
+    def model_version(self):
+        return "stub"
+
+    def cascade_stats(self):
+        return {"enabled": False}
+
+    def residency_stats(self):
+        return {"models": {}}
+
+def create_analyzer(backend=ANALYZER_BACKEND):
+    """
+    Build the configured analyzer (the torch one loads its models here)
+    """
+    if backend == "stub":
+        print(f"INFO: Using the stub analyzer ({STUB_CALL_MS} ms per call + {STUB_IMAGE_MS} ms per image)")
+        return StubAnalyzer()
+    if backend == "torch":
+        from backend.models.inference import MedicalImageAnalyzer
+        return MedicalImageAnalyzer()
+    raise ValueError(f"Unknown analyzer backend '{backend}'. Use one of {ANALYZER_BACKENDS}.")
+
+# Create a singleton instance
+analyzer = create_analyzer()
@@ -3,6 +3,28 @@ import torch.nn as nn
 import torch.nn.functional as F
 import torchvision.models as models
 
+def tta_views(x, flip=False, angles=()):
+    """
+    Stack test-time augmented views of a batch: (V * N, C, H, W), view-major
+
+    Views are the original, optionally its horizontal flip, and one small rotation
+    per angle (degrees). Rotations fill the corners with zeros, i.e. the mean
+    intensity after normalization.
+    """
+    views = [x]
+    if flip:
+        views.append(torch.flip(x, dims=[3]))
+    for angle in angles:
+        radians = torch.tensor(angle * torch.pi / 180)
+        cos, sin = torch.cos(radians).item(), torch.sin(radians).item()
+        theta = torch.tensor([[cos, -sin, 0.0], [sin, cos, 0.0]], device=x.device).expand(x.shape[0], 2, 3)
+        grid = F.affine_grid(theta, list(x.shape), align_corners=False)
+        views.append(F.grid_sample(x.float(), grid, align_corners=False).to(x.dtype))
+    stacked = torch.cat(views)
+    if x.is_contiguous(memory_format=torch.channels_last) and not x.is_contiguous():
+        stacked = stacked.contiguous(memory_format=torch.channels_last)
+    return stacked, len(views)
+
 class MedicalImageClassifier(nn.Module):
     def __init__(self, num_classes=2, pretrained=True):
         super(MedicalImageClassifier, self).__init__()
@@ -20,33 +42,128 @@ class MedicalImageClassifier(nn.Module):
     def forward(self, x):
         return self.resnet(x)
     
-    def monte_carlo_inference(self, x, num_samples=10):
+    def features(self, x):
+        """
+        Pooled backbone features, i.e. the input of the (dropout) head
+        """
+        r = self.resnet
+        x = r.maxpool(r.relu(r.bn1(r.conv1(x))))
+        x = r.layer4(r.layer3(r.layer2(r.layer1(x))))
+        return torch.flatten(r.avgpool(x), 1)
+    
+    def sample_head(self, features, num_samples):
+        """
+        Class probabilities for `num_samples` dropout masks of the head, shape (S, N, C)
+        """
+        # Dropout is applied functionally instead of switching the head to train mode,
+        # so Grad-CAM or another inference thread sharing the model never sees it
+        logits = features.unsqueeze(0).expand(num_samples, *features.shape).reshape(-1, features.shape[1])
+        for layer in self.resnet.fc:
+            logits = F.dropout(logits, layer.p, training=True) if isinstance(layer, nn.Dropout) else layer(logits)
+        return F.softmax(logits.float(), dim=1).view(num_samples, features.shape[0], -1)
+    
+    def sample_views(self, features, num_views, num_samples):
+        """
+        Head samples for view-major features (V * N, D), pooled per image: (S * V, N, C)
+        """
+        probs = self.sample_head(features, num_samples)
+        return probs.view(num_samples * num_views, features.shape[0] // num_views, -1)
+    
+    def monte_carlo_inference(self, x, num_samples=10, flip=False, angles=(), return_features=False):
         """
         Perform Monte Carlo dropout inference for uncertainty estimation
+
+        Dropout only sits in the head, so the backbone runs once and all samples
+        share its features; the samples are one batched pass through the head.
+        With test-time augmentation (flip/angles) the views go through the backbone
+        as one batch, and every view's head samples join one predictive distribution.
+        return_features=True also returns the pooled features of the original view.
         """
-        self.train()  # Enable dropout
-        
-        outputs = []
-        for _ in range(num_samples):
-            with torch.no_grad():
-                output = self.forward(x)
-                outputs.append(F.softmax(output, dim=1))
-        
-        # Stack outputs to calculate mean and variance
-        outputs = torch.stack(outputs)
-        mean_output = outputs.mean(dim=0)
-        var_output = outputs.var(dim=0)
+        self.eval()
+        with torch.inference_mode():
+            views, num_views = tta_views(x, flip, angles)
+            features = self.features(views)
+            outputs = self.sample_views(features, num_views, num_samples)
         
-        # Switch back to eval mode
+        # Calculate mean and variance over the samples
+        if return_features:
+            return outputs.mean(dim=0), outputs.var(dim=0), features[:x.shape[0]].float()
+        return outputs.mean(dim=0), outputs.var(dim=0)
+    
+    def adaptive_monte_carlo_inference(self, x, min_samples=8, max_samples=32, step=4, tolerance=0.01,
+                                       flip=False, angles=(), return_features=False):
+        """
+        Monte Carlo dropout that stops sampling each image once its estimate converges
+
+        Draws `min_samples` in two halves, so an image whose estimate already agrees
+        between them stops at `min_samples`. Images whose predicted-class mean or
+        standard deviation still moved by more than `tolerance` in the last round get
+        `step` more at a time, up to `max_samples`. Returns (mean, variance, samples
+        used) per image, plus the original view's features with return_features.
+        Sample counts are per view when TTA is on.
+        """
         self.eval()
+        with torch.inference_mode():
+            views, num_views = tta_views(x, flip, angles)
+            features = self.features(views)
+            n = x.shape[0]
+            features = features.view(num_views, n, -1)
+            total = torch.zeros(n, self.resnet.fc[-1].out_features, dtype=torch.float64, device=features.device)
+            total_sq = torch.zeros_like(total)
+            counts = torch.zeros(n, dtype=torch.int64, device=features.device)
+            active = torch.arange(n, device=features.device)
+            previous = None
+            first = min(min_samples, max_samples)
+            rounds = iter([first // 2, first - first // 2] if first > 1 else [first])
+            num_samples = next(rounds)
+            
+            while active.numel() > 0:
+                active_features = features[:, active].reshape(num_views * active.numel(), -1)
+                probs = self.sample_views(active_features, num_views, num_samples).double()
+                total[active] += probs.sum(dim=0)
+                total_sq[active] += (probs ** 2).sum(dim=0)
+                counts[active] += num_samples
+                
+                # Running mean and std of the predicted-class probability
+                c = counts[active].unsqueeze(1).double() * num_views
+                mean = total[active] / c
+                var = ((total_sq[active] - c * mean ** 2) / (c - 1).clamp(min=1)).clamp(min=0)
+                pred = mean.argmax(dim=1, keepdim=True)
+                current = torch.stack([mean.gather(1, pred).squeeze(1), var.gather(1, pred).sqrt().squeeze(1)])
+                
+                done = counts[active] >= max_samples
+                if previous is not None:
+                    done |= ((current - previous).abs() < tolerance).all(dim=0)
+                active, previous = active[~done], current[:, ~done]
+                num_samples = next(rounds, step)
         
-        return mean_output, var_output
+        c = counts.unsqueeze(1).double() * num_views
+        mean = total / c
+        var = ((total_sq - c * mean ** 2) / (c - 1).clamp(min=1)).clamp(min=0)
+        if return_features:
+            return mean.float(), var.float(), counts, features[0].float()
+        return mean.float(), var.float(), counts
     
-    def predict_with_uncertainty(self, x, num_samples=10):
+    def predict_with_uncertainty(self, x, num_samples=10, adaptive=False, min_samples=8, max_samples=32,
+                                 tolerance=0.01, flip=False, angles=(), return_features=False):
         """
-        Get predictions with uncertainty estimates
+        Get predictions with uncertainty estimates and the number of MC samples used
+
+        Draws `num_samples` per image, or with adaptive=True between `min_samples` and
+        `max_samples` depending on convergence (see adaptive_monte_carlo_inference).
+        flip/angles enable test-time augmentation (see tta_views). return_features=True
+        also returns the pooled backbone features (the image embedding).
         """
-        mean_probs, var_probs = self.monte_carlo_inference(x, num_samples)
+        if adaptive:
+            mean_probs, var_probs, samples, features = self.adaptive_monte_carlo_inference(
+                x, min_samples=min_samples, max_samples=max_samples, tolerance=tolerance,
+                flip=flip, angles=angles, return_features=True
+            )
+        else:
+            mean_probs, var_probs, features = self.monte_carlo_inference(
+                x, num_samples, flip=flip, angles=angles, return_features=True
+            )
+            samples = torch.full((mean_probs.shape[0],), num_samples, dtype=torch.int64)
         
         # Get predicted class
         pred_class = torch.argmax(mean_probs, dim=1)
@@ -57,7 +174,9 @@ class MedicalImageClassifier(nn.Module):
         # Get uncertainty (variance of predicted class)
         uncertainty = var_probs.gather(1, pred_class.unsqueeze(1)).squeeze(1)
         
-        return pred_class, confidence, uncertainty
+        if return_features:
+            return pred_class, confidence, uncertainty, samples, features
+        return pred_class, confidence, uncertainty, samples
     
     def get_gradcam_layer(self):
         """
@@ -65,9 +184,82 @@ class MedicalImageClassifier(nn.Module):
         """
         return "resnet.layer4.2"
 
+# Backbones for the first-stage (triage) classifier of cascaded inference
+TRIAGE_ARCHS = ("mobilenet_v3_small", "resnet18")
+
+class TriageClassifier(nn.Module):
+    """
+    Small, fast classifier that settles confident cases before the full model runs
+
+    MobileNetV3-Small costs ~6 ms per image on one CPU core against ~137 ms for the
+    ResNet-50 forward pass (before MC dropout and Grad-CAM). Trained with
+    distillation from MedicalImageClassifier (see train.py).
+    """
+    def __init__(self, num_classes=2, pretrained=True, arch="mobilenet_v3_small"):
+        super(TriageClassifier, self).__init__()
+        if arch not in TRIAGE_ARCHS:
+            raise ValueError(f"Unknown triage architecture '{arch}'. Use one of: {', '.join(TRIAGE_ARCHS)}.")
+        self.arch = arch
+        
+        if arch == "mobilenet_v3_small":
+            self.backbone = models.mobilenet_v3_small(weights='IMAGENET1K_V1' if pretrained else None)
+            in_features = self.backbone.classifier[-1].in_features
+            self.backbone.classifier[-1] = nn.Linear(in_features, num_classes)
+        else:
+            self.backbone = models.resnet18(weights='IMAGENET1K_V1' if pretrained else None)
+            self.backbone.fc = nn.Linear(self.backbone.fc.in_features, num_classes)
+    
+    def forward(self, x):
+        return self.backbone(x)
+    
+    def predict(self, x):
+        """
+        Class probabilities (N, C) from a single deterministic forward pass
+        """
+        self.eval()
+        with torch.inference_mode():
+            return F.softmax(self(x).float(), dim=1)
+    
+    def get_gradcam_layer(self):
+        """
+        Return the layer name to use for Grad-CAM
+        """
+        return "backbone.features.12" if self.arch == "mobilenet_v3_small" else "backbone.layer4.1"
+
+class DistillationLoss(nn.Module):
+    """
+    Cross-entropy on the labels plus KL divergence to the teacher's softened outputs
+
+    The KL term is scaled by temperature^2 so its gradients stay comparable to the
+    cross-entropy term as the temperature changes (Hinton et al., 2015). Without
+    teacher logits this is plain cross-entropy.
+    """
+    def __init__(self, temperature=4.0, alpha=0.7):
+        super(DistillationLoss, self).__init__()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def forward(self, student_logits, labels, teacher_logits=None):
+        student_logits = student_logits.float()
+        hard = F.cross_entropy(student_logits, labels)
+        if teacher_logits is None:
+            return hard
+        soft = F.kl_div(
+            F.log_softmax(student_logits / self.temperature, dim=1),
+            F.softmax(teacher_logits.float() / self.temperature, dim=1),
+            reduction="batchmean"
+        ) * self.temperature ** 2
+        return (1 - self.alpha) * hard + self.alpha * soft
+
 # Function to load trained model
 def load_model(model_path, device, num_classes=2):
     model = MedicalImageClassifier(num_classes=num_classes)
     model.load_state_dict(torch.load(model_path, map_location=device))
     model.eval()
+    return model
+
+def load_triage_model(model_path, device, num_classes=2, arch="mobilenet_v3_small"):
+    model = TriageClassifier(num_classes=num_classes, pretrained=False, arch=arch)
+    model.load_state_dict(torch.load(model_path, map_location=device))
+    model.eval()
     return model 
\ No newline at end of file
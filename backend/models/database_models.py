@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, LargeBinary, event, update, inspect, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import os
 
 from backend.database import Base
+from backend.utils.storage import storage
+from backend.utils.mask_encoding import MASK_EXT
+from backend.utils.mask_analysis import unpack_boxes
 
 class User(Base):
     __tablename__ = "users"
@@ -13,6 +17,9 @@ class User(Base):
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped whenever one of the user's predictions changes; validates cached reads (ETag / Last-Modified)
+    history_version = Column(Integer, default=0, server_default="0", nullable=False)
+    history_updated_at = Column(DateTime, nullable=True)
     
     predictions = relationship("Prediction", back_populates="user")
 
@@ -21,11 +28,95 @@ class Prediction(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    image_path = Column(String)
+    # Artifact keys are indexed for retention, which looks rows up by key (see utils.retention)
+    image_path = Column(String, index=True)
     prediction_result = Column(String)
     confidence_score = Column(Float)
-    segmentation_path = Column(String, nullable=True)
-    heatmap_path = Column(String, nullable=True)
+    # MC dropout variance of the predicted class and the number of samples it took
+    uncertainty_score = Column(Float, nullable=True)
+    mc_samples = Column(Integer, nullable=True)
+    # Model that made the call under cascaded inference: "triage" or "full"
+    classified_by = Column(String, nullable=True)
+    segmentation_path = Column(String, nullable=True, index=True)
+    heatmap_path = Column(String, nullable=True, index=True)
+    # Lesion quantification from the segmentation mask (null when not segmented)
+    lesion_count = Column(Integer, nullable=True, index=True)
+    lesion_area = Column(Integer, nullable=True)  # Pixels at mask resolution
+    involvement_pct = Column(Float, nullable=True, index=True)
+    lesion_boxes = Column(LargeBinary, nullable=True)  # Packed uint16 (x, y, w, h) rows
     created_at = Column(DateTime, default=datetime.utcnow)
     
-    user = relationship("User", back_populates="predictions") 
\ No newline at end of file
+    user = relationship("User", back_populates="predictions")
+    
+    # Artifact columns hold storage keys; URLs depend on the configured backend
+    @property
+    def image_url(self):
+        return storage.url(self.image_path) if self.image_path else None
+    
+    @property
+    def segmentation_url(self):
+        if not self.segmentation_path:
+            return None
+        if self.segmentation_path.endswith(MASK_EXT):
+            # Compact masks are rendered to PNG by the API on request
+            digest = os.path.basename(self.segmentation_path)[:-len(MASK_EXT)]
+            return f"/api/predictions/masks/{digest}.png"
+        return storage.url(self.segmentation_path)
+    
+    @property
+    def lesion_bboxes(self):
+        return unpack_boxes(self.lesion_boxes) if self.lesion_boxes is not None else None
+    
+    @property
+    def heatmap_url(self):
+        return storage.url(self.heatmap_path) if self.heatmap_path else None 
+
+def _bump_history_version(mapper, connection, target):
+    # Runs in the flush's transaction, as one atomic UPDATE, so concurrent workers can't lose a bump.
+    # Bulk query.update()/delete() skip mapper events and must call bump_history_versions themselves.
+    bump_history_versions(connection, [target.user_id])
+
+def bump_history_versions(connection, user_ids):
+    """
+    Invalidate the cached prediction reads of the given users
+    """
+    connection.execute(
+        update(User)
+        .where(User.id.in_(set(user_ids)))
+        .values(history_version=User.history_version + 1, history_updated_at=datetime.utcnow())
+    )
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(Prediction, _event, _bump_history_version)
+
+# Columns added after tables were first created. create_all() only creates missing tables,
+# so migrate_schema() adds these to existing databases at startup.
+ADDED_COLUMNS = [
+    Prediction.uncertainty_score, Prediction.mc_samples, Prediction.classified_by,
+    Prediction.lesion_count, Prediction.lesion_area, Prediction.involvement_pct, Prediction.lesion_boxes,
+    User.history_version, User.history_updated_at
+]
+
+def migrate_schema(engine):
+    """
+    Add ADDED_COLUMNS and indexes missing from existing tables; safe to run on every startup
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for attribute in ADDED_COLUMNS:
+            column = attribute.property.columns[0]
+            table = column.table.name
+            if not inspector.has_table(table):
+                continue  # create_all() creates it complete
+            if column.name in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            ddl = f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            connection.execute(text(ddl))
+            print(f"INFO: Added column {table}.{column.name}")
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -1,17 +1,34 @@
 import os
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import torch
 import numpy as np
+import cv2
 import boto3
 from botocore.exceptions import ClientError
 
-from backend.models.classification_model import MedicalImageClassifier, load_model as load_classifier
-from backend.models.segmentation_model import load_model as load_segmenter
+from backend.models.classification_model import (
+    MedicalImageClassifier,
+    load_model as load_classifier,
+    load_triage_model
+)
+from backend.models.segmentation_model import UNet, load_model as load_segmenter
+from backend.models.residency import ModelResidency
 from backend.utils.image_processing import (
     prepare_image, 
     generate_gradcam,
+    render_heatmap,
     save_heatmap,
     save_segmentation
 )
+from backend.utils.artifact_writer import artifact_writer
+from backend.utils.mask_analysis import quantify_lesions
+from backend.utils.medical_images import is_medical_image, load_frame
+from backend.utils.precision import precision as default_precision
+from backend.utils.runtime import runtime
 
 # Load models on startup
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -19,10 +36,61 @@ device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 # Define class labels (customize based on your dataset)
 CLASS_LABELS = ["Normal", "Pneumonia"]
 
+# Monte Carlo dropout: "fixed" always draws MC_SAMPLES; "adaptive" stops an image at
+# MC_MIN_SAMPLES when both halves of them agree within MC_TOLERANCE, and adds more until its
+# estimate moves less than that otherwise (up to MC_MAX_SAMPLES)
+MC_SAMPLING = os.getenv("MC_SAMPLING", "fixed")
+MC_SAMPLES = int(os.getenv("MC_SAMPLES", "10"))
+MC_MIN_SAMPLES = int(os.getenv("MC_MIN_SAMPLES", "8"))
+MC_MAX_SAMPLES = int(os.getenv("MC_MAX_SAMPLES", "32"))
+MC_TOLERANCE = float(os.getenv("MC_TOLERANCE", "0.01"))
+
+# Test-time augmentation: horizontal flip and small rotations (comma-separated degrees, e.g. "-5,5")
+TTA_FLIP = os.getenv("TTA_FLIP", "false").lower() in ("1", "true", "yes")
+TTA_ANGLES = tuple(float(a) for a in os.getenv("TTA_ANGLES", "").split(",") if a.strip())
+
+# Segmentation: "resize" segments the 224x224 model input, the scale of weights trained with
+# --segmenter-input resize; "tiled" runs the UNet over overlapping full-resolution tiles of the
+# original image, the scale of crop-trained weights (train.py's default). Tiling runs on the
+# request path and costs tens of tiles per large film, so it stays opt-in.
+SEGMENTATION_MODE = os.getenv("SEGMENTATION_MODE", "resize")
+SEGMENTATION_TILE_SIZE = int(os.getenv("SEGMENTATION_TILE_SIZE", "512"))
+SEGMENTATION_TILE_STRIDE = int(os.getenv("SEGMENTATION_TILE_STRIDE", "384"))
+SEGMENTATION_TILE_BATCH = int(os.getenv("SEGMENTATION_TILE_BATCH", "4"))
+
+# Cascaded inference: a small triage model classifies first and settles confident cases of
+# CASCADE_ACCEPT_CLASSES on its own (no MC dropout); the rest escalate to the full model.
+# CASCADE_AUDIT_RATE of the settled cases also run the full model to measure agreement.
+CASCADE = os.getenv("CASCADE", "false").lower() in ("1", "true", "yes")
+CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.95"))
+CASCADE_ACCEPT_CLASSES = tuple(c.strip() for c in os.getenv("CASCADE_ACCEPT_CLASSES", "Normal").split(",") if c.strip())
+CASCADE_AUDIT_RATE = float(os.getenv("CASCADE_AUDIT_RATE", "0.05"))
+TRIAGE_ARCH = os.getenv("TRIAGE_ARCH", "mobilenet_v3_small")
+
+# Pipeline: "serial" runs classification, segmentation and Grad-CAM one after the other.
+# "concurrent" starts segmentation speculatively on its own executor while classification runs
+# (cancelled, or its result dropped, when no image comes back positive) and renders Grad-CAM on
+# the artifact writer while the result is handed back. Either way artifacts are written in the
+# background: results carry a "segmentation_future" and a "heatmap_future" to check before the
+# paths are persisted.
+INFERENCE_PIPELINE = os.getenv("INFERENCE_PIPELINE", "serial")
+# Intra-op threads for the segmentation executor (default: a quarter of the inference budget,
+# see backend.utils.runtime); classification keeps the rest while both run
+SEGMENTATION_THREADS = int(os.getenv(
+    "SEGMENTATION_THREADS", str(max(1, runtime.plan["inference_threads"] // 4))
+))
+# Largest batch segmented speculatively; bigger (bulk) batches are segmented after classifying.
+# 0 turns speculation off, the default when no cores are left over for it (a started speculation
+# can't be stopped, so without spare cores it slows negatives down).
+SPECULATIVE_MAX_BATCH = int(os.getenv(
+    "SPECULATIVE_MAX_BATCH", "4" if runtime.plan["inference_threads"] > SEGMENTATION_THREADS else "0"
+))
+
 # S3 Configuration from environment variables
 S3_MODEL_BUCKET = os.getenv("S3_MODEL_BUCKET")
 S3_CLASSIFIER_KEY = os.getenv("S3_CLASSIFIER_KEY", "classifier.pth") # Default key in bucket
 S3_SEGMENTER_KEY = os.getenv("S3_SEGMENTER_KEY", "segmenter.pth")   # Default key in bucket
+S3_TRIAGE_KEY = os.getenv("S3_TRIAGE_KEY", "triage.pth")            # Default key in bucket
 LOCAL_MODEL_TEMP_DIR = "/tmp/models" # Temporary directory inside the container
 
 # Ensure the local temp directory exists
@@ -51,16 +119,36 @@ def _download_model_from_s3(bucket_name, object_key, local_path):
         print(f"ERROR: An unexpected error occurred downloading {object_key}: {e}")
         return False
 
+@contextmanager
+def _intra_op_threads(threads):
+    """
+    Run the block with this thread's intra-op thread count set to `threads`
+    """
+    previous = torch.get_num_threads()
+    torch.set_num_threads(max(1, threads))
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
 class MedicalImageAnalyzer:
-    def __init__(self):
+    def __init__(self, precision=None):
         self.device = device
+        self.precision = precision or default_precision
         self.classifier = None
-        self.segmenter = None
+        self.triage = None
+        # The classifier and triage model stay resident; the segmenter (only needed for
+        # positives) loads on first use and unloads when idle, see backend.models.residency
+        self.models = ModelResidency(device=self.device)
+        self._model_version = None
+        self._cascade_lock = threading.Lock()
+        self._cascade_counts = dict.fromkeys(
+            ("images", "escalated", "escalated_agreed", "audited", "audit_agreed"), 0
+        )
 
         # Define local paths for downloaded models
         # Use os.path.basename to ensure we are only getting the filename part from S3 keys
         local_classifier_path = os.path.join(LOCAL_MODEL_TEMP_DIR, os.path.basename(S3_CLASSIFIER_KEY))
-        local_segmenter_path = os.path.join(LOCAL_MODEL_TEMP_DIR, os.path.basename(S3_SEGMENTER_KEY))
         
         # Attempt to load classifier from S3, then local, then default
         classifier_ready = False
@@ -96,13 +184,40 @@ class MedicalImageAnalyzer:
                 print(f"ERROR: Failed to initialize default ResNet50 classifier: {e}")
                 self.classifier = None # Ensure classifier is None if initialization fails
 
-        # Attempt to load segmenter from S3, then local
+        if CASCADE:
+            self.triage = self._load_triage()
+        
+        # Apply the configured memory layout (channels_last) to the loaded models
+        if self.classifier is not None:
+            self.classifier = self.precision.prepare_model(self.classifier)
+            self.models.put("classifier", self.classifier)
+        if self.triage is not None:
+            self.triage = self.precision.prepare_model(self.triage)
+            self.models.put("triage", self.triage)
+        print(f"INFO: Inference precision: {self.precision}")
+        
+        self.models.register(
+            "segmenter", self._load_segmenter,
+            build=lambda: self.precision.prepare_model(UNet(n_channels=3, n_classes=1))
+        )
+        
+        # Speculative segmentation runs here, with its own thread budget (no thread starts until used)
+        self._segmentation_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="speculative-segmentation",
+            initializer=torch.set_num_threads, initargs=(SEGMENTATION_THREADS,)
+        )
+    
+    def _load_segmenter(self):
+        """
+        Load the segmenter from S3, then the local weights directory; None without weights
+        """
+        local_segmenter_path = os.path.join(LOCAL_MODEL_TEMP_DIR, os.path.basename(S3_SEGMENTER_KEY))
         segmenter_ready = False
         if S3_MODEL_BUCKET: # Only attempt S3 download if bucket is configured
             if _download_model_from_s3(S3_MODEL_BUCKET, S3_SEGMENTER_KEY, local_segmenter_path):
                 if os.path.exists(local_segmenter_path):
                     try:
-                        self.segmenter = load_segmenter(local_segmenter_path, self.device)
+                        segmenter = load_segmenter(local_segmenter_path, self.device)
                         print(f"INFO: Custom segmenter loaded successfully from S3 via {local_segmenter_path}")
                         segmenter_ready = True
                     except Exception as e:
@@ -113,7 +228,7 @@ class MedicalImageAnalyzer:
             legacy_segmenter_path = os.path.join("backend", "models", "weights", "segmenter.pth")
             if os.path.exists(legacy_segmenter_path):
                 try:
-                    self.segmenter = load_segmenter(legacy_segmenter_path, self.device)
+                    segmenter = load_segmenter(legacy_segmenter_path, self.device)
                     print(f"INFO: Custom segmenter loaded successfully from local path {legacy_segmenter_path}")
                     segmenter_ready = True
                 except Exception as e:
@@ -122,50 +237,313 @@ class MedicalImageAnalyzer:
         if not segmenter_ready:
             print(f"WARNING: Segmenter model weights not loaded from S3 or local path.")
             print("INFO: Proceeding without a segmenter. Segmentation will be skipped if applicable.")
-            self.segmenter = None
+            return None
+        return self.precision.prepare_model(segmenter)
+    
+    def _load_triage(self):
+        """
+        Load the triage model from S3 or the local weights directory; None disables the cascade
+        """
+        paths = []
+        local_triage_path = os.path.join(LOCAL_MODEL_TEMP_DIR, os.path.basename(S3_TRIAGE_KEY))
+        if S3_MODEL_BUCKET and _download_model_from_s3(S3_MODEL_BUCKET, S3_TRIAGE_KEY, local_triage_path):
+            paths.append(local_triage_path)
+        paths.append(os.path.join("backend", "models", "weights", "triage.pth"))
+        
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                triage = load_triage_model(path, self.device, num_classes=len(CLASS_LABELS), arch=TRIAGE_ARCH)
+                print(f"INFO: Triage model ({TRIAGE_ARCH}) loaded from {path}; cascade threshold {CASCADE_THRESHOLD}")
+                return triage
+            except Exception as e:
+                print(f"ERROR: Failed to load triage model from {path}: {e}")
+        
+        print("WARNING: CASCADE is enabled but no triage weights were loaded (train with --models triage).")
+        print("INFO: Every image will go through the full classifier.")
+        return None
+    
+    @property
+    def segmenter(self):
+        """
+        The segmenter, loaded if it isn't resident; None without weights
+        """
+        return self.models.get("segmenter")
+    
+    @segmenter.setter
+    def segmenter(self, model):
+        self.models.put("segmenter", model)
+    
+    def model_version(self):
+        """
+        Short digest of the loaded classifier and triage weights and the segmenter's weights file
+
+        Changes whenever new weights are shipped, so stored scores can be tied to them.
+        The segmenter loads on demand, so it is identified without loading it.
+        """
+        if self._model_version is None:
+            digest = hashlib.sha256()
+            for state_dict in (
+                self.classifier.state_dict() if self.classifier is not None else None,
+                self.triage.state_dict() if self.triage is not None else None
+            ):
+                if state_dict is None:
+                    continue
+                for name, tensor in state_dict.items():
+                    digest.update(name.encode())
+                    digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+            segmenter_fingerprint = self._segmenter_fingerprint()
+            if segmenter_fingerprint is not None:
+                digest.update(segmenter_fingerprint.encode())
+            self._model_version = digest.hexdigest()[:12]
+        return self._model_version
+    
+    def _segmenter_fingerprint(self):
+        """
+        Identify the segmenter weights _load_segmenter would load, without downloading or loading
+        them: the S3 object's ETag, else a digest of the local file; None without weights
+        """
+        if S3_MODEL_BUCKET:
+            try:
+                head = boto3.client('s3').head_object(Bucket=S3_MODEL_BUCKET, Key=S3_SEGMENTER_KEY)
+                return f"s3:{head['ETag']}"
+            except Exception as e:
+                print(f"WARNING: Could not read s3://{S3_MODEL_BUCKET}/{S3_SEGMENTER_KEY} for the model version: {e}")
+        legacy_segmenter_path = os.path.join("backend", "models", "weights", "segmenter.pth")
+        if not os.path.exists(legacy_segmenter_path):
+            return None
+        digest = hashlib.sha256()
+        with open(legacy_segmenter_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
     
     def analyze_image(self, image_path):
         """
         Analyze a medical image for classification, segmentation, and heatmap
         """
+        # Prepare image tensor
+        img_tensor = prepare_image(image_path)
+        return self.analyze_batch(img_tensor, [image_path])[0]
+    
+    def analyze_batch(self, img_tensor, image_paths, segment=True, gradcam=True):
+        """
+        Analyze a batch of prepared images (N, 3, 224, 224), one result dict per image
+
+        Classification (with MC dropout) and segmentation run batched; Grad-CAM runs
+        per image since it backpropagates from each image's predicted class. With the
+        cascade enabled, images the triage model is confident about skip the full
+        classifier (see CASCADE_*). See INFERENCE_PIPELINE for running the stages
+        concurrently.
+        """
         # Check if classifier is available
         if self.classifier is None:
             # This state indicates a failure during __init__ to load or initialize a classifier.
             raise ValueError("Classifier model is not available. Check logs for initialization errors.")
         
-        # Prepare image tensor
-        img_tensor = prepare_image(image_path)
-        img_tensor = img_tensor.to(self.device)
-        
-        # Get classification results with uncertainty
-        pred_class, confidence, uncertainty = self.classifier.predict_with_uncertainty(img_tensor)
-        class_idx = pred_class.item()
-        confidence_score = confidence.item()
-        
-        # Get class label
-        prediction = CLASS_LABELS[class_idx]
-        
-        # Generate segmentation if model is available
-        segmentation_path = None
-        if self.segmenter is not None and class_idx > 0:  # Only segment if disease is detected
-            mask = self.segmenter.predict(img_tensor)
-            mask_np = mask.cpu().numpy()[0, 0]  # Get the mask as a numpy array
-            segmentation_path = save_segmentation(mask_np)
-        elif self.segmenter is None and class_idx > 0:
-            print("INFO: Segmentation skipped as segmenter model is not loaded.")
-        
-        # Generate heatmap
-        grad_cam_layer = self.classifier.get_gradcam_layer()
-        heatmap = generate_gradcam(self.classifier, img_tensor, grad_cam_layer)
-        heatmap_path = save_heatmap(image_path, heatmap)
+        img_tensor = self.precision.prepare_input(img_tensor.to(self.device))
+        n = img_tensor.shape[0]
+        results = [None] * n
+        class_indices = [None] * n
+        
+        # First stage: the triage model settles confident cases; the rest escalate
+        escalated, audited = list(range(n)), []
+        if self.triage is not None:
+            with self.precision.autocast(self.device):
+                triage_probs = self.triage.predict(img_tensor)
+            triage_confidences, triage_classes = (t.tolist() for t in triage_probs.max(dim=1))
+            accepted = [
+                i for i in range(n)
+                if CLASS_LABELS[triage_classes[i]] in CASCADE_ACCEPT_CLASSES and triage_confidences[i] >= CASCADE_THRESHOLD
+            ]
+            escalated = [i for i in range(n) if i not in accepted]
+            audited = [i for i in accepted if random.random() < CASCADE_AUDIT_RATE]
+            for i in accepted:
+                class_indices[i] = triage_classes[i]
+                results[i] = {
+                    "prediction": CLASS_LABELS[triage_classes[i]],
+                    "confidence": triage_confidences[i],
+                    "uncertainty": None,
+                    "mc_samples": 0,
+                    "classified_by": "triage",
+                    "embedding": None,  # Only the full classifier's features are indexed
+                    "segmentation_path": None,
+                    "heatmap_path": None,
+                    "lesion_stats": None
+                }
+        
+        # Full classifier with uncertainty for escalated (and audited) images
+        full = sorted(escalated + audited)
+        concurrent = INFERENCE_PIPELINE == "concurrent"
+        
+        # Segment the escalated images while they are being classified, betting on a positive
+        speculative = None
+        if concurrent and segment and full and len(full) <= SPECULATIVE_MAX_BATCH and self.models.available("segmenter"):
+            speculative = self._segmentation_executor.submit(
+                self._segment, img_tensor[full], [image_paths[i] for i in full]
+            )
+        
+        if full:
+            budget = torch.get_num_threads() - SEGMENTATION_THREADS if speculative else torch.get_num_threads()
+            with _intra_op_threads(budget), self.precision.autocast(self.device):
+                pred_class, confidence, uncertainty, samples, features = self.classifier.predict_with_uncertainty(
+                    img_tensor[full], num_samples=MC_SAMPLES, adaptive=MC_SAMPLING == "adaptive",
+                    min_samples=MC_MIN_SAMPLES, max_samples=MC_MAX_SAMPLES, tolerance=MC_TOLERANCE,
+                    flip=TTA_FLIP, angles=TTA_ANGLES, return_features=True
+                )
+            # Pooled features double as the embedding for similar-case retrieval
+            embeddings = features.cpu().numpy().astype(np.float16)
+            for i, class_idx, confidence_score, uncertainty_score, mc_samples, embedding in zip(
+                full, pred_class.tolist(), confidence.float().tolist(), uncertainty.float().tolist(),
+                samples.tolist(), embeddings
+            ):
+                class_indices[i] = class_idx
+                results[i] = {
+                    "prediction": CLASS_LABELS[class_idx],
+                    "confidence": confidence_score,
+                    "uncertainty": uncertainty_score,
+                    "mc_samples": mc_samples,
+                    "classified_by": "full",
+                    "embedding": embedding,
+                    "segmentation_path": None,
+                    "heatmap_path": None,
+                    "lesion_stats": None
+                }
+        
+        if self.triage is not None:
+            self._record_cascade(triage_classes, class_indices, escalated, audited)
+        
+        # Generate segmentation if model is available, only for images where disease is detected
+        positive = [i for i, class_idx in enumerate(class_indices) if class_idx > 0]
+        masks = {}
+        if speculative is not None:
+            if any(i in positive for i in full):
+                masks.update(zip(full, speculative.result() or ()))
+            else:
+                # All negative: drop the speculation (if it already started, its result is ignored)
+                speculative.cancel()
+        if segment and positive:
+            remaining = [i for i in positive if i not in masks]
+            if remaining and self.models.available("segmenter"):
+                segmented = self._segment(img_tensor[remaining], [image_paths[i] for i in remaining])
+                masks.update(zip(remaining, segmented or ()))
+            segmented = [i for i in positive if i in masks]
+            masks_np = [masks[i] for i in segmented]
+            all_lesion_stats = quantify_lesions(masks_np) if SEGMENTATION_MODE != "tiled" and segmented else [
+                quantify_lesions(mask_np)[0] for mask_np in masks_np
+            ]
+            for i, mask_np, lesion_stats in zip(segmented, masks_np, all_lesion_stats):
+                results[i]["lesion_stats"] = lesion_stats
+                results[i]["segmentation_path"], results[i]["segmentation_future"] = save_segmentation(
+                    mask_np, metadata={"lesions": lesion_stats["lesions"]}
+                )
+            if len(segmented) < len(positive):
+                print("INFO: Segmentation skipped as segmenter model is not loaded.")
+        
+        # Generate heatmaps (from whichever model made the prediction)
+        if gradcam:
+            for i, image_path in enumerate(image_paths):
+                model = self.classifier if results[i]["classified_by"] == "full" else self.triage
+                if concurrent:
+                    results[i]["heatmap_path"], results[i]["heatmap_future"] = self._submit_gradcam(
+                        model, img_tensor[i:i + 1], image_path, class_indices[i], results[i]["classified_by"]
+                    )
+                else:
+                    heatmap = generate_gradcam(model, img_tensor[i:i + 1], model.get_gradcam_layer(), class_indices[i])
+                    results[i]["heatmap_path"], results[i]["heatmap_future"] = save_heatmap(image_path, heatmap)
+        
+        return results
+    
+    def _segment(self, img_tensor, image_paths):
+        """
+        Lesion masks (numpy) for a batch of prepared images, per SEGMENTATION_MODE; None without a segmenter
+        """
+        with self.models.use("segmenter") as segmenter:
+            if segmenter is None:
+                return None
+            if SEGMENTATION_MODE == "tiled":
+                return [self.segment_full_resolution(image_path, segmenter) for image_path in image_paths]
+            with self.precision.autocast(self.device):
+                masks = segmenter.predict(img_tensor)
+            return list(masks.cpu().numpy()[:, 0])
+    
+    def _submit_gradcam(self, model, img_tensor, image_path, class_idx, classified_by):
+        """
+        Render the heatmap on the artifact writer, returns (key, future)
+
+        The key is derived from the input pixels, the weights and the explained class,
+        so it is known (and an already stored heatmap is reused) before rendering.
+        """
+        layer = model.get_gradcam_layer()
+        key_material = b"|".join([
+            img_tensor.detach().float().cpu().contiguous().numpy().tobytes(),
+            self.model_version().encode(), classified_by.encode(), layer.encode(), str(class_idx).encode()
+        ])
+        return artifact_writer.submit_rendered_image(
+            "heatmaps", key_material,
+            lambda: render_heatmap(image_path, generate_gradcam(model, img_tensor, layer, class_idx))
+        )
+    
+    def _record_cascade(self, triage_classes, class_indices, escalated, audited):
+        with self._cascade_lock:
+            counts = self._cascade_counts
+            counts["images"] += len(triage_classes)
+            counts["escalated"] += len(escalated)
+            counts["escalated_agreed"] += sum(triage_classes[i] == class_indices[i] for i in escalated)
+            counts["audited"] += len(audited)
+            counts["audit_agreed"] += sum(triage_classes[i] == class_indices[i] for i in audited)
+    
+    def cascade_stats(self):
+        """
+        Escalation rate and triage/full-model agreement since startup
+
+        Agreement on escalated images shows how often the triage model's (unsure) call
+        was right anyway; agreement on audited images estimates how often the cases it
+        settles on its own would have been classified the same by the full model.
+        """
+        with self._cascade_lock:
+            counts = dict(self._cascade_counts)
+        
+        def rate(numerator, denominator):
+            return counts[numerator] / counts[denominator] if counts[denominator] else None
         
         return {
-            "prediction": prediction,
-            "confidence": confidence_score,
-            "uncertainty": uncertainty.item() if isinstance(uncertainty, torch.Tensor) else uncertainty,
-            "segmentation_path": segmentation_path,
-            "heatmap_path": heatmap_path
+            "enabled": self.triage is not None,
+            "threshold": CASCADE_THRESHOLD,
+            "accept_classes": list(CASCADE_ACCEPT_CLASSES),
+            **counts,
+            "escalation_rate": rate("escalated", "images"),
+            "escalated_agreement": rate("escalated_agreed", "escalated"),
+            "audit_agreement": rate("audit_agreed", "audited")
         }
-
-# Create a singleton instance
-analyzer = MedicalImageAnalyzer() 
\ No newline at end of file
+    
+    def residency_stats(self):
+        """
+        Resident models, their memory and load latency (see backend.models.residency)
+        """
+        return self.models.stats()
+    
+    def segment_full_resolution(self, image_path, segmenter=None):
+        """
+        Segment the original image at its native resolution with tiled UNet inference
+        """
+        if segmenter is None:
+            with self.models.use("segmenter") as segmenter:
+                if segmenter is None:
+                    raise ValueError("Segmenter model is not available. Check logs for loading errors.")
+                return self.segment_full_resolution(image_path, segmenter)
+        if is_medical_image(image_path):
+            image = load_frame(image_path)
+        else:
+            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not read image {image_path}")
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        with self.precision.autocast(self.device):
+            return segmenter.predict_tiled(
+                image,
+                tile_size=SEGMENTATION_TILE_SIZE,
+                stride=SEGMENTATION_TILE_STRIDE,
+                batch_size=SEGMENTATION_TILE_BATCH
+            )
@@ -0,0 +1,299 @@
+import os
+import glob
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from itertools import chain
+
+import torch
+
+# Model residency: lazily registered models load on first use and unload again after
+# MODEL_IDLE_TIMEOUT seconds without use, or least recently used first when loading another
+# would take the resident models past MODEL_MEMORY_BUDGET_MB. "eager" keeps every model
+# resident from startup.
+MODEL_RESIDENCY = os.getenv("MODEL_RESIDENCY", "lazy")
+MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))  # 0: no budget
+MODEL_IDLE_TIMEOUT = float(os.getenv("MODEL_IDLE_TIMEOUT", "600"))  # Seconds; 0 never unloads idle models
+# Loaded weights are written here once (named by a digest of their contents) and memory-mapped
+# from then on: reloads skip S3 and deserialization, and workers on a host share the pages
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "/tmp/models/cache")
+# Seconds before a model whose load failed (or found no weights) is tried again
+MODEL_RETRY_SECONDS = float(os.getenv("MODEL_RETRY_SECONDS", "60"))
+
+MODEL_RESIDENCY_MODES = ("lazy", "eager")
+
+def model_bytes(model):
+    """
+    Bytes held by a module's parameters and buffers (0 for anything else)
+    """
+    if not isinstance(model, torch.nn.Module):
+        return 0
+    return sum(t.nelement() * t.element_size() for t in chain(model.parameters(), model.buffers()))
+
+def state_digest(state_dict):
+    digest = hashlib.sha256()
+    for name, tensor in state_dict.items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+def process_rss_bytes():
+    """
+    Resident set size of this process, or None where /proc is unavailable
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class _Slot:
+    def __init__(self, name, loader, build, pinned):
+        self.name = name
+        self.loader = loader  # () -> model or None, from the original weights
+        self.build = build  # () -> empty model to restore the cached weights into, or None
+        self.pinned = pinned
+        self.model = None
+        self.retry_at = 0.0  # Monotonic time before which a failed load isn't retried
+        self.cache_path = None
+        self.nbytes = 0
+        self.users = 0
+        self.last_used = 0.0
+        self.load_lock = threading.Lock()  # Single flight: one load at a time per model
+        self.counts = {"loads": 0, "cache_loads": 0, "failed_loads": 0, "hits": 0, "idle_unloads": 0,
+                       "budget_unloads": 0}
+        self.load_ms = []
+
+class ModelResidency:
+    """
+    Loads models on first use and unloads them when idle or over the memory budget
+
+    Register a model with a loader, then borrow it with `with residency.use(name) as model:`
+    (None if it has no weights). The first borrower loads it while concurrent ones wait for
+    that same load; a borrowed model is never unloaded. Pinned models stay resident. A failed
+    load answers None until retry_seconds have passed, then the next borrower tries again.
+    """
+    def __init__(self, mode=MODEL_RESIDENCY, budget_mb=MODEL_MEMORY_BUDGET_MB, idle_timeout=MODEL_IDLE_TIMEOUT,
+                 cache_dir=MODEL_CACHE_DIR, retry_seconds=MODEL_RETRY_SECONDS, device="cpu"):
+        if mode not in MODEL_RESIDENCY_MODES:
+            raise ValueError(f"Unknown model residency '{mode}'. Use one of {MODEL_RESIDENCY_MODES}.")
+        self.mode = mode
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.idle_timeout = idle_timeout
+        self.cache_dir = cache_dir
+        self.retry_seconds = retry_seconds
+        self.device = torch.device(device)
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stopping = threading.Event()
+
+    def register(self, name, loader, build=None, pinned=False):
+        """
+        Add a model; `build` enables the mmap cache. Eager mode loads it right away.
+        """
+        slot = _Slot(name, loader, build, pinned or self.mode == "eager")
+        self._slots[name] = slot
+        if slot.pinned:
+            self.get(name)
+
+    def put(self, name, model, pinned=True):
+        """
+        Install an already loaded model under `name` (None: `name` has no model)
+        """
+        slot = self._slots.get(name) or _Slot(name, lambda: None, None, pinned)
+        with self._lock:
+            slot.model, slot.nbytes, slot.pinned = model, model_bytes(model), pinned
+            slot.retry_at = float("inf") if model is None else 0.0
+            slot.last_used = time.monotonic()
+            self._slots[name] = slot
+
+    def available(self, name):
+        """
+        Whether `name` is resident or may load now (without loading it)
+        """
+        slot = self._slots.get(name)
+        return slot is not None and (slot.model is not None or time.monotonic() >= slot.retry_at)
+
+    @contextmanager
+    def use(self, name):
+        slot = self._slots[name]
+        model = self._acquire(slot)
+        try:
+            yield model
+        finally:
+            if model is not None:
+                with self._lock:
+                    slot.users -= 1
+                    slot.last_used = time.monotonic()
+
+    def get(self, name):
+        """
+        The model (loading it if needed) without borrowing it; None without weights
+        """
+        with self.use(name) as model:
+            return model
+
+    def sweep(self, now=None):
+        """
+        Unload models unused for idle_timeout seconds; returns their names
+        """
+        if self.idle_timeout <= 0:
+            return []
+        now = time.monotonic() if now is None else now
+        unloaded = []
+        with self._lock:
+            for slot in self._slots.values():
+                if (slot.model is not None and not slot.pinned and not slot.users
+                        and now - slot.last_used >= self.idle_timeout):
+                    self._unload(slot, "idle")
+                    unloaded.append(slot.name)
+        return unloaded
+
+    def shutdown(self):
+        self._stopping.set()
+
+    def stats(self):
+        with self._lock:
+            models = {}
+            for slot in self._slots.values():
+                load_ms = sorted(slot.load_ms)
+                models[slot.name] = {
+                    "resident": slot.model is not None,
+                    "pinned": slot.pinned,
+                    "in_use": slot.users,
+                    "resident_bytes": slot.nbytes if slot.model is not None else 0,
+                    **slot.counts,
+                    "last_load_ms": slot.load_ms[-1] if slot.load_ms else None,
+                    "p50_load_ms": load_ms[len(load_ms) // 2] if load_ms else None,
+                    "max_load_ms": load_ms[-1] if load_ms else None,
+                    "idle_seconds": round(time.monotonic() - slot.last_used, 1) if slot.model is not None else None
+                }
+            return {
+                "mode": self.mode,
+                "budget_bytes": self.budget_bytes or None,
+                "idle_timeout": self.idle_timeout,
+                "resident_bytes": sum(m["resident_bytes"] for m in models.values()),
+                "process_rss_bytes": process_rss_bytes(),
+                "models": models
+            }
+
+    def _acquire(self, slot):
+        with self._lock:
+            if slot.model is not None:
+                return self._borrow(slot, hit=True)
+        with slot.load_lock:
+            with self._lock:
+                if slot.model is not None:  # Loaded by the caller we waited for
+                    return self._borrow(slot, hit=True)
+                if time.monotonic() < slot.retry_at:
+                    return None  # Failed recently
+                expected = slot.nbytes
+            if expected:
+                with self._lock:
+                    self._make_room(expected)
+            model = self._load(slot)
+            with self._lock:
+                if model is None:
+                    slot.counts["failed_loads"] += 1
+                    slot.retry_at = time.monotonic() + self.retry_seconds
+                    return None
+                slot.model, slot.nbytes = model, model_bytes(model)
+                self._borrow(slot, hit=False)  # Borrowed first, so making room can't unload it
+                self._make_room(0)
+                self._start_sweeper()
+                return model
+
+    def _borrow(self, slot, hit):
+        slot.users += 1
+        slot.last_used = time.monotonic()
+        if hit:
+            slot.counts["hits"] += 1
+        return slot.model
+
+    def _load(self, slot):
+        start = time.perf_counter()
+        source = "cache"
+        try:
+            if slot.cache_path and os.path.exists(slot.cache_path):
+                model = self._restore(slot)
+            else:
+                source = "weights"
+                model = slot.loader()
+                if model is not None and slot.build is not None and self.cache_dir:
+                    # Swap to the memory-mapped copy right away, so even the first load is shared
+                    slot.cache_path = self._write_cache(slot.name, model)
+                    model = self._restore(slot)
+        except Exception as e:
+            print(f"ERROR: Failed to load model '{slot.name}': {e}")
+            return None
+        if model is None:
+            return None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        slot.counts["loads"] += 1
+        slot.counts["cache_loads"] += source == "cache"
+        slot.load_ms = (slot.load_ms + [round(elapsed_ms, 1)])[-100:]
+        print(f"INFO: Loaded model '{slot.name}' from {source} in {elapsed_ms:.0f} ms "
+              f"({model_bytes(model) / 1e6:.0f} MB)")
+        return model
+
+    def _write_cache(self, name, model):
+        state = {k: v.detach().cpu() for k, v in model.state_dict().items()}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, f"{name}-{state_digest(state)}.pt")
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save(state, tmp_path)
+            os.replace(tmp_path, path)  # Atomic: other workers see the whole file or none
+            # Weights replaced since: processes still mapping the old file keep their pages
+            for stale in glob.glob(os.path.join(self.cache_dir, f"{name}-*.pt")):
+                if stale != path:
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+        return path
+
+    def _restore(self, slot):
+        state = torch.load(slot.cache_path, map_location="cpu", mmap=True)
+        with torch.device("meta"):
+            model = slot.build()
+        model.load_state_dict(state, assign=True)
+        if any(t.is_meta for t in chain(model.parameters(), model.buffers())):
+            raise ValueError(f"cached weights in {slot.cache_path} do not cover the model")
+        return model.to(self.device).eval()
+
+    def _make_room(self, incoming):
+        """
+        Unload idle models, least recently used first, until `incoming` bytes fit the budget
+        """
+        if not self.budget_bytes:
+            return
+        resident = sum(s.nbytes for s in self._slots.values() if s.model is not None)
+        while resident + incoming > self.budget_bytes:
+            idle = [s for s in self._slots.values() if s.model is not None and not s.pinned and not s.users]
+            if not idle:
+                print(f"WARNING: Resident models ({(resident + incoming) / 1e6:.0f} MB) exceed "
+                      f"MODEL_MEMORY_BUDGET_MB and none can be unloaded")
+                return
+            victim = min(idle, key=lambda s: s.last_used)
+            resident -= victim.nbytes
+            self._unload(victim, "budget")
+
+    def _unload(self, slot, reason):
+        slot.model = None
+        slot.counts[f"{reason}_unloads"] += 1
+        print(f"INFO: Unloaded model '{slot.name}' ({reason})")
+
+    def _start_sweeper(self):
+        if self._sweeper is not None or self.idle_timeout <= 0:
+            return
+        if all(slot.pinned for slot in self._slots.values()):
+            return
+
+        def run():
+            while not self._stopping.wait(min(60.0, self.idle_timeout / 2)):
+                self.sweep()
+        self._sweeper = threading.Thread(target=run, name="model-residency", daemon=True)
+        self._sweeper.start()
@@ -0,0 +1,194 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+from backend.models.analyzers import analyzer
+from backend.utils.image_processing import prepare_image
+from backend.utils.runtime import runtime
+
+# Submission priorities, most urgent first
+PRIORITIES = ("stat", "routine", "bulk")
+
+def _parse_levels(value, cast):
+    """
+    Parse "stat:8,routine:4,bulk:1" into {"stat": 8, ...}
+    """
+    levels = {}
+    for item in value.split(","):
+        if item.strip():
+            name, level = item.split(":")
+            levels[name.strip()] = cast(level)
+    return levels
+
+# Share of dispatched images per priority while several are backlogged
+SCHEDULER_WEIGHTS = _parse_levels(os.getenv("SCHEDULER_WEIGHTS", "stat:16,routine:4,bulk:1"), float)
+# Images per model call: STAT runs alone for latency, lower priorities batch for throughput.
+# The priority is re-picked between batches, so bulk work yields to STAT at batch boundaries.
+SCHEDULER_BATCH_SIZES = _parse_levels(os.getenv("SCHEDULER_BATCH_SIZES", "stat:1,routine:4,bulk:8"), int)
+# Latency targets (queue wait + inference), reported against in stats()
+SCHEDULER_SLO_MS = _parse_levels(os.getenv("SCHEDULER_SLO_MS", "stat:2000,routine:15000,bulk:120000"), float)
+# Recent latencies kept per priority for the percentiles
+SCHEDULER_WINDOW = int(os.getenv("SCHEDULER_WINDOW", "1024"))
+
+# Uploads are decoded on a pool sized by the runtime thread plan (PREPROCESS_THREADS), so a burst
+# of uploads can't take the cores the inference thread was budgeted
+preprocess_executor = ThreadPoolExecutor(
+    max_workers=runtime.plan["preprocess_threads"],
+    thread_name_prefix="preprocess"
+)
+
+class InferenceScheduler:
+    """
+    Runs analyze requests on one inference thread in priority- and user-fair order
+
+    Each priority has its own queue, split per user. The next priority is picked
+    by stride scheduling: every dispatched image advances its priority's pass by
+    1 / weight, and the backlogged priority with the lowest pass goes next, so a
+    burst of bulk work gets its weighted share but can never starve STAT. Within
+    a priority, users are served round-robin. Work is dispatched in batches of up
+    to that priority's batch size and the choice is made again after every batch,
+    so a STAT arrival waits for at most the batch in flight.
+    """
+    def __init__(self, analyzer, weights=None, batch_sizes=None, slo_ms=None, window=SCHEDULER_WINDOW):
+        self.analyzer = analyzer
+        self.weights = {p: 1.0 for p in PRIORITIES}
+        self.weights.update(weights or SCHEDULER_WEIGHTS)
+        self.batch_sizes = {p: 1 for p in PRIORITIES}
+        self.batch_sizes.update(batch_sizes or SCHEDULER_BATCH_SIZES)
+        self.slo_ms = dict(slo_ms or SCHEDULER_SLO_MS)
+
+        self._queues = {p: OrderedDict() for p in PRIORITIES}  # priority -> user_id -> deque of jobs
+        self._queued = {p: 0 for p in PRIORITIES}
+        self._pass = {p: 0.0 for p in PRIORITIES}
+        self._latencies = {p: deque(maxlen=window) for p in PRIORITIES}
+        self._completed = {p: 0 for p in PRIORITIES}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def submit(self, img_tensor, image_path, priority="routine", user_id=None):
+        """
+        Queue a prepared image (1, 3, 224, 224); returns a Future for its result dict
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Use one of: {', '.join(PRIORITIES)}.")
+        future = Future()
+        job = (img_tensor, image_path, future, time.perf_counter())
+        with self._condition:
+            if self._stopping:
+                raise RuntimeError("Inference scheduler is shut down")
+            if self._queued[priority] == 0:
+                # A priority returning from idle must not cash in credit for the time it was idle
+                active = [self._pass[p] for p in PRIORITIES if self._queued[p]]
+                if active:
+                    self._pass[priority] = max(self._pass[priority], min(active))
+            self._queues[priority].setdefault(user_id, deque()).append(job)
+            self._queued[priority] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    async def analyze(self, image_path, priority="routine", user_id=None):
+        """
+        Decode the image off the event loop, then wait for its scheduled analysis
+        """
+        loop = asyncio.get_running_loop()
+        img_tensor = await loop.run_in_executor(preprocess_executor, prepare_image, image_path)
+        return await asyncio.wrap_future(self.submit(img_tensor, image_path, priority, user_id))
+
+    def _next_batch(self):
+        # Called with the condition held and at least one job queued
+        priority = min((p for p in PRIORITIES if self._queued[p]), key=lambda p: (self._pass[p], PRIORITIES.index(p)))
+        users = self._queues[priority]
+        batch = []
+        while users and len(batch) < self.batch_sizes[priority]:
+            user_id, jobs = next(iter(users.items()))
+            batch.append(jobs.popleft())
+            # Round-robin: the user goes to the back of the line (or leaves it)
+            del users[user_id]
+            if jobs:
+                users[user_id] = jobs
+        self._queued[priority] -= len(batch)
+        self._pass[priority] += len(batch) / self.weights[priority]
+        return priority, batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not any(self._queued.values()) and not self._stopping:
+                    self._condition.wait()
+                if not any(self._queued.values()):
+                    return
+                priority, batch = self._next_batch()
+
+            # Jobs cancelled while queued (e.g. the client disconnected) are dropped; the rest can
+            # no longer be cancelled
+            batch = [job for job in batch if job[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            tensors, paths, futures, submitted = zip(*batch)
+            try:
+                results = self.analyzer.analyze_batch(torch.cat(tensors), list(paths))
+            except Exception as e:
+                for future in futures:
+                    self._deliver(future, exception=e)
+                continue
+
+            finished = time.perf_counter()
+            with self._condition:
+                self._latencies[priority].extend((finished - t) * 1000 for t in submitted)
+                self._completed[priority] += len(batch)
+            for future, result in zip(futures, results):
+                self._deliver(future, result=result)
+
+    @staticmethod
+    def _deliver(future, result=None, exception=None):
+        # One bad future must not stop the inference thread
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except Exception as e:
+            print(f"ERROR: Could not deliver an inference result: {e}")
+
+    def stats(self):
+        """
+        Queue depth, completions and recent latency percentiles per priority, against the SLO
+        """
+        with self._condition:
+            snapshot = {p: (self._queued[p], self._completed[p], list(self._latencies[p])) for p in PRIORITIES}
+        stats = {}
+        for priority, (queued, completed, latencies) in snapshot.items():
+            target = self.slo_ms.get(priority)
+            entry = {"queued": queued, "completed": completed, "slo_ms": target,
+                     "p50_ms": None, "p95_ms": None, "p99_ms": None, "slo_met_pct": None}
+            if latencies:
+                p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                entry.update(p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99))
+                if target is not None:
+                    entry["slo_met_pct"] = 100.0 * sum(l <= target for l in latencies) / len(latencies)
+            stats[priority] = entry
+        return stats
+
+    def shutdown(self):
+        """
+        Finish the queued work, then stop the inference thread
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+# Create a singleton instance
+inference_scheduler = InferenceScheduler(analyzer)
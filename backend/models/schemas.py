@@ -24,11 +24,17 @@ class User(UserBase):
 
 # Prediction schemas
 class PredictionBase(BaseModel):
-    image_path: str
+    image_path: Optional[str] = None  # Cleared once the upload expires (RETENTION_TTLS)
     prediction_result: str
     confidence_score: float
+    uncertainty_score: Optional[float] = None
+    mc_samples: Optional[int] = None
+    classified_by: Optional[str] = None
     segmentation_path: Optional[str] = None
     heatmap_path: Optional[str] = None
+    lesion_count: Optional[int] = None
+    lesion_area: Optional[int] = None
+    involvement_pct: Optional[float] = None
 
 class PredictionCreate(PredictionBase):
     pass
@@ -37,10 +43,18 @@ class Prediction(PredictionBase):
     id: int
     user_id: int
     created_at: datetime
+    image_url: Optional[str] = None
+    segmentation_url: Optional[str] = None
+    heatmap_url: Optional[str] = None
+    lesion_bboxes: Optional[List[List[int]]] = None
     
     class Config:
         from_attributes = True
 
+class SimilarCase(BaseModel):
+    score: float  # Cosine similarity of the image embeddings
+    prediction: Prediction
+
 # Token schemas
 class Token(BaseModel):
     access_token: str
@@ -53,5 +67,12 @@ class TokenData(BaseModel):
 class PredictionResponse(BaseModel):
     prediction: str
     confidence: float
+    uncertainty: Optional[float] = None
+    mc_samples: Optional[int] = None
+    classified_by: Optional[str] = None
     segmentation_url: Optional[str] = None
-    heatmap_url: Optional[str] = None 
\ No newline at end of file
+    heatmap_url: Optional[str] = None
+    lesion_count: Optional[int] = None
+    lesion_area: Optional[int] = None
+    involvement_pct: Optional[float] = None
+    lesion_bboxes: Optional[List[List[int]]] = None 
\ No newline at end of file
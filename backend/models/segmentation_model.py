@@ -1,6 +1,17 @@
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.utils.checkpoint import checkpoint
+
+def _run(module, fn, *inputs):
+    """
+    Run fn(*inputs), recomputing it in backward instead of storing activations
+    when gradient checkpointing is enabled on the module (training only)
+    """
+    if module.checkpointing and module.training and torch.is_grad_enabled():
+        return checkpoint(fn, *inputs, use_reentrant=False)
+    return fn(*inputs)
 
 class DoubleConv(nn.Module):
     """
@@ -17,9 +28,10 @@ class DoubleConv(nn.Module):
             nn.BatchNorm2d(out_channels),
             nn.ReLU(inplace=True)
         )
+        self.checkpointing = False
 
     def forward(self, x):
-        return self.double_conv(x)
+        return _run(self, self.double_conv, x)
 
 class Down(nn.Module):
     """
@@ -31,9 +43,10 @@ class Down(nn.Module):
             nn.MaxPool2d(2),
             DoubleConv(in_channels, out_channels)
         )
+        self.checkpointing = False
 
     def forward(self, x):
-        return self.maxpool_conv(x)
+        return _run(self, self.maxpool_conv, x)
 
 class Up(nn.Module):
     """
@@ -49,8 +62,12 @@ class Up(nn.Module):
             self.up = nn.ConvTranspose2d(in_channels // 2, in_channels // 2, kernel_size=2, stride=2)
 
         self.conv = DoubleConv(in_channels, out_channels)
+        self.checkpointing = False
 
     def forward(self, x1, x2):
+        return _run(self, self._forward, x1, x2)
+
+    def _forward(self, x1, x2):
         x1 = self.up(x1)
         
         # Pad x1 to match x2 dimensions
@@ -74,6 +91,41 @@ class OutConv(nn.Module):
     def forward(self, x):
         return self.conv(x)
 
+# ImageNet normalization, as in utils.image_processing.get_transform
+IMAGE_MEAN = (0.485, 0.456, 0.406)
+IMAGE_STD = (0.229, 0.224, 0.225)
+
+def gaussian_window(tile_size, sigma_scale=0.125):
+    """
+    2D Gaussian blending weights for one tile (peak 1, never exactly 0)
+
+    Tile centers, where the network has full context, dominate overlapping predictions.
+    """
+    coords = torch.arange(tile_size, dtype=torch.float32) - (tile_size - 1) / 2
+    g = torch.exp(-coords ** 2 / (2 * (tile_size * sigma_scale) ** 2))
+    return torch.outer(g, g).clamp(min=1e-3)
+
+def tile_origins(length, tile_size, stride):
+    """
+    Tile start offsets covering [0, length), the last tile flush with the end
+    """
+    if length <= tile_size:
+        return [0]
+    origins = list(range(0, length - tile_size + 1, stride))
+    if origins[-1] != length - tile_size:
+        origins.append(length - tile_size)
+    return origins
+
+def _read_tile(image, y, x, tile_size):
+    # Crop one RGB tile from an HxW(x3) uint8 array (or memmap), zero-padded at the edges
+    tile = np.asarray(image[y:y + tile_size, x:x + tile_size])
+    if tile.ndim == 2:
+        tile = np.repeat(tile[..., None], 3, axis=2)
+    pad_h, pad_w = tile_size - tile.shape[0], tile_size - tile.shape[1]
+    if pad_h or pad_w:
+        tile = np.pad(tile, ((0, pad_h), (0, pad_w), (0, 0)))
+    return tile
+
 class UNet(nn.Module):
     """
     Full U-Net model for segmentation
@@ -116,19 +168,93 @@ class UNet(nn.Module):
         
         return logits
 
+    def set_gradient_checkpointing(self, enabled=True):
+        """
+        Trade compute for memory: recompute each encoder/decoder block in backward
+        """
+        for block in [self.inc, self.down1, self.down2, self.down3, self.down4,
+                      self.up1, self.up2, self.up3, self.up4]:
+            block.checkpointing = enabled
+
     def predict(self, x):
         """
         Get segmentation mask
         """
         self.eval()
-        with torch.no_grad():
-            out = self.forward(x)
+        with torch.inference_mode():
+            out = self.forward(x).float()
             # Apply sigmoid to get mask probability
             mask = torch.sigmoid(out)
             # Threshold to get binary mask
             mask = (mask > 0.5).float()
         return mask
 
+    def predict_tiled(self, image, tile_size=512, stride=384, batch_size=4, threshold=0.5):
+        """
+        Full-resolution segmentation of an HxW(x3) RGB uint8 image with overlapping tiles
+
+        Tiles run through the network in batches and overlaps are blended with
+        Gaussian weights. Probabilities are accumulated one band of tile rows at a
+        time; rows no later tile touches are thresholded into the output and the band
+        moves down. Memory is bounded by the tile batch and one tile-high band, not by
+        the image size. Returns an HxW uint8 mask of 0/1.
+        """
+        if tile_size % 16:
+            raise ValueError(f"Tile size must be a multiple of 16, got {tile_size}")
+        if not 0 < stride <= tile_size:
+            raise ValueError(f"Stride must be between 1 and the tile size ({tile_size}), got {stride}")
+        self.eval()
+        device = next(self.parameters()).device
+        h, w = image.shape[:2]
+        ys, xs = tile_origins(h, tile_size, stride), tile_origins(w, tile_size, stride)
+        window = gaussian_window(tile_size).to(device)
+        mean = torch.tensor(IMAGE_MEAN, device=device).view(1, 3, 1, 1)
+        std = torch.tensor(IMAGE_STD, device=device).view(1, 3, 1, 1)
+        
+        mask = np.zeros((h, w), dtype=np.uint8)
+        # Weighted probability sum and weight sum for rows [y, y + tile_size)
+        band = torch.zeros(2, tile_size, w, device=device)
+        
+        with torch.inference_mode():
+            for row, y in enumerate(ys):
+                th = min(tile_size, h - y)
+                for start in range(0, len(xs), batch_size):
+                    batch_xs = xs[start:start + batch_size]
+                    tiles = np.stack([_read_tile(image, y, x, tile_size) for x in batch_xs])
+                    batch = torch.from_numpy(tiles).to(device).permute(0, 3, 1, 2).float().div_(255)
+                    probs = torch.sigmoid(self.forward((batch - mean) / std).float())[:, 0] * window
+                    for x, p in zip(batch_xs, probs):
+                        tw = min(tile_size, w - x)
+                        band[0, :th, x:x + tw] += p[:th, :tw]
+                        band[1, :th, x:x + tw] += window[:th, :tw]
+                
+                # Rows above the next tile row get no more contributions
+                done = ys[row + 1] - y if row + 1 < len(ys) else th
+                blended = band[0, :done] / band[1, :done].clamp(min=1e-8)
+                mask[y:y + done] = (blended > threshold).cpu().numpy()
+                band = torch.cat([band[:, done:], torch.zeros(2, done, w, device=device)], dim=1)
+        return mask
+
+class DiceBCELoss(nn.Module):
+    """
+    Binary cross-entropy plus soft Dice loss on mask logits
+    """
+    def __init__(self, bce_weight=0.5, smooth=1.0):
+        super(DiceBCELoss, self).__init__()
+        self.bce_weight = bce_weight
+        self.smooth = smooth
+
+    def forward(self, logits, targets):
+        logits = logits.float()
+        bce = F.binary_cross_entropy_with_logits(logits, targets)
+
+        probs = torch.sigmoid(logits).flatten(1)
+        targets = targets.flatten(1)
+        intersection = (probs * targets).sum(dim=1)
+        dice = (2 * intersection + self.smooth) / (probs.sum(dim=1) + targets.sum(dim=1) + self.smooth)
+
+        return self.bce_weight * bce + (1 - self.bce_weight) * (1 - dice.mean())
+
 # Function to load trained model
 def load_model(model_path, device, n_channels=3, n_classes=1):
     model = UNet(n_channels=n_channels, n_classes=n_classes)
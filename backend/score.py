@@ -0,0 +1,295 @@
+import os
+import csv
+import time
+import argparse
+import tempfile
+
+import torch
+from torch.utils.data import Dataset, DataLoader
+
+from backend.utils.image_processing import prepare_image
+from backend.utils.artifact_writer import artifact_writer
+from backend.utils.shards import IMAGE_EXTENSIONS
+from backend.utils.medical_images import DICOM_EXTENSIONS
+from backend.utils.runtime import runtime
+
+# Columns of every results part file
+RESULT_COLUMNS = [
+    "path",
+    "model_version",
+    "prediction",
+    "confidence",
+    "uncertainty",
+    "mc_samples",
+    "classified_by",
+    "lesion_count",
+    "lesion_area",
+    "involvement_pct",
+    "segmentation_path",
+    "heatmap_path",
+    "error"
+]
+
+OUTPUT_FORMATS = ("parquet", "csv")
+
+# Heatmaps and masks saved while scoring go under this prefix (e.g. scoring/heatmaps/...).
+# They are referenced by the results files, not by predictions, so retention must not see them
+# as orphans; it only sweeps the API's uploads/, heatmaps/ and segmentations/.
+SCORING_ARTIFACT_PREFIX = os.getenv("SCORING_ARTIFACT_PREFIX", "scoring")
+
+def list_images(root):
+    """
+    All image files under root (recursive), sorted so runs are reproducible
+    """
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        paths.extend(os.path.join(dirpath, f) for f in filenames if f.lower().endswith(IMAGE_EXTENSIONS + DICOM_EXTENSIONS))
+    return sorted(os.path.abspath(p) for p in paths)
+
+def read_manifest(manifest_path):
+    """
+    Image paths from a manifest: a CSV with a `path` column or one path per line
+
+    Relative paths are resolved against the manifest's directory.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline="") as f:
+        if manifest_path.lower().endswith(".csv"):
+            paths = [row["path"] for row in csv.DictReader(f)]
+        else:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [os.path.abspath(os.path.join(base, p)) for p in paths]
+
+class ScoringDataset(Dataset):
+    """
+    Decodes and transforms images in loader workers; unreadable files yield None
+    """
+    def __init__(self, paths):
+        self.paths = paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        try:
+            return idx, prepare_image(self.paths[idx])[0], None
+        except Exception as e:
+            return idx, None, str(e)
+
+def collate_scoring(items):
+    ok = [(idx, tensor) for idx, tensor, _ in items if tensor is not None]
+    failed = [(idx, error) for idx, _, error in items if error is not None]
+    batch = torch.stack([tensor for _, tensor in ok]) if ok else None
+    return [idx for idx, _ in ok], batch, failed
+
+class ResultWriter:
+    """
+    Writes results as numbered part files in an output directory
+
+    Each part is written to a temp file and renamed, so a crash never leaves a
+    partial part. The parts on disk are the progress checkpoint: on restart,
+    every (path, model_version) already in a part is skipped.
+    """
+    def __init__(self, output_dir, format="parquet"):
+        if format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format '{format}'. Use parquet or csv.")
+        if format == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ValueError("Parquet output requires pyarrow (pip install pyarrow), or use --format csv.")
+        self.output_dir = output_dir
+        self.format = format
+        os.makedirs(output_dir, exist_ok=True)
+        self._next_part = len(self.parts())
+
+    def parts(self):
+        suffix = "." + self.format
+        return sorted(
+            os.path.join(self.output_dir, f) for f in os.listdir(self.output_dir)
+            if f.startswith("part-") and f.endswith(suffix)
+        )
+
+    def scored(self, model_version):
+        """
+        Set of paths already scored by `model_version`; rows that errored are retried
+        """
+        done = set()
+        for part in self.parts():
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+                table = pq.read_table(part, columns=["path", "model_version", "error"]).to_pydict()
+                rows = zip(table["path"], table["model_version"], table["error"])
+            else:
+                with open(part, newline="") as f:
+                    rows = [(row["path"], row["model_version"], row["error"]) for row in csv.DictReader(f)]
+            done.update(path for path, version, error in rows if version == model_version and not error)
+        return done
+
+    def write(self, rows):
+        if not rows:
+            return None
+        path = os.path.join(self.output_dir, f"part-{self._next_part:05d}.{self.format}")
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            if self.format == "parquet":
+                self._write_parquet(tmp_path, rows)
+            else:
+                with open(tmp_path, "w", newline="") as f:
+                    writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+                    writer.writeheader()
+                    writer.writerows(rows)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._next_part += 1
+        return path
+
+    def _write_parquet(self, path, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([
+            ("path", pa.string()),
+            ("model_version", pa.string()),
+            ("prediction", pa.string()),
+            ("confidence", pa.float64()),
+            ("uncertainty", pa.float64()),
+            ("mc_samples", pa.int64()),
+            ("classified_by", pa.string()),
+            ("lesion_count", pa.int64()),
+            ("lesion_area", pa.int64()),
+            ("involvement_pct", pa.float64()),
+            ("segmentation_path", pa.string()),
+            ("heatmap_path", pa.string()),
+            ("error", pa.string()),
+        ])
+        pq.write_table(pa.Table.from_pylist(rows, schema=schema), path)
+
+def result_row(path, model_version, result=None, error=None):
+    row = dict.fromkeys(RESULT_COLUMNS)
+    row.update(path=path, model_version=model_version, error=error)
+    if result is not None:
+        lesion_stats = result["lesion_stats"] or {}
+        row.update(
+            prediction=result["prediction"],
+            confidence=result["confidence"],
+            uncertainty=result["uncertainty"],
+            mc_samples=result.get("mc_samples"),
+            classified_by=result.get("classified_by"),
+            lesion_count=lesion_stats.get("lesion_count"),
+            lesion_area=lesion_stats.get("lesion_area"),
+            involvement_pct=lesion_stats.get("involvement_pct"),
+            segmentation_path=result["segmentation_path"],
+            heatmap_path=result["heatmap_path"]
+        )
+    return row
+
+def drop_failed_artifacts(pending_artifacts):
+    """
+    Clear the paths of artifacts whose background write failed (call after flushing)
+    """
+    for row, column, future in pending_artifacts:
+        if future.exception() is not None:
+            print(f"WARNING: Could not save {column} of {row['path']}: {future.exception()}")
+            row[column] = None
+
+def score(paths, output_dir, analyzer, format="parquet", batch_size=32, num_workers=None,
+          segment=False, gradcam=False, checkpoint_every=1024, artifacts=None):
+    """
+    Score images with the analyzer, skipping those already scored by the same model version
+
+    Returns the number of images scored in this run.
+    """
+    artifacts = artifacts or artifact_writer
+
+    results = ResultWriter(output_dir, format)
+    model_version = analyzer.model_version()
+    done = results.scored(model_version)
+    todo = [p for p in paths if p not in done]
+    print(f"Model version {model_version}: {len(paths)} images, {len(paths) - len(todo)} already scored, "
+          f"{len(todo)} to go")
+    if not todo:
+        return 0
+
+    # Decoding runs in loader workers while the main process runs the models
+    if num_workers is None:
+        num_workers = runtime.plan["preprocess_threads"]
+    loader = DataLoader(
+        ScoringDataset(todo),
+        batch_size=batch_size,
+        num_workers=num_workers,
+        collate_fn=collate_scoring,
+        pin_memory=analyzer.device.type == "cuda",
+        prefetch_factor=4 if num_workers > 0 else None
+    )
+
+    pending, pending_artifacts = [], []
+    scored = 0
+    start = time.perf_counter()
+    for indices, batch, failed in loader:
+        for idx, error in failed:
+            print(f"WARNING: Could not read {todo[idx]}: {error}")
+            pending.append(result_row(todo[idx], model_version, error=error))
+        if batch is not None:
+            batch_paths = [todo[i] for i in indices]
+            for path, result in zip(batch_paths, analyzer.analyze_batch(batch, batch_paths, segment, gradcam)):
+                row = result_row(path, model_version, result)
+                for artifact in ("segmentation", "heatmap"):
+                    if result.get(f"{artifact}_future") is not None:
+                        pending_artifacts.append((row, f"{artifact}_path", result[f"{artifact}_future"]))
+                pending.append(row)
+
+        if len(pending) >= checkpoint_every:
+            # Artifacts referenced by a part must be on disk before the part is written
+            artifacts.flush()
+            drop_failed_artifacts(pending_artifacts)
+            results.write(pending)
+            scored += len(pending)
+            pending, pending_artifacts = [], []
+            print(f"Scored {scored}/{len(todo)} images ({scored / (time.perf_counter() - start):.1f} images/sec)")
+
+    artifacts.flush()
+    drop_failed_artifacts(pending_artifacts)
+    results.write(pending)
+    scored += len(pending)
+    print(f"Scored {scored}/{len(todo)} images in {time.perf_counter() - start:.1f}s")
+    return scored
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-score an image archive with the current model weights")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input-dir", help="Directory to walk (recursively) for images")
+    source.add_argument("--manifest", help="CSV with a `path` column, or a text file with one path per line")
+    parser.add_argument("--output-dir", required=True, help="Directory for results part files")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="parquet")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--num-workers", type=int, default=None,
+                        help="Decoding workers (default: from the runtime thread plan, see PREPROCESS_THREADS)")
+    parser.add_argument("--segment", action="store_true", help="Segment images classified as diseased")
+    parser.add_argument("--gradcam", action="store_true", help="Save Grad-CAM heatmaps")
+    parser.add_argument("--checkpoint-every", type=int, default=1024,
+                        help="Write a results part (progress checkpoint) every N images")
+    args = parser.parse_args()
+
+    paths = list_images(args.input_dir) if args.input_dir else read_manifest(args.manifest)
+
+    # Split the cores between decoding workers and the models before anything starts threads
+    runtime.apply(workers=1)
+
+    # Imported here: loading the models is slow and not needed for --help
+    from backend.models.analyzers import analyzer
+    artifact_writer.prefix = SCORING_ARTIFACT_PREFIX
+    try:
+        score(
+            paths, args.output_dir, analyzer, format=args.format, batch_size=args.batch_size,
+            num_workers=args.num_workers, segment=args.segment, gradcam=args.gradcam,
+            checkpoint_every=args.checkpoint_every
+        )
+    finally:
+        artifact_writer.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from .utils.artifact_writer import ArtifactWriter
+from .utils.storage import LocalStorage
+
+@pytest.mark.parametrize("fmt,ext", [("png", ".png"), ("webp", ".webp"), ("jpeg", ".jpg")])
+def test_writer_returns_key_then_flushes(tmp_path, fmt, ext):
+    """Test that keys come back immediately and writes land after flush"""
+    store = LocalStorage(root=str(tmp_path))
+    writer = ArtifactWriter(store=store, max_workers=1,
+                            formats={"heatmaps": {"format": fmt, "png_compression": 1, "quality": 80}})
+    overlay = np.random.default_rng(0).integers(0, 255, size=(64, 64, 3), dtype=np.uint8)
+
+    key, _ = writer.submit_image("heatmaps", overlay)
+    assert key.startswith("heatmaps/") and key.endswith(ext)
+    assert writer.submit_image("heatmaps", overlay.copy())[0] == key
+
+    writer.shutdown()
+    assert store.exists(key)
+    assert len(list(tmp_path.rglob(f"*{ext}"))) == 1
+
+def test_failed_write_fails_the_future(tmp_path):
+    """Test that an encode or write error reaches the caller through the returned future"""
+    class FullDisk(LocalStorage):
+        def write(self, key, data):
+            raise OSError("No space left on device")
+    writer = ArtifactWriter(store=FullDisk(root=str(tmp_path)), max_workers=1)
+
+    _, future = writer.submit_bytes("segmentations", b"mask", ".msk")
+    with pytest.raises(OSError):
+        future.result(5)
+    _, future = writer.submit_image("heatmaps", np.zeros((4, 4, 3), dtype=np.uint8))
+    assert isinstance(future.exception(5), OSError)
+    writer.shutdown()
+    assert not list(tmp_path.rglob("*.*"))
@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+from .utils.auth import get_password_hash, verify_password_async
+
+def test_login_burst_does_not_block_event_loop():
+    """Test that a burst of bcrypt verifications leaves the event loop responsive"""
+    hashed = get_password_hash("correct-password")
+
+    async def scenario():
+        lags = []
+        stop = asyncio.Event()
+
+        async def heartbeat():
+            while not stop.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - start - 0.01)
+
+        probe = asyncio.create_task(heartbeat())
+        results = await asyncio.gather(
+            *[verify_password_async("correct-password", hashed) for _ in range(8)],
+            verify_password_async("wrong-password", hashed),
+        )
+        stop.set()
+        await probe
+        return results, lags
+
+    results, lags = asyncio.run(scenario())
+    assert results == [True] * 8 + [False]
+    # A single bcrypt call on the loop would stall it for ~250 ms
+    assert max(lags) < 0.1
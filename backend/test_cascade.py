@@ -0,0 +1,39 @@
+import torch
+import torch.nn.functional as F
+
+from .models import inference
+from .models.classification_model import DistillationLoss
+
+class FixedTriage:
+    """Triage stand-in returning preset class probabilities"""
+    def __init__(self, probs):
+        self.probs = torch.tensor(probs)
+
+    def predict(self, x):
+        return self.probs[:x.shape[0]]
+
+def test_distillation_loss_blends_labels_and_teacher():
+    """Test that the distillation term vanishes when the student matches the teacher"""
+    logits = torch.tensor([[2.0, -1.0], [0.5, 1.5]])
+    labels = torch.tensor([0, 1])
+    loss = DistillationLoss(temperature=4.0, alpha=0.5)
+    assert torch.isclose(loss(logits, labels), F.cross_entropy(logits, labels))
+    assert torch.isclose(loss(logits, labels, teacher_logits=logits), 0.5 * F.cross_entropy(logits, labels))
+    assert loss(logits, labels, teacher_logits=-logits) > loss(logits, labels, teacher_logits=logits)
+
+def test_cascade_settles_confident_normals_and_escalates_the_rest(monkeypatch):
+    """Test that only confident triage calls skip the full classifier and escalations are counted"""
+    monkeypatch.setattr(inference, "CASCADE_AUDIT_RATE", 0.0)
+    monkeypatch.setattr(inference, "CASCADE_THRESHOLD", 0.9)
+    analyzer = inference.MedicalImageAnalyzer()
+    # Confident normal, unsure normal, confident pneumonia (not in CASCADE_ACCEPT_CLASSES)
+    analyzer.triage = FixedTriage([[0.97, 0.03], [0.6, 0.4], [0.02, 0.98]])
+
+    results = analyzer.analyze_batch(torch.randn(3, 3, 224, 224), ["a", "b", "c"], segment=False, gradcam=False)
+
+    assert [r["classified_by"] for r in results] == ["triage", "full", "full"]
+    assert results[0]["prediction"] == "Normal" and results[0]["mc_samples"] == 0
+    assert results[0]["embedding"] is None and results[1]["embedding"].shape == (2048,)
+    stats = analyzer.cascade_stats()
+    assert stats["images"] == 3 and stats["escalated"] == 2
+    assert abs(stats["escalation_rate"] - 2 / 3) < 1e-9 and stats["audit_agreement"] is None
@@ -0,0 +1,27 @@
+import os
+
+import torch
+
+from .utils.checkpointing import CheckpointManager, capture_rng_state, restore_rng_state
+
+def test_checkpoints_round_trip_and_keep_last(tmp_path):
+    """Test that background checkpoints load back intact and only the last K are kept"""
+    manager = CheckpointManager(str(tmp_path), keep_last=2)
+    weights = torch.zeros(3)
+    for epoch in range(4):
+        weights += 1  # Mutated after save(): the snapshot must not see it
+        manager.save(epoch, {"epoch": epoch, "weights": weights})
+    manager.close()
+
+    assert [os.path.basename(p) for p in manager.checkpoints()] == ["epoch-0002.pt", "epoch-0003.pt"]
+    state = manager.load()
+    assert state["epoch"] == 3
+    assert torch.equal(state["weights"], torch.full((3,), 4.0))
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+def test_rng_state_restores_random_streams():
+    """Test that restoring the captured RNG state replays the same random numbers"""
+    state = capture_rng_state()
+    expected = torch.rand(5)
+    restore_rng_state(state)
+    assert torch.equal(torch.rand(5), expected)
@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+
+from .utils.embedding_index import EmbeddingStore, VECTORS_FILE
+
+def clustered(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(32, dim))
+    return centers[rng.integers(0, 32, n)] + 0.3 * rng.normal(size=(n, dim))
+
+def test_exact_search_filters_and_survives_torn_append(tmp_path):
+    """Test top-k search with user/exclude filters, and that a torn append doesn't misalign rows"""
+    store = EmbeddingStore(str(tmp_path), dim=16, block_rows=4)
+    vectors = clustered(20, 16)
+    store.add(np.arange(1, 21), np.arange(20) % 5 == 1, vectors)
+
+    # Simulate a crash after the vector write but before the row write
+    with open(os.path.join(tmp_path, VECTORS_FILE), "ab") as f:
+        f.write(np.zeros(16, dtype=np.float16).tobytes())
+    store.add(21, 1, vectors[6])
+
+    assert {pid for pid, _ in store.search(vectors[6], k=2)} == {7, 21}
+    assert np.allclose(store.vector(21), store.vector(7), atol=1e-3)
+    results = store.search(vectors[6], k=3, user_id=1, exclude_ids=[21])
+    assert [pid for pid, _ in results][0] == 7 and {pid for pid, _ in results} <= {2, 7, 12, 17}
+    assert results[0][1] >= results[1][1] >= results[2][1]
+
+def test_ivfpq_matches_exact_search(tmp_path):
+    """Test that IVF-PQ plus re-ranking finds the exact nearest neighbours on clustered data"""
+    store = EmbeddingStore(str(tmp_path), dim=64, block_rows=256)
+    vectors = clustered(3000, 64)
+    store.add(np.arange(3000), np.zeros(3000), vectors)
+    store.build_ivfpq(nlist=16, m=8, sample=2000)
+    store.add(3000, 0, vectors[7])  # Added after the build: searched exactly
+
+    queries = clustered(10, 64, seed=1)
+    for query in queries:
+        exact = [pid for pid, _ in store.search(query, k=5, exact=True)]
+        approx = [pid for pid, _ in store.search(query, k=5)]
+        assert len(set(exact) & set(approx)) >= 4
+    assert {pid for pid, _ in store.search(vectors[7], k=2)} == {7, 3000}
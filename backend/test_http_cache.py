@@ -0,0 +1,68 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from .main import app
+from .models.database_models import User, Prediction
+from .models.schemas import Prediction as PredictionSchema
+from .utils.auth import create_access_token
+from .utils.compression import brotli, choose_encoding
+
+client = TestClient(app)
+
+def make_user(db, predictions):
+    email = f"{uuid.uuid4().hex}@example.com"
+    user = User(email=email, username=email, hashed_password="x")
+    db.add(user)
+    db.commit()
+    for i in range(predictions):
+        db.add(Prediction(user_id=user.id, image_path=f"uploads/{i}.png", prediction_result="Normal",
+                          confidence_score=0.9, heatmap_path=f"heatmaps/{i}.png"))
+    db.commit()
+    return user, {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+def test_history_answers_304_until_a_prediction_changes(temp_db):
+    """Test that the ETag validates polls, changes with the history and the body matches the schema"""
+    db = temp_db()
+    user, auth = make_user(db, predictions=3)
+
+    first = client.get("/api/predictions/history", headers=auth)
+    assert first.status_code == 200 and first.headers["etag"].startswith('W/"')
+    rows = db.query(Prediction).filter(Prediction.user_id == user.id).all()
+    assert first.json() == [PredictionSchema.model_validate(p).model_dump(mode="json") for p in rows]
+
+    unchanged = client.get("/api/predictions/history", headers={**auth, "If-None-Match": first.headers["etag"]})
+    assert unchanged.status_code == 304 and unchanged.content == b""
+    since = client.get("/api/predictions/history", headers={**auth, "If-Modified-Since": first.headers["last-modified"]})
+    assert since.status_code == 304
+
+    detail = client.get(f"/api/predictions/{rows[0].id}", headers=auth)
+    assert detail.json() == first.json()[0]
+    rows[0].prediction_result = "Pneumonia"
+    db.commit()
+    changed = client.get("/api/predictions/history", headers={**auth, "If-None-Match": first.headers["etag"]})
+    assert changed.status_code == 200 and changed.headers["etag"] != first.headers["etag"]
+    assert client.get(f"/api/predictions/{rows[0].id}",
+                      headers={**auth, "If-None-Match": detail.headers["etag"]}).json()["prediction_result"] == "Pneumonia"
+
+    # Wildcards and stale validators never hide a missing or foreign prediction
+    other_user, _ = make_user(db, predictions=1)
+    foreign = db.query(Prediction).filter(Prediction.user_id == other_user.id).one()
+    for prediction_id in (foreign.id, foreign.id + 1000):
+        assert client.get(f"/api/predictions/{prediction_id}", headers={**auth, "If-None-Match": "*"}).status_code == 404
+    assert client.get(f"/api/predictions/{rows[0].id}", headers={**auth, "If-None-Match": "*"}).status_code == 304
+    db.close()
+
+def test_large_json_is_compressed_and_small_responses_are_not(temp_db):
+    """Test gzip negotiation for large JSON bodies only"""
+    db = temp_db()
+    _, auth = make_user(db, predictions=40)
+    db.close()
+
+    response = client.get("/api/predictions/history", headers={**auth, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and len(response.json()) == 40
+    assert int(response.headers["content-length"]) < len(response.content) / 3  # httpx decompresses .content
+    assert "content-encoding" not in client.get("/", headers={"Accept-Encoding": "gzip"}).headers
+
+    assert choose_encoding("gzip;q=0.5, br") == ("br" if brotli else "gzip")
+    assert choose_encoding("gzip;q=0, identity") is None
@@ -1,5 +1,7 @@
 from fastapi.testclient import TestClient
 from .main import app
+from .models.database_models import User
+from .utils.auth import create_access_token
 
 client = TestClient(app)
 
@@ -13,4 +15,19 @@ def test_api_docs():
     """Test that the API documentation is accessible"""
     response = client.get("/docs")
     assert response.status_code == 200
-    assert "swagger" in response.text.lower() 
\ No newline at end of file
+    assert "swagger" in response.text.lower() 
+
+def test_metrics_report_runtime_settings(temp_db):
+    """Test that /metrics requires a login and reports the thread plan and the settings in effect"""
+    assert client.get("/metrics").status_code == 401
+    db = temp_db()
+    db.add(User(email="metrics@example.com", username="metrics", hashed_password="x"))
+    db.commit()
+    db.close()
+    auth = {"Authorization": f"Bearer {create_access_token({'sub': 'metrics@example.com'})}"}
+    response = client.get("/metrics", headers=auth)
+    assert response.status_code == 200
+    runtime = response.json()["runtime"]
+    assert runtime["torch_threads"] == runtime["plan"]["inference_threads"]
+    assert set(response.json()) == {"runtime", "scheduler", "cascade", "models", "retention"}
+    assert "segmenter" in response.json()["models"]["models"]
@@ -0,0 +1,30 @@
+import numpy as np
+
+from .utils.mask_analysis import quantify_lesions, pack_boxes, unpack_boxes
+
+def test_quantify_lesions_batch():
+    """Test that batched labeling keeps lesions apart per image and in local coordinates"""
+    masks = np.zeros((3, 64, 64), dtype=np.float32)
+    masks[0, 60:64, 10:20] = 1        # Touches the bottom edge of image 0...
+    masks[1, 0:4, 10:20] = 1          # ...and this touches the top edge of image 1
+    masks[1, 30:40, 30:40] = 1
+    masks[2, 5:6, 5:6] = 1            # Below the minimum lesion area
+
+    results = quantify_lesions(masks, min_area=4)
+
+    assert [r["lesion_count"] for r in results] == [1, 2, 0]
+    assert [r["lesion_area"] for r in results] == [40, 140, 0]
+    assert results[0]["lesions"][0]["bbox"] == [10, 60, 10, 4]
+    assert sorted(l["bbox"] for l in results[1]["lesions"]) == [[10, 0, 10, 4], [30, 30, 10, 10]]
+    assert np.isclose(results[1]["involvement_pct"], 100 * 140 / 64 ** 2)
+
+def test_quantify_lesions_lung_field_and_boxes():
+    """Test involvement relative to a lung mask and bbox packing"""
+    mask = np.zeros((32, 32))
+    mask[0:8, 0:8] = 1
+    lung = np.zeros((32, 32))
+    lung[0:16, 0:16] = 1
+
+    result = quantify_lesions(mask, lung_masks=lung)[0]
+    assert result["involvement_pct"] == 25.0
+    assert unpack_boxes(pack_boxes(result["lesions"])) == [[0, 0, 8, 8]]
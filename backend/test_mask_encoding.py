@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from .utils.mask_encoding import encode_mask, decode_mask, read_mask_header
+
+@pytest.mark.parametrize("kind", ["empty", "full", "blobs", "noise"])
+def test_mask_roundtrip(kind):
+    """Test that masks survive encode/decode with either payload encoding"""
+    rng = np.random.default_rng(0)
+    mask = np.zeros((224, 224), dtype=np.float32)
+    if kind == "full":
+        mask[:] = 1
+    elif kind == "blobs":
+        mask[40:90, 30:80] = 1
+        mask[150:170, 120:200] = 1
+    elif kind == "noise":
+        mask = (rng.random((224, 224)) > 0.5).astype(np.float32)
+
+    data = encode_mask(mask, metadata={"lesions": [{"area": int(mask.sum())}]})
+    decoded, meta = decode_mask(data)
+
+    assert decoded.dtype == np.uint8
+    np.testing.assert_array_equal(decoded, mask.astype(np.uint8))
+    assert meta == {"lesions": [{"area": int(mask.sum())}]}
+
+def test_mask_encoding_picks_compact_payload():
+    """Test that blob masks use RLE and noisy masks fall back to packed bits"""
+    blobs = np.zeros((224, 224), dtype=np.uint8)
+    blobs[40:90, 30:80] = 1
+    noise = (np.random.default_rng(0).random((224, 224)) > 0.5).astype(np.uint8)
+
+    header, _ = read_mask_header(encode_mask(blobs))
+    assert header["encoding"] == "rle"
+    assert len(encode_mask(blobs)) < 224 * 224 // 8
+
+    header, _ = read_mask_header(encode_mask(noise))
+    assert header["encoding"] == "bits"
@@ -0,0 +1,44 @@
+import torch
+
+from .models.classification_model import MedicalImageClassifier, tta_views
+
+def make_model():
+    torch.manual_seed(0)
+    return MedicalImageClassifier(pretrained=False).eval()
+
+def test_features_feed_the_head_like_forward():
+    """Test that the shared backbone features plus the head reproduce forward() in eval mode"""
+    model = make_model()
+    x = torch.randn(2, 3, 64, 64)
+    with torch.inference_mode():
+        assert torch.allclose(model.resnet.fc(model.features(x)), model(x), atol=1e-5)
+
+def test_adaptive_sampling_stops_early_and_reports_samples():
+    """Test that adaptive MC stops once converged, respects the cap and reports samples per image"""
+    model = make_model()
+    x = torch.randn(3, 3, 64, 64)
+
+    mean, var, samples = model.adaptive_monte_carlo_inference(x, min_samples=4, max_samples=64, tolerance=0.5)
+    assert samples.tolist() == [4, 4, 4]  # The two halves of the first round agree
+    assert torch.allclose(mean.sum(dim=1), torch.ones(3), atol=1e-5)
+    assert (var >= 0).all()
+
+    _, _, samples = model.adaptive_monte_carlo_inference(x, min_samples=4, max_samples=12, tolerance=0.0)
+    assert samples.tolist() == [12, 12, 12]
+
+    pred, confidence, uncertainty, samples = model.predict_with_uncertainty(x, num_samples=5)
+    assert samples.tolist() == [5, 5, 5] and pred.shape == confidence.shape == uncertainty.shape == (3,)
+
+def test_tta_views_pool_into_one_distribution():
+    """Test that TTA views are batched view-major and pooled with the head samples per image"""
+    model = make_model()
+    x = torch.randn(2, 3, 64, 64)
+    views, num_views = tta_views(x, flip=True, angles=(-5.0, 5.0))
+    assert num_views == 4 and views.shape == (8, 3, 64, 64)
+    assert torch.equal(views[2:4], torch.flip(x, dims=[3]))
+
+    mean, var = model.monte_carlo_inference(x, num_samples=3, flip=True, angles=(-5.0, 5.0))
+    assert mean.shape == var.shape == (2, 2)
+    mean, _, samples = model.adaptive_monte_carlo_inference(x, min_samples=4, max_samples=8, tolerance=0.0, flip=True)
+    assert samples.tolist() == [8, 8]  # Per view
+    assert torch.allclose(mean.sum(dim=1), torch.ones(2), atol=1e-5)
@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, RLELossless, SecondaryCaptureImageStorage, generate_uid
+
+from .utils.medical_images import apply_window, is_medical_image, iter_frames, load_preview, read_metadata
+from .utils.image_processing import prepare_image
+
+def write_dicom(path, frames, compress=False):
+    meta = FileMetaDataset()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    meta.MediaStorageSOPClassUID = SecondaryCaptureImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Rows, ds.Columns = frames.shape[1:]
+    ds.NumberOfFrames = len(frames)
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 12, 11, 0
+    ds.WindowCenter, ds.WindowWidth = 1024, 1024
+    ds.PixelData = frames.astype(np.uint16).tobytes()
+    if compress:
+        ds.compress(RLELossless)
+    ds.save_as(path, enforce_file_format=True)
+
+def test_dicom_frames_stream_with_metadata_and_windowing(tmp_path):
+    """Test that multi-frame DICOM (raw and RLE) streams frame by frame and windows to 8 bits"""
+    frames = np.random.default_rng(0).integers(0, 4096, size=(3, 40, 50)).astype(np.uint16)
+    for compress in (False, True):
+        path = str(tmp_path / f"study-{compress}.dcm")
+        write_dicom(path, frames, compress)
+
+        metadata = read_metadata(path)
+        assert (metadata["frames"], metadata["rows"], metadata["columns"], metadata["bits"]) == (3, 40, 50, 12)
+        assert (metadata["window_center"], metadata["window_width"]) == (1024, 1024)
+
+        streamed = list(iter_frames(path))
+        assert len(streamed) == 3 and all(np.array_equal(a, b) for a, b in zip(streamed, frames))
+        assert np.array_equal(next(iter_frames(path, [2])), frames[2])
+
+    windowed = apply_window(np.array([0, 512, 1024, 1535, 4095]), center=1024, width=1024)
+    assert windowed[0] == windowed[1] == 0 and windowed[-1] == windowed[-2] == 255
+    assert 120 <= windowed[2] <= 135
+
+    preview = load_preview(path, size=16)
+    assert preview.shape == (16, 16, 3) and preview.dtype == np.uint8
+    assert is_medical_image(path)
+
+def test_sixteen_bit_png_keeps_dynamic_range(tmp_path):
+    """Test that a 16-bit PNG is windowed over its full range instead of truncated to 8 bits"""
+    path = str(tmp_path / "xray.png")
+    gradient = np.tile(np.linspace(0, 4095, 256, dtype=np.uint16), (256, 1))
+    cv2.imwrite(path, gradient)
+
+    assert read_metadata(path)["bits"] == 16 and is_medical_image(path)
+    preview = load_preview(path, size=224)
+    assert preview[..., 0].min() == 0 and preview[..., 0].max() == 255
+    assert prepare_image(path).shape == (1, 3, 224, 224)
+
+    plain = str(tmp_path / "plain.png")
+    cv2.imwrite(plain, (gradient >> 4).astype(np.uint8))
+    assert not is_medical_image(plain)
@@ -0,0 +1,21 @@
+import numpy as np
+import torch
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+
+from .utils.metrics import ConfusionMatrix
+
+def test_streaming_confusion_matrix_matches_sklearn():
+    """Test that streamed batches give the same metrics as sklearn on the full lists"""
+    rng = np.random.default_rng(0)
+    targets = rng.integers(0, 3, size=1000)
+    preds = np.where(rng.random(1000) < 0.7, targets, rng.integers(0, 3, size=1000))
+    preds[preds == 2] = 1  # Class 2 is never predicted: exercises zero_division
+
+    metrics = ConfusionMatrix(3)
+    for start in range(0, 1000, 64):
+        metrics.update(torch.from_numpy(preds[start:start + 64]), torch.from_numpy(targets[start:start + 64]))
+    results = metrics.compute_host()
+
+    assert np.isclose(results["accuracy"], accuracy_score(targets, preds))
+    for name, fn in [("precision", precision_score), ("recall", recall_score), ("f1", f1_score)]:
+        assert np.isclose(results[name], fn(targets, preds, average="weighted", zero_division=0))
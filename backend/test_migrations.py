@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from .models.database_models import ADDED_COLUMNS, User, Prediction, migrate_schema
+
+# Tables as the first release created them
+INITIAL_SCHEMA = [
+    """CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR, username VARCHAR, hashed_password VARCHAR,
+                           is_active BOOLEAN, created_at DATETIME)""",
+    """CREATE TABLE predictions (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES users(id), image_path VARCHAR,
+                                 prediction_result VARCHAR, confidence_score FLOAT, segmentation_path VARCHAR,
+                                 heatmap_path VARCHAR, created_at DATETIME)""",
+    "INSERT INTO users (id, email, username, hashed_password, is_active) VALUES (1, 'a@example.com', 'a', 'x', 1)",
+    "INSERT INTO predictions (user_id, image_path, prediction_result, confidence_score) VALUES (1, 'a.png', 'Normal', 0.9)"
+]
+
+def test_migrate_schema_upgrades_an_initial_database(tmp_path):
+    """Test that existing tables gain the new columns and indexes, idempotently, and work through the ORM"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        for statement in INITIAL_SCHEMA:
+            connection.execute(text(statement))
+
+    migrate_schema(engine)
+    migrate_schema(engine)
+    inspector = inspect(engine)
+    for attribute in ADDED_COLUMNS:
+        column = attribute.property.columns[0]
+        assert column.name in {c["name"] for c in inspector.get_columns(column.table.name)}
+    assert "ix_predictions_lesion_count" in {i["name"] for i in inspector.get_indexes("predictions")}
+
+    db = sessionmaker(bind=engine)()
+    user = db.query(User).one()
+    assert user.history_version == 0 and db.query(Prediction).one().lesion_count is None
+    db.add(Prediction(user_id=user.id, image_path="b.png", prediction_result="Pneumonia", confidence_score=0.8))
+    db.commit()
+    db.refresh(user)
+    assert user.history_version == 1 and user.history_updated_at is not None
+    db.close()
@@ -0,0 +1,118 @@
+import threading
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+import torch
+from fastapi.testclient import TestClient
+
+from .main import app
+from .api import predictions
+from .models import inference
+from .models.analyzers import Analyzer
+from .models.database_models import User, Prediction
+from .models.classification_model import MedicalImageClassifier
+from .utils.artifact_writer import ArtifactWriter
+from .utils.image_processing import generate_gradcam, prepare_image
+from .utils.storage import LocalStorage
+from .utils.auth import create_access_token
+
+class RecordingSegmenter:
+    """Segmenter stand-in recording the batch size of every call"""
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, x):
+        self.calls.append(x.shape[0])
+        return torch.zeros(x.shape[0], 1, x.shape[2], x.shape[3])
+
+def fixed_classes(classes):
+    """predict_with_uncertainty stand-in returning preset classes"""
+    def predict_with_uncertainty(x, **kwargs):
+        n = x.shape[0]
+        return (torch.tensor(classes[:n]), torch.full((n,), 0.9), torch.zeros(n),
+                torch.full((n,), 8), torch.zeros(n, 2048))
+    return predict_with_uncertainty
+
+def test_speculative_segmentation_is_used_for_positives_and_cancelled_for_negatives(monkeypatch):
+    """Test that the speculative masks serve positives without a second pass and negatives cancel it"""
+    monkeypatch.setattr(inference, "INFERENCE_PIPELINE", "concurrent")
+    monkeypatch.setattr(inference, "SEGMENTATION_MODE", "resize")
+    monkeypatch.setattr(inference, "SPECULATIVE_MAX_BATCH", 4)
+    monkeypatch.setattr(inference, "save_segmentation", lambda mask, metadata=None: ("segmentations/x.npz", None))
+    analyzer = inference.MedicalImageAnalyzer()
+    analyzer.triage = None
+    analyzer.segmenter = RecordingSegmenter()
+    images = torch.randn(2, 3, 224, 224)
+
+    monkeypatch.setattr(analyzer.classifier, "predict_with_uncertainty", fixed_classes([0, 1]))
+    results = analyzer.analyze_batch(images, ["a", "b"], gradcam=False)
+    assert analyzer.segmenter.calls == [2]
+    assert results[0]["segmentation_path"] is None and results[1]["segmentation_path"] == "segmentations/x.npz"
+
+    # Hold the executor so the speculation is still queued when the batch comes back all negative
+    gate = threading.Event()
+    analyzer._segmentation_executor.submit(gate.wait, 5)
+    monkeypatch.setattr(analyzer.classifier, "predict_with_uncertainty", fixed_classes([0, 0]))
+    results = analyzer.analyze_batch(images, ["a", "b"], gradcam=False)
+    gate.set()
+    analyzer._segmentation_executor.shutdown(wait=True)
+    assert analyzer.segmenter.calls == [2]
+    assert all(r["segmentation_path"] is None for r in results)
+
+def test_gradcam_is_thread_safe_and_renders_behind_a_known_key(monkeypatch, tmp_path):
+    """Test that concurrent Grad-CAM matches serial runs and the deferred heatmap lands under its key"""
+    torch.manual_seed(0)
+    model = MedicalImageClassifier(pretrained=False).eval()
+    inputs = [torch.randn(1, 3, 64, 64) for _ in range(4)]
+    expected = [generate_gradcam(model, x, model.get_gradcam_layer(), 1) for x in inputs]
+    heatmaps = [None] * len(inputs)
+
+    def run(i):
+        heatmaps[i] = generate_gradcam(model, inputs[i], model.get_gradcam_layer(), 1)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(inputs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(np.array_equal(h, e) for h, e in zip(heatmaps, expected))
+    assert all(p.grad is None for p in model.parameters())
+
+    store = LocalStorage(root=str(tmp_path / "artifacts"))
+    monkeypatch.setattr(inference, "artifact_writer", ArtifactWriter(store=store, max_workers=1))
+    monkeypatch.setattr(inference, "INFERENCE_PIPELINE", "concurrent")
+    analyzer = inference.MedicalImageAnalyzer()
+    analyzer.triage = None
+    assert isinstance(analyzer, Analyzer)
+    segmenter_loads = []
+    analyzer.models.register("segmenter", lambda: segmenter_loads.append(1))
+    image_path = str(tmp_path / "xray.png")
+    cv2.imwrite(image_path, np.random.default_rng(0).integers(0, 255, size=(96, 96, 3), dtype=np.uint8))
+
+    result = analyzer.analyze_batch(prepare_image(image_path), [image_path], segment=False)[0]
+    assert result["heatmap_path"].startswith("heatmaps/")
+    assert segmenter_loads == []  # Keying the heatmap by model version doesn't load the segmenter
+    result["heatmap_future"].result(30)
+    assert store.exists(result["heatmap_path"])
+
+def test_failed_heatmap_render_is_not_referenced_by_the_prediction(monkeypatch, temp_db):
+    """Test that the row is written after the deferred heatmap and without it when rendering failed"""
+    db = temp_db()
+    db.add(User(email="heatmap@example.com", username="heatmap", hashed_password="x"))
+    db.commit()
+
+    failed = Future()
+    failed.set_exception(RuntimeError("render failed"))
+    async def analyze(image_path, priority="routine", user_id=None):
+        return {"prediction": "Pneumonia", "confidence": 0.9, "heatmap_path": "heatmaps/missing.png",
+                "heatmap_future": failed}
+    monkeypatch.setattr(predictions, "save_uploaded_image", lambda file: "uploads/xray.png")
+    monkeypatch.setattr(predictions.inference_scheduler, "analyze", analyze)
+
+    response = TestClient(app).post(
+        "/api/predictions/analyze", files={"file": ("xray.png", b"png", "image/png")},
+        headers={"Authorization": f"Bearer {create_access_token({'sub': 'heatmap@example.com'})}"}
+    )
+    assert response.status_code == 200 and response.json()["heatmap_url"] is None
+    assert db.query(Prediction).one().heatmap_path is None
+    db.close()
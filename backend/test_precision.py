@@ -0,0 +1,33 @@
+import torch
+
+from .models.classification_model import MedicalImageClassifier
+from .models.segmentation_model import UNet
+from .utils.precision import PrecisionConfig
+
+def _run(model, x, config):
+    model = config.prepare_model(model)
+    with torch.inference_mode(), config.autocast(x.device):
+        return model(config.prepare_input(x)).float()
+
+def test_bf16_channels_last_classifier_agrees_with_fp32():
+    """Test that bf16 + channels_last ResNet-50 probabilities stay within tolerance of fp32"""
+    torch.manual_seed(0)
+    model = MedicalImageClassifier(pretrained=False).eval()
+    x = torch.randn(2, 3, 224, 224)
+
+    reference = torch.softmax(_run(model, x, PrecisionConfig("fp32", False)), dim=1)
+    fast = torch.softmax(_run(model, x, PrecisionConfig("bf16", True)), dim=1)
+
+    assert torch.allclose(reference, fast, atol=0.05)
+    assert torch.equal(reference.argmax(dim=1), fast.argmax(dim=1))
+
+def test_bf16_channels_last_unet_masks_agree_with_fp32():
+    """Test that thresholded UNet masks mostly agree between bf16 + channels_last and fp32"""
+    torch.manual_seed(0)
+    model = UNet().eval()
+    x = torch.randn(1, 3, 64, 64)
+
+    reference = _run(model, x, PrecisionConfig("fp32", False)) > 0
+    fast = _run(model, x, PrecisionConfig("bf16", True)) > 0
+
+    assert (reference == fast).float().mean() > 0.95
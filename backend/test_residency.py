@@ -0,0 +1,78 @@
+import threading
+import time
+
+import torch
+
+from .models.residency import ModelResidency, model_bytes
+
+def make_loader(calls, delay=0.0):
+    """Loader stand-in counting its calls"""
+    def loader():
+        calls.append(threading.get_ident())
+        time.sleep(delay)
+        torch.manual_seed(0)
+        return torch.nn.Conv2d(3, 8, 3).eval()
+    return loader
+
+def test_lazy_model_loads_once_and_reloads_from_the_mmap_cache(tmp_path):
+    """Test single-flight first load, idle unloading and an identical reload from the cache"""
+    calls = []
+    models = ModelResidency(mode="lazy", idle_timeout=60, cache_dir=str(tmp_path))
+    models.register("segmenter", make_loader(calls, delay=0.2), build=lambda: torch.nn.Conv2d(3, 8, 3))
+    assert calls == [] and models.available("segmenter")
+
+    loaded = []
+    threads = [threading.Thread(target=lambda: loaded.append(models.get("segmenter"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1 and all(model is loaded[0] for model in loaded)
+    x = torch.randn(1, 3, 8, 8)
+    expected = loaded[0](x)
+
+    with models.use("segmenter"):
+        assert models.sweep(now=time.monotonic() + 120) == []  # Borrowed models stay
+    assert models.sweep(now=time.monotonic() + 120) == ["segmenter"]
+    assert models.stats()["resident_bytes"] == 0
+
+    reloaded = models.get("segmenter")
+    stats = models.stats()["models"]["segmenter"]
+    assert len(calls) == 1 and stats["loads"] == 2 and stats["cache_loads"] == 1 and stats["idle_unloads"] == 1
+    assert torch.equal(reloaded(x), expected) and stats["resident_bytes"] == model_bytes(reloaded)
+
+def test_budget_unloads_least_recently_used_idle_models(tmp_path):
+    """Test LRU eviction under the memory budget, sparing pinned and borrowed models"""
+    calls = []
+    models = ModelResidency(mode="lazy", budget_mb=0.0015, idle_timeout=0, cache_dir=str(tmp_path))
+    models.put("classifier", torch.nn.Linear(4, 4))  # Pinned, 80 bytes
+    for name in ("a", "b", "c"):
+        models.register(name, make_loader(calls), build=lambda: torch.nn.Conv2d(3, 8, 3))  # 896 bytes each
+    models.get("a")
+    with models.use("b"):
+        models.get("c")
+        resident = {name for name, m in models.stats()["models"].items() if m["resident"]}
+        assert resident == {"classifier", "b", "c"}  # "a" was idle and least recently used
+    assert models.stats()["models"]["a"]["budget_unloads"] == 1
+
+    models.register("missing", lambda: None)
+    with models.use("missing") as model:
+        assert model is None
+    assert not models.available("missing")
+
+def test_failed_load_is_retried_after_the_backoff():
+    """Test that a transient load failure disables the model only until the retry time"""
+    calls = []
+    def flaky_loader():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("weights download timed out")
+        return torch.nn.Linear(4, 4)
+    models = ModelResidency(mode="lazy", cache_dir="", retry_seconds=0.2)
+    models.register("segmenter", flaky_loader)
+
+    assert models.get("segmenter") is None and not models.available("segmenter")
+    assert models.get("segmenter") is None and len(calls) == 1  # Not retried within the backoff
+    time.sleep(0.25)
+    assert models.available("segmenter") and isinstance(models.get("segmenter"), torch.nn.Linear)
+    assert len(calls) == 2 and models.stats()["models"]["segmenter"]["failed_loads"] == 1
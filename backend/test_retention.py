@@ -0,0 +1,92 @@
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from .models.database_models import User, Prediction
+from .utils.artifact_writer import ArtifactWriter
+from .utils.retention import RetentionJob
+from .utils.storage import LocalStorage
+
+DAY = 86400
+
+def make_user(db):
+    email = f"{uuid.uuid4().hex}@example.com"
+    user = User(email=email, username=email, hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user
+
+def store_old(store, kind, age, now):
+    """Store unique content with its mtime `age` seconds in the past"""
+    key = store.put(kind, uuid.uuid4().bytes, ".png")
+    os.utime(store.local_path(key), (now - age, now - age))
+    return key
+
+def test_expired_artifacts_are_cleared_and_orphans_deleted(tmp_path, temp_db):
+    """Test TTL expiry, orphan cleanup, the grace period, shared keys and dry runs"""
+    now = time.time()
+    store = LocalStorage(root=str(tmp_path / "store"))
+    db = temp_db()
+    user = make_user(db)
+    upload, expired, shared, orphan = (store_old(store, kind, 40 * DAY, now)
+                                       for kind in ("uploads", "heatmaps", "heatmaps", "uploads"))
+    fresh_orphan = store_old(store, "uploads", 60, now)
+    old = datetime.utcnow() - timedelta(days=40)
+    old_row = Prediction(user_id=user.id, image_path=upload, prediction_result="Normal", confidence_score=0.9,
+                         heatmap_path=expired, created_at=old)
+    shared_rows = [Prediction(user_id=user.id, image_path=upload, prediction_result="Normal", confidence_score=0.9,
+                              heatmap_path=shared, created_at=created_at) for created_at in (old, datetime.utcnow())]
+    db.add_all([old_row, *shared_rows])
+    db.commit()
+    version = user.history_version
+
+    job = RetentionJob(store=store, session_factory=temp_db, ttls={"uploads": 0, "heatmaps": 30},
+                       orphan_grace=3600, batch_size=2)
+    job.dry_run = True
+    stats = job.run(now=now)
+    assert (stats["expired"], stats["orphaned"], stats["rows_cleared"]) == (1, 1, 0)
+    assert all(store.exists(key) for key in (expired, orphan))
+
+    job.dry_run = False
+    stats = job.run(now=now)
+    assert (stats["scanned"], stats["expired"], stats["orphaned"], stats["rows_cleared"]) == (5, 1, 1, 1)
+    assert not store.exists(expired) and not store.exists(orphan)
+    assert all(store.exists(key) for key in (upload, shared, fresh_orphan))
+    db.expire_all()
+    assert old_row.heatmap_path is None and old_row.image_path == upload
+    assert [row.heatmap_path for row in shared_rows] == [shared, shared]
+    assert user.history_version > version
+    db.close()
+
+def test_storing_identical_content_again_protects_it_and_scoring_artifacts_are_kept(tmp_path, temp_db):
+    """Test that a re-upload refreshes an old orphan and batch-scoring artifacts are never swept"""
+    now = time.time()
+    store = LocalStorage(root=str(tmp_path / "store"))
+    data = uuid.uuid4().bytes
+    key = store.put("uploads", data, ".png")
+    os.utime(store.local_path(key), (now - 40 * DAY, now - 40 * DAY))
+    assert store.put("uploads", data, ".png") == key
+    assert list(store.scan("uploads"))[0][0] == key
+
+    writer = ArtifactWriter(store=store, max_workers=1, prefix="scoring")
+    scored, _ = writer.submit_bytes("heatmaps", uuid.uuid4().bytes, ".png")
+    writer.shutdown()
+    assert scored.startswith("scoring/heatmaps/")
+    os.utime(store.local_path(scored), (now - 40 * DAY, now - 40 * DAY))
+
+    stats = RetentionJob(store=store, session_factory=temp_db, ttls={}, orphan_grace=3600).run()
+    assert stats["orphaned"] == 0 and store.exists(key) and store.exists(scored)
+
+def test_failed_deletes_are_not_counted(tmp_path, temp_db):
+    """Test that orphans the store couldn't delete are left out of the stats and retried next run"""
+    class FailingStore(LocalStorage):
+        def delete_many(self, keys):
+            return super().delete_many([key for key in keys if key != stuck])
+    now = time.time()
+    store = FailingStore(root=str(tmp_path / "store"))
+    stuck, gone = (store_old(store, "uploads", 40 * DAY, now) for _ in range(2))
+
+    stats = RetentionJob(store=store, session_factory=temp_db, ttls={}, orphan_grace=3600).run(now=now)
+    assert stats["orphaned"] == 1 and stats["deleted_bytes"] == 16
+    assert store.exists(stuck) and not store.exists(gone)
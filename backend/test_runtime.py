@@ -0,0 +1,34 @@
+import os
+
+from .utils import runtime as runtime_module
+from .utils.runtime import CPURuntime, detect_topology, format_cpu_list, parse_cpu_list, plan_threads, worker_cpus
+
+def test_topology_is_read_from_sysfs_and_cgroup(monkeypatch, tmp_path):
+    """Test that NUMA nodes are limited to the affinity mask and the cgroup quota is rounded up"""
+    for node, cpus in (("node0", "0-3,8-11"), ("node1", "4-7,12-15")):
+        (tmp_path / "node" / node).mkdir(parents=True)
+        (tmp_path / "node" / node / "cpulist").write_text(cpus + "\n")
+    (tmp_path / "cgroup").mkdir()
+    (tmp_path / "cgroup" / "cpu.max").write_text("250000 100000\n")
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(12)), raising=False)
+
+    topology = detect_topology(str(tmp_path / "node"), str(tmp_path / "cgroup"))
+    assert [format_cpu_list(node) for node in topology["numa_nodes"]] == ["0-3,8-11", "4-7"]
+    assert topology["cpu_quota"] == 3
+    assert parse_cpu_list("0-2,5") == [0, 1, 2, 5] and format_cpu_list([5, 0, 2, 1]) == "0-2,5"
+
+def test_cores_split_between_workers_pools_and_numa_slices(monkeypatch, tmp_path):
+    """Test the per-worker thread split, NUMA-ordered core slices and lock-file slot claims"""
+    assert plan_threads(16, workers=4)["cores_per_worker"] == 4
+    assert (plan_threads(16, workers=4)["preprocess_threads"], plan_threads(16, workers=4)["inference_threads"]) == (1, 3)
+    assert plan_threads(16, workers=2, accelerator=True)["preprocess_threads"] == 7
+    assert plan_threads(2, workers=4, inference_threads=2)["inference_threads"] == 2
+
+    nodes = [[0, 1, 2, 3, 8, 9, 10, 11], [4, 5, 6, 7, 12, 13, 14, 15]]
+    assert worker_cpus(nodes, 4, 1) == [8, 9, 10, 11] and worker_cpus(nodes, 4, 2) == [4, 5, 6, 7]
+
+    monkeypatch.setattr(runtime_module, "CPU_SLOT_DIR", str(tmp_path))
+    topology = {"cpus": list(range(16)), "numa_nodes": nodes, "cpu_quota": 8}
+    first, second = (CPURuntime(workers=2, affinity="pin", topology=topology) for _ in range(2))
+    assert first.cores == 8 and first.plan["cores_per_worker"] == 4
+    assert (first._claim_slot(), second._claim_slot()) == (0, 1)
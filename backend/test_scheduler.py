@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+import torch
+
+from .models.scheduler import InferenceScheduler
+
+class GatedAnalyzer:
+    def __init__(self):
+        self.batches = []
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+
+    def analyze_batch(self, img_tensor, image_paths, segment=True, gradcam=True):
+        self.entered.set()
+        self.gate.wait(5)
+        if "bad" in image_paths:
+            raise ValueError("corrupt image")
+        self.batches.append(list(image_paths))
+        return [{"path": path} for path in image_paths]
+
+def test_stat_preempts_bulk_at_batch_boundary_and_users_share_fairly():
+    """Test that STAT runs right after the batch in flight and bulk users are served round-robin"""
+    analyzer = GatedAnalyzer()
+    scheduler = InferenceScheduler(
+        analyzer, weights={"stat": 16, "routine": 4, "bulk": 1},
+        batch_sizes={"stat": 1, "routine": 2, "bulk": 3}, slo_ms={"stat": 1000}
+    )
+    image = torch.zeros(1, 3, 8, 8)
+    futures = [scheduler.submit(image, "in-flight", "bulk", user_id=1)]
+    assert analyzer.entered.wait(5)
+
+    futures += [scheduler.submit(image, f"a{i}", "bulk", user_id=1) for i in range(1, 5)]
+    futures += [scheduler.submit(image, f"b{i}", "bulk", user_id=2) for i in range(1, 3)]
+    futures.append(scheduler.submit(image, "s1", "stat", user_id=3))
+    futures.append(scheduler.submit(image, "r1", "routine", user_id=3))
+    analyzer.gate.set()
+    assert [f.result(5)["path"] for f in futures][-2:] == ["s1", "r1"]
+    scheduler.shutdown()
+
+    assert analyzer.batches == [["in-flight"], ["s1"], ["r1"], ["a1", "b1", "a2"], ["b2", "a3", "a4"]]
+    stats = scheduler.stats()
+    assert stats["bulk"]["completed"] == 7 and stats["stat"]["queued"] == 0
+    assert stats["stat"]["p95_ms"] is not None and stats["stat"]["slo_met_pct"] == 100.0
+
+def test_batch_errors_reach_callers_and_priorities_are_validated():
+    """Test that a failing batch fails its futures and unknown priorities are rejected"""
+    analyzer = GatedAnalyzer()
+    analyzer.gate.set()
+    scheduler = InferenceScheduler(analyzer)
+    with pytest.raises(ValueError):
+        scheduler.submit(torch.zeros(1, 3, 8, 8), "x.png", priority="asap")
+    with pytest.raises(ValueError, match="corrupt"):
+        scheduler.submit(torch.zeros(1, 3, 8, 8), "bad", priority="stat").result(5)
+    scheduler.shutdown()
+
+def test_cancelled_queued_job_is_dropped_and_the_thread_keeps_running():
+    """Test that cancelling a queued job skips it without stopping the inference thread"""
+    analyzer = GatedAnalyzer()
+    scheduler = InferenceScheduler(analyzer, batch_sizes={"routine": 2})
+    image = torch.zeros(1, 3, 8, 8)
+    first = scheduler.submit(image, "in-flight", "routine", user_id=1)
+    assert analyzer.entered.wait(5)
+
+    cancelled = scheduler.submit(image, "cancelled", "routine", user_id=1)
+    queued = scheduler.submit(image, "queued", "routine", user_id=2)
+    assert cancelled.cancel()
+    analyzer.gate.set()
+    assert first.result(5)["path"] == "in-flight" and queued.result(5)["path"] == "queued"
+    assert scheduler.submit(image, "after", "stat").result(5)["path"] == "after"
+    scheduler.shutdown()
+    assert analyzer.batches == [["in-flight"], ["queued"], ["after"]]
@@ -0,0 +1,75 @@
+import os
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+import pytest
+import torch
+
+from .score import score, list_images, ResultWriter, result_row, drop_failed_artifacts
+
+class FakeAnalyzer:
+    device = torch.device("cpu")
+
+    def __init__(self, version):
+        self.version = version
+        self.scored = 0
+
+    def model_version(self):
+        return self.version
+
+    def analyze_batch(self, img_tensor, image_paths, segment=True, gradcam=True):
+        self.scored += len(image_paths)
+        return [
+            {"prediction": "Normal", "confidence": 0.9, "uncertainty": 0.01,
+             "segmentation_path": None, "heatmap_path": None, "lesion_stats": None}
+            for _ in image_paths
+        ]
+
+class NoArtifacts:
+    def flush(self):
+        pass
+
+@pytest.mark.parametrize("format", ["csv", "parquet"])
+def test_score_resumes_and_skips_same_model_version(tmp_path, format):
+    """Test that rerunning skips images already scored by the same model version and retries errors"""
+    if format == "parquet":
+        pytest.importorskip("pyarrow")
+    images = tmp_path / "images" / "nested"
+    images.mkdir(parents=True)
+    for i in range(5):
+        cv2.imwrite(str(images / f"{i}.png"), np.full((32, 32, 3), i * 40, dtype=np.uint8))
+    (images / "broken.png").write_bytes(b"not an image")
+    paths = list_images(str(tmp_path / "images"))
+    out = str(tmp_path / "results")
+
+    analyzer = FakeAnalyzer("v1")
+    assert score(paths, out, analyzer, format=format, batch_size=2, num_workers=0,
+                 checkpoint_every=2, artifacts=NoArtifacts()) == 6
+    assert analyzer.scored == 5
+    assert len(ResultWriter(out, format).parts()) == 3
+
+    # Same weights: only the unreadable file is retried, and once readable it's scored
+    assert score(paths, out, FakeAnalyzer("v1"), format=format, num_workers=0, artifacts=NoArtifacts()) == 1
+    cv2.imwrite(str(images / "broken.png"), np.zeros((32, 32, 3), dtype=np.uint8))
+    analyzer = FakeAnalyzer("v1")
+    assert score(paths, out, analyzer, format=format, num_workers=0, artifacts=NoArtifacts()) == 1
+    assert analyzer.scored == 1
+    assert ResultWriter(out, format).scored("v1") == set(paths)
+    assert score(paths, out, FakeAnalyzer("v1"), format=format, num_workers=0, artifacts=NoArtifacts()) == 0
+
+    # New weights: everything is re-scored
+    assert score(paths, out, FakeAnalyzer("v2"), format=format, num_workers=0, artifacts=NoArtifacts()) == 6
+    assert ResultWriter(out, format).scored("v2") == set(paths)
+    assert not [f for f in os.listdir(out) if f.endswith(".tmp")]
+
+def test_rows_drop_artifacts_whose_write_failed():
+    """Test that a failed background write clears the artifact path before the part is written"""
+    written, failed = Future(), Future()
+    written.set_result(None)
+    failed.set_exception(OSError("No space left on device"))
+    result = {"prediction": "Pneumonia", "confidence": 0.9, "uncertainty": 0.01, "lesion_stats": None,
+              "segmentation_path": "segmentations/a.msk", "heatmap_path": "heatmaps/a.png"}
+    row = result_row("a.png", "v1", result)
+    drop_failed_artifacts([(row, "segmentation_path", written), (row, "heatmap_path", failed)])
+    assert row["segmentation_path"] == "segmentations/a.msk" and row["heatmap_path"] is None
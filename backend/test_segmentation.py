@@ -0,0 +1,61 @@
+import os
+
+import cv2
+import numpy as np
+import torch
+
+from .models.segmentation_model import UNet, DiceBCELoss, IMAGE_MEAN, IMAGE_STD, tile_origins
+from .utils.segmentation_data import SegmentationDataset
+
+def test_gradient_checkpointing_matches_regular_backward():
+    """Test that checkpointed UNet blocks produce the same gradients"""
+    torch.manual_seed(0)
+    x = torch.randn(2, 3, 32, 32)
+    masks = (torch.rand(2, 1, 32, 32) > 0.5).float()
+    criterion = DiceBCELoss()
+
+    grads = []
+    for checkpointing in (False, True):
+        torch.manual_seed(1)
+        model = UNet().train()
+        model.set_gradient_checkpointing(checkpointing)
+        criterion(model(x), masks).backward()
+        grads.append(model.inc.double_conv[0].weight.grad.clone())
+
+    assert torch.allclose(grads[0], grads[1], atol=1e-5)
+
+def test_dice_bce_loss_is_low_for_confident_correct_logits():
+    """Test that Dice+BCE approaches zero when logits match the mask"""
+    masks = torch.zeros(1, 1, 16, 16)
+    masks[..., 4:12, 4:12] = 1
+    assert DiceBCELoss()(masks * 40 - 20, masks) < 1e-3
+    assert DiceBCELoss()(20 - masks * 40, masks) > 0.9
+
+def test_tiled_prediction_matches_single_pass_and_covers_image():
+    """Test that one-tile inference matches predict() and overlapping tiles cover odd-sized images"""
+    torch.manual_seed(0)
+    model = UNet().eval()
+    image = (np.random.default_rng(0).random((64, 64, 3)) * 255).astype(np.uint8)
+
+    x = torch.from_numpy(image).permute(2, 0, 1)[None].float() / 255
+    x = (x - torch.tensor(IMAGE_MEAN).view(1, 3, 1, 1)) / torch.tensor(IMAGE_STD).view(1, 3, 1, 1)
+    expected = model.predict(x)[0, 0].numpy().astype(np.uint8)
+    assert np.array_equal(model.predict_tiled(image, tile_size=64, stride=64), expected)
+
+    assert tile_origins(100, 32, 24) == [0, 24, 48, 68]
+    mask = model.predict_tiled(image[:50, :45], tile_size=32, stride=24, batch_size=3)
+    assert mask.shape == (50, 45) and set(np.unique(mask)) <= {0, 1}
+
+def test_dataset_crops_at_native_scale_or_resizes_whole_images(tmp_path):
+    """Test that crop mode keeps the native scale and resize mode keeps the whole image"""
+    os.makedirs(tmp_path / "images")
+    os.makedirs(tmp_path / "masks")
+    mask = np.zeros((400, 600), dtype=np.uint8)
+    mask[:, :300] = 255
+    cv2.imwrite(str(tmp_path / "images" / "a.png"), np.full((400, 600, 3), 128, dtype=np.uint8))
+    cv2.imwrite(str(tmp_path / "masks" / "a.png"), mask)
+
+    image, crop_mask = SegmentationDataset(str(tmp_path), crop_size=256, train=False)[0]
+    assert image.shape == (3, 256, 256) and crop_mask[0, :, :128].all() and not crop_mask[0, :, 128:].any()
+    image, resized_mask = SegmentationDataset(str(tmp_path), train=False, resize_to=224)[0]
+    assert image.shape == (3, 224, 224) and resized_mask[0, :, :112].all() and not resized_mask[0, :, 112:].any()
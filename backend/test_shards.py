@@ -0,0 +1,58 @@
+import os
+import pickle
+
+import cv2
+import numpy as np
+import torch
+
+from .utils.shards import build_shards, ShardDataset, augment_uint8, _decode_resize
+
+def make_image_folder(root, per_class=3):
+    """Write a tiny ImageFolder tree with distinct random images"""
+    rng = np.random.default_rng(0)
+    for class_name in ("normal", "pneumonia"):
+        os.makedirs(root / class_name)
+        for i in range(per_class):
+            cv2.imwrite(str(root / class_name / f"{i}.png"), rng.integers(0, 255, size=(40, 48, 3), dtype=np.uint8))
+
+def test_shards_round_trip_as_zero_copy_views(tmp_path):
+    """Test that shards hold the decoded images and labels and samples wrap the map without copying"""
+    make_image_folder(tmp_path / "images")
+    build_shards(str(tmp_path / "images"), str(tmp_path / "shards"), size=32, shard_size=4, workers=1)
+
+    dataset = ShardDataset(str(tmp_path / "shards"))
+    assert len(dataset) == 6 and dataset.classes == ["normal", "pneumonia"] and len(dataset.shard_files) == 2
+    for idx, (class_name, i) in enumerate([(c, i) for c in ("normal", "pneumonia") for i in range(3)]):
+        tensor, label = dataset[idx]
+        expected = _decode_resize((str(tmp_path / "images" / class_name / f"{i}.png"), 32))
+        assert tensor.dtype == torch.uint8 and tensor.shape == (3, 32, 32) and label == (class_name == "pneumonia")
+        assert np.array_equal(tensor.permute(1, 2, 0).numpy(), expected)
+
+    tensor, _ = dataset[5]
+    assert np.shares_memory(tensor.numpy(), dataset._shards[1])
+    assert pickle.loads(pickle.dumps(dataset))._shards is None
+
+def test_augmentation_matches_flip_then_rotate_and_leaves_the_input_alone():
+    """Test that the folded flip+rotation equals flipping then rotating, without writing the input"""
+    img = cv2.GaussianBlur(np.random.default_rng(1).integers(0, 255, size=(32, 32, 3), dtype=np.uint8), (7, 7), 0)
+    original = img.copy()
+    for seed in range(8):
+        torch.manual_seed(seed)
+        flip = torch.rand(1).item() < 0.5
+        angle = (torch.rand(1).item() * 2 - 1) * 10
+        reference = np.ascontiguousarray(img[:, ::-1]) if flip else img
+        reference = cv2.warpAffine(reference, cv2.getRotationMatrix2D((16, 16), angle, 1.0), (32, 32),
+                                   flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        torch.manual_seed(seed)
+        augmented = augment_uint8(img)
+        # Equal up to interpolation rounding (the border pixels sample the zero padding differently)
+        assert np.abs(augmented.astype(int) - reference)[1:-1, 1:-1].max() <= 1 and augmented.flags["C_CONTIGUOUS"]
+    assert np.array_equal(img, original)
+
+    flips = []
+    for seed in range(8):
+        torch.manual_seed(seed)
+        out = augment_uint8(img, max_rotation=0)
+        flips.append(out is not img)
+        assert np.array_equal(out, img[:, ::-1] if flips[-1] else img)
+    assert any(flips) and not all(flips)
@@ -0,0 +1,96 @@
+import os
+import time
+
+import pytest
+
+from .utils.storage import LocalStorage, S3Storage, IMMUTABLE_CACHE_CONTROL
+
+def test_local_storage_is_sharded_and_deduplicated(tmp_path):
+    """Test that identical content maps to one sharded key and is written once"""
+    store = LocalStorage(root=str(tmp_path))
+    key = store.put("heatmaps", b"overlay-bytes", ".png")
+    digest = os.path.basename(key)[:-len(".png")]
+
+    assert key == f"heatmaps/{digest[:2]}/{digest[2:4]}/{digest}.png"
+    assert store.put("heatmaps", b"overlay-bytes", ".png") == key
+    assert store.get(key) == b"overlay-bytes"
+    assert store.url(key) == f"/static/images/{key}"
+    assert len(list(tmp_path.rglob("*.png"))) == 1
+
+def test_local_storage_resolves_legacy_paths(tmp_path):
+    """Test that full paths stored before content addressing still resolve"""
+    store = LocalStorage(root=str(tmp_path))
+    legacy_path = os.path.join(str(tmp_path), "heatmaps", "1234_heatmap.png")
+    assert store.local_path(legacy_path) == legacy_path
+    assert store.url(legacy_path) == "/static/images/heatmaps/1234_heatmap.png"
+
+def test_s3_storage_against_local_stand_in(tmp_path):
+    """Test the S3 backend against moto's in-process S3 stand-in"""
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="artifacts")
+        store = S3Storage(bucket="artifacts", client=client, cache_dir=str(tmp_path),
+                          public_base_url="https://cdn.example.com")
+
+        key = store.put("uploads", b"image-bytes", ".png")
+        assert store.put("uploads", b"image-bytes", ".png") == key
+        head = client.head_object(Bucket="artifacts", Key=key)
+        assert head["CacheControl"] == IMMUTABLE_CACHE_CONTROL
+        assert store.url(key) == f"https://cdn.example.com/{key}"
+
+        # A replica with a cold cache downloads on first local access
+        cold = S3Storage(bucket="artifacts", client=client, cache_dir=str(tmp_path / "cold"))
+        with open(cold.local_path(key), "rb") as f:
+            assert f.read() == b"image-bytes"
+
+        store.delete(key)
+        assert not store.exists(key)
+
+def test_s3_touch_refreshes_the_object_itself(tmp_path):
+    """Test that touching (and re-storing) an S3 object resets its LastModified and keeps its headers"""
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="artifacts")
+        store = S3Storage(bucket="artifacts", client=client, cache_dir=str(tmp_path))
+        key = store.put("heatmaps", b"overlay-bytes", ".png")
+        written = client.head_object(Bucket="artifacts", Key=key)["LastModified"]
+
+        time.sleep(1.1)  # LastModified has whole seconds
+        store.touch(key)
+        head = client.head_object(Bucket="artifacts", Key=key)
+        assert head["LastModified"] > written and head["CacheControl"] == IMMUTABLE_CACHE_CONTROL
+        assert store.get(key) == b"overlay-bytes"
+        time.sleep(1.1)
+        assert store.put("heatmaps", b"overlay-bytes", ".png") == key
+        assert client.head_object(Bucket="artifacts", Key=key)["LastModified"] > head["LastModified"]
+        assert [k for k, _, _ in store.scan("heatmaps")] == [key]
+        store.touch("heatmaps/missing.png")  # Deleted meanwhile: nothing to refresh
+
+def test_s3_delete_many_reports_only_deleted_keys(tmp_path):
+    """Test that keys S3 fails to delete are logged, kept in the cache and not reported as deleted"""
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="artifacts")
+        store = S3Storage(bucket="artifacts", client=client, cache_dir=str(tmp_path))
+        keys = [store.put("heatmaps", data, ".png") for data in (b"a", b"b", b"c")]
+
+        delete_objects = client.delete_objects
+        def partly_failing(Bucket, Delete):
+            objects = [o for o in Delete["Objects"] if o["Key"] != keys[1]]
+            response = delete_objects(Bucket=Bucket, Delete={**Delete, "Objects": objects})
+            response["Errors"] = [{"Key": keys[1], "Code": "AccessDenied", "Message": "Access Denied"}]
+            return response
+        client.delete_objects = partly_failing
+
+        assert store.delete_many(keys) == [keys[0], keys[2]]
+        assert [store.exists(key) for key in keys] == [False, True, False]
+        assert store.cache.exists(keys[1]) and not store.cache.exists(keys[0])
@@ -0,0 +1,32 @@
+import pytest
+import torch
+
+from .models.analyzers import Analyzer, StubAnalyzer, create_analyzer
+from .models.scheduler import InferenceScheduler
+
+def test_stub_answers_deterministically_per_image():
+    """Test that the stub gives the same result for the same upload and lesion stats for positives"""
+    stub = StubAnalyzer(call_ms=0, image_ms=0, positive_rate=0.5)
+    paths = [f"uploads/{i}.png" for i in range(40)]
+    first = stub.analyze_batch(torch.zeros(len(paths), 3, 224, 224), paths)
+    again = stub.analyze_batch(torch.zeros(1, 3, 224, 224), ["other/dir/7.png"])[0]
+    assert again["prediction"] == first[7]["prediction"] and again["confidence"] == first[7]["confidence"]
+    assert (again["embedding"] == first[7]["embedding"]).all() and again["embedding"].shape == (2048,)
+
+    labels = {result["prediction"] for result in first}
+    assert labels == {"Normal", "Pneumonia"}
+    for result in first:
+        assert (result["lesion_stats"] is not None) == (result["prediction"] == "Pneumonia")
+    assert stub.analyze_batch(torch.zeros(40, 3, 224, 224), paths, segment=False)[0]["lesion_stats"] is None
+
+def test_stub_runs_behind_the_scheduler():
+    """Test that the scheduler serves the stub like the real analyzer and unknown backends are rejected"""
+    assert isinstance(StubAnalyzer(), Analyzer)
+    scheduler = InferenceScheduler(StubAnalyzer(call_ms=0, image_ms=1))
+    try:
+        future = scheduler.submit(torch.zeros(1, 3, 224, 224), "uploads/a.png", "stat", user_id=1)
+        assert future.result(timeout=5)["classified_by"] == "stub"
+    finally:
+        scheduler.shutdown()
+    with pytest.raises(ValueError):
+        create_analyzer("onnx")
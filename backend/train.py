@@ -1,15 +1,43 @@
 import os
+import time
+import argparse
+import resource
+import contextlib
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from torch.utils.data import DataLoader
+from torch.utils.data.distributed import DistributedSampler
+from torch.nn.parallel import DistributedDataParallel
 from torchvision import transforms, datasets
 import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
 
-from backend.models.classification_model import MedicalImageClassifier
-from backend.models.segmentation_model import UNet
+from backend.models.classification_model import (
+    MedicalImageClassifier,
+    TriageClassifier,
+    DistillationLoss,
+    TRIAGE_ARCHS,
+    load_model as load_classifier
+)
+from backend.models.segmentation_model import UNet, DiceBCELoss
+from backend.utils.segmentation_data import SegmentationDataset
+from backend.utils.shards import build_shards, shards_exist, ShardDataset, normalize_batch
+from backend.utils.metrics import ConfusionMatrix, StepLog
+from backend.utils.checkpointing import CheckpointManager, capture_rng_state, restore_rng_state
+from backend.evaluate import run_evaluation
+from backend.utils.runtime import runtime
+from backend.utils.precision import PrecisionConfig, precision as default_precision, PRECISION_MODES
+from backend.utils.distributed import (
+    init_distributed,
+    pin_threads,
+    cleanup_distributed,
+    is_distributed,
+    is_main_process,
+    all_reduce_sum,
+    local_rank,
+    world_size
+)
 
 # Training configuration
 CONFIG = {
@@ -18,10 +46,34 @@ CONFIG = {
         "learning_rate": 0.001,
         "epochs": 20,
         "num_classes": 2,
+        "log_every": 20,
         "model_save_path": os.path.join("backend", "models", "weights", "classifier.pth")
     },
+    "triage": {
+        # Small first-stage classifier for cascaded inference, distilled from the classifier
+        "arch": "mobilenet_v3_small",
+        "pretrained": True,  # Start from ImageNet weights
+        "batch_size": 64,
+        "learning_rate": 0.001,
+        "epochs": 15,
+        "temperature": 4.0,
+        "alpha": 0.7,  # Weight of the distillation term (0 = labels only)
+        "model_save_path": os.path.join("backend", "models", "weights", "triage.pth")
+    },
+    "loader": {
+        "num_workers": None,  # None: from the runtime thread plan (PREPROCESS_THREADS)
+        "prefetch_factor": 4,
+        "image_size": 224,
+        "shard_size": 4096
+    },
     "segmenter": {
-        "batch_size": 16,
+        "batch_size": 16,  # Effective batch: micro_batch_size * gradient accumulation steps
+        "micro_batch_size": 4,
+        # "crop": random native-resolution crops of crop_size, deployed with SEGMENTATION_MODE=tiled;
+        # "resize": whole images resized to the loader image_size, for SEGMENTATION_MODE=resize (the API default)
+        "input": "crop",
+        "crop_size": 256,
+        "gradient_checkpointing": True,
         "learning_rate": 0.001,
         "epochs": 30,
         "model_save_path": os.path.join("backend", "models", "weights", "segmenter.pth")
@@ -30,60 +82,176 @@ CONFIG = {
         "train_dir": os.path.join("backend", "data", "train"),
         "val_dir": os.path.join("backend", "data", "val"),
         "segmentation_train_dir": os.path.join("backend", "data", "segmentation", "train"),
-        "segmentation_val_dir": os.path.join("backend", "data", "segmentation", "val")
+        "segmentation_val_dir": os.path.join("backend", "data", "segmentation", "val"),
+        "train_shards": os.path.join("backend", "data", "shards", "train"),
+        "val_shards": os.path.join("backend", "data", "shards", "val")
+    },
+    "checkpoint": {
+        "dir": os.path.join("backend", "models", "checkpoints"),
+        "every_epochs": 1,
+        "keep_last": 3
     }
 }
 
-def train_classifier(device):
+TRAINABLE_MODELS = ("classifier", "triage", "segmenter")
+
+def prepare_data():
+    """
+    Decode and resize the classification datasets once into uint8 memmap shards
+    """
+    for image_dir, shard_dir in [
+        (CONFIG["data"]["train_dir"], CONFIG["data"]["train_shards"]),
+        (CONFIG["data"]["val_dir"], CONFIG["data"]["val_shards"]),
+    ]:
+        build_shards(
+            image_dir,
+            shard_dir,
+            size=CONFIG["loader"]["image_size"],
+            shard_size=CONFIG["loader"]["shard_size"]
+        )
+
+def make_loader(dataset, device, shuffle=False, batch_size=None):
+    """
+    DataLoader with parallel workers, pinned memory for CUDA and persistent workers
+
+    Under torchrun each rank gets a DistributedSampler shard of the dataset.
+    """
+    num_workers = CONFIG["loader"]["num_workers"]
+    if num_workers is None:
+        num_workers = runtime.plan["preprocess_threads"]
+    sampler = DistributedSampler(dataset, shuffle=shuffle) if is_distributed() else None
+    return DataLoader(
+        dataset,
+        batch_size=batch_size or CONFIG["classifier"]["batch_size"],
+        shuffle=shuffle and sampler is None,
+        sampler=sampler,
+        num_workers=num_workers,
+        pin_memory=device.type == "cuda",
+        persistent_workers=num_workers > 0,
+        prefetch_factor=CONFIG["loader"]["prefetch_factor"] if num_workers > 0 else None
+    )
+
+def wrap_distributed(model, device):
+    if not is_distributed():
+        return model
+    return DistributedDataParallel(model, device_ids=[device.index] if device.type == "cuda" else None)
+
+def unwrap(model):
+    return model.module if isinstance(model, DistributedDataParallel) else model
+
+def set_epoch(loader, epoch):
+    # Reshuffle each epoch consistently across ranks
+    if isinstance(loader.sampler, DistributedSampler):
+        loader.sampler.set_epoch(epoch)
+
+def log(message):
+    if is_main_process():
+        print(message)
+
+def peak_memory_mb(device):
+    """
+    Peak memory so far: allocator peak on CUDA, process max RSS on CPU
+    """
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated(device) / 2 ** 20
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+def make_checkpointer(name):
+    return CheckpointManager(
+        os.path.join(CONFIG["checkpoint"]["dir"], name),
+        keep_last=CONFIG["checkpoint"]["keep_last"]
+    )
+
+def save_checkpoint(checkpointer, model, optimizer, scheduler, epoch, global_step, best_val_loss):
+    """
+    Enqueue a full training checkpoint every `every_epochs` epochs (rank 0 only)
+    """
+    if not is_main_process() or (epoch + 1) % CONFIG["checkpoint"]["every_epochs"] != 0:
+        return
+    checkpointer.save(epoch, {
+        "epoch": epoch,
+        "global_step": global_step,
+        "best_val_loss": best_val_loss,
+        "model": unwrap(model).state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "scheduler": scheduler.state_dict(),
+        "rng": capture_rng_state()
+    })
+
+def resume_checkpoint(checkpointer, model, optimizer, scheduler):
+    """
+    Restore the latest checkpoint, returns (start_epoch, global_step, best_val_loss)
+    """
+    state = checkpointer.load()
+    if state is None:
+        log(f"INFO: No checkpoint found in {checkpointer.directory}, starting from scratch.")
+        return 0, 0, float('inf')
+    unwrap(model).load_state_dict(state["model"])
+    optimizer.load_state_dict(state["optimizer"])
+    scheduler.load_state_dict(state["scheduler"])
+    restore_rng_state(state["rng"])
+    log(f"Resumed from {checkpointer.latest()} (epoch {state['epoch']+1}, step {state['global_step']})")
+    return state["epoch"] + 1, state["global_step"], state["best_val_loss"]
+
+def make_classification_datasets():
+    """
+    Train and val datasets for the classifiers, returns (train, val, use_shards)
+    """
+    # Prefer pre-decoded uint8 shards (see --prepare-data); normalization then runs on-device
+    use_shards = shards_exist(CONFIG["data"]["train_shards"]) and shards_exist(CONFIG["data"]["val_shards"])
+    
+    if use_shards:
+        train_dataset = ShardDataset(CONFIG["data"]["train_shards"], augment=True)
+        val_dataset = ShardDataset(CONFIG["data"]["val_shards"])
+    else:
+        log("INFO: No prepared shards found, decoding images every epoch. Run with --prepare-data to speed this up.")
+        
+        # Data transformations
+        train_transform = transforms.Compose([
+            transforms.Resize((224, 224)),
+            transforms.RandomHorizontalFlip(),
+            transforms.RandomRotation(10),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        ])
+        
+        val_transform = transforms.Compose([
+            transforms.Resize((224, 224)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        ])
+        
+        # Load datasets
+        train_dataset = datasets.ImageFolder(
+            CONFIG["data"]["train_dir"], 
+            transform=train_transform
+        )
+        
+        val_dataset = datasets.ImageFolder(
+            CONFIG["data"]["val_dir"], 
+            transform=val_transform
+        )
+    return train_dataset, val_dataset, use_shards
+
+def train_classifier(device, precision=None, resume=False):
     """
     Train the classification model
     """
-    print("Training classification model...")
+    precision = precision or default_precision
+    log(f"Training classification model ({precision})...")
     
     # Ensure directories exist
     os.makedirs(os.path.dirname(CONFIG["classifier"]["model_save_path"]), exist_ok=True)
     
-    # Data transformations
-    train_transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.RandomHorizontalFlip(),
-        transforms.RandomRotation(10),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    
-    val_transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    
-    # Load datasets
-    train_dataset = datasets.ImageFolder(
-        CONFIG["data"]["train_dir"], 
-        transform=train_transform
-    )
-    
-    val_dataset = datasets.ImageFolder(
-        CONFIG["data"]["val_dir"], 
-        transform=val_transform
-    )
+    train_dataset, val_dataset, use_shards = make_classification_datasets()
     
     # Create data loaders
-    train_loader = DataLoader(
-        train_dataset, 
-        batch_size=CONFIG["classifier"]["batch_size"], 
-        shuffle=True
-    )
-    
-    val_loader = DataLoader(
-        val_dataset, 
-        batch_size=CONFIG["classifier"]["batch_size"]
-    )
+    train_loader = make_loader(train_dataset, device, shuffle=True)
+    val_loader = make_loader(val_dataset, device)
     
     # Initialize model
     model = MedicalImageClassifier(num_classes=CONFIG["classifier"]["num_classes"])
-    model = model.to(device)
+    model = wrap_distributed(precision.prepare_model(model.to(device)), device)
     
     # Loss function and optimizer
     criterion = nn.CrossEntropyLoss()
@@ -94,108 +262,381 @@ def train_classifier(device):
         optimizer, 'min', patience=3, factor=0.1, verbose=True
     )
     
+    # Full checkpoints (model, optimizer, scheduler, RNG) are written in the background
+    checkpointer = make_checkpointer("classifier")
+    start_epoch, global_step, best_val_loss = 0, 0, float('inf')
+    if resume:
+        start_epoch, global_step, best_val_loss = resume_checkpoint(checkpointer, model, optimizer, scheduler)
+    
     # Training loop
-    best_val_loss = float('inf')
+    num_classes = CONFIG["classifier"]["num_classes"]
+    log_every = CONFIG["classifier"]["log_every"]
+    train_metrics = ConfusionMatrix(num_classes, device)
+    step_log = StepLog()
     
-    for epoch in range(CONFIG["classifier"]["epochs"]):
+    for epoch in range(start_epoch, CONFIG["classifier"]["epochs"]):
         # Training phase
         model.train()
-        train_loss = 0.0
-        train_preds = []
-        train_targets = []
+        set_epoch(train_loader, epoch)
+        train_metrics.reset()
+        # Loss is summed on device; .item() every step would sync the device
+        train_loss_sum = torch.zeros((), device=device)
+        epoch_start = time.perf_counter()
         
-        for inputs, labels in train_loader:
-            inputs, labels = inputs.to(device), labels.to(device)
+        for step, (inputs, labels) in enumerate(train_loader):
+            inputs, labels = inputs.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+            if use_shards:
+                inputs = normalize_batch(inputs)
+            inputs = precision.prepare_input(inputs)
             
             # Zero the gradients
             optimizer.zero_grad()
             
-            # Forward pass
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
+            # Forward pass (bf16 autocast needs no loss scaling)
+            with precision.autocast(device):
+                outputs = model(inputs)
+                loss = criterion(outputs, labels)
             
             # Backward pass
             loss.backward()
             optimizer.step()
+            global_step += 1
             
             # Track statistics
-            train_loss += loss.item()
+            train_loss_sum += loss.detach()
             _, predicted = torch.max(outputs, 1)
-            train_preds.extend(predicted.cpu().numpy())
-            train_targets.extend(labels.cpu().numpy())
+            train_metrics.update(predicted, labels)
+            step_log.append(loss=loss, acc=(predicted == labels).float().mean())
+            
+            # Per-step values stay on device until the periodic flush
+            if (step + 1) % log_every == 0 and is_main_process():
+                steps = step_log.flush()
+                print(f"  Step {step+1}/{len(train_loader)}: "
+                      f"loss {sum(steps['loss']) / len(steps['loss']):.4f}, "
+                      f"acc {sum(steps['acc']) / len(steps['acc']):.4f}")
         
-        # Calculate training metrics
-        train_loss /= len(train_loader)
-        train_acc = accuracy_score(train_targets, train_preds)
+        # Calculate training metrics (summed across ranks when distributed)
+        step_log.flush()
+        train_loss = all_reduce_sum(train_loss_sum).item() / (len(train_loader) * world_size())
+        train_throughput = len(train_dataset) / (time.perf_counter() - epoch_start)
+        train_metrics.reduce()
+        train_acc = train_metrics.compute_host()["accuracy"]
         
         # Validation phase
-        model.eval()
-        val_loss = 0.0
-        val_preds = []
-        val_targets = []
-        
-        with torch.no_grad():
-            for inputs, labels in val_loader:
-                inputs, labels = inputs.to(device), labels.to(device)
-                
-                # Forward pass
-                outputs = model(inputs)
-                loss = criterion(outputs, labels)
-                
-                # Track statistics
-                val_loss += loss.item()
-                _, predicted = torch.max(outputs, 1)
-                val_preds.extend(predicted.cpu().numpy())
-                val_targets.extend(labels.cpu().numpy())
-        
-        # Calculate validation metrics
-        val_loss /= len(val_loader)
-        val_acc = accuracy_score(val_targets, val_preds)
-        val_precision = precision_score(val_targets, val_preds, average='weighted')
-        val_recall = recall_score(val_targets, val_preds, average='weighted')
-        val_f1 = f1_score(val_targets, val_preds, average='weighted')
+        val_loss, val_metrics = run_evaluation(
+            model, val_loader, device, num_classes, criterion=criterion, normalize=use_shards,
+            precision=precision
+        )
+        val_results = val_metrics.compute_host()
+        val_acc = val_results["accuracy"]
+        val_precision = val_results["precision"]
+        val_recall = val_results["recall"]
+        val_f1 = val_results["f1"]
         
         # Update learning rate
         scheduler.step(val_loss)
         
         # Print statistics
-        print(f"Epoch {epoch+1}/{CONFIG['classifier']['epochs']}")
-        print(f"Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.4f}")
-        print(f"Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.4f}")
-        print(f"Precision: {val_precision:.4f}, Recall: {val_recall:.4f}, F1: {val_f1:.4f}")
+        log(f"Epoch {epoch+1}/{CONFIG['classifier']['epochs']}")
+        log(f"Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.4f}, Throughput: {train_throughput:.1f} samples/sec")
+        log(f"Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.4f}")
+        log(f"Precision: {val_precision:.4f}, Recall: {val_recall:.4f}, F1: {val_f1:.4f}")
+        
+        # Save best model (every rank sees the same reduced val_loss; only rank 0 writes)
+        if val_loss < best_val_loss:
+            best_val_loss = val_loss
+            if is_main_process():
+                torch.save(unwrap(model).state_dict(), CONFIG["classifier"]["model_save_path"])
+                print(f"Model saved to {CONFIG['classifier']['model_save_path']}")
+        
+        save_checkpoint(checkpointer, model, optimizer, scheduler, epoch, global_step, best_val_loss)
+    
+    checkpointer.close()
+    log("Classification model training complete.")
+
+def train_triage(device, precision=None, resume=False):
+    """
+    Train the triage classifier, distilling from the trained classifier when available
+    """
+    precision = precision or default_precision
+    triage_config = CONFIG["triage"]
+    log(f"Training triage model ({triage_config['arch']}, {precision})...")
+    
+    os.makedirs(os.path.dirname(triage_config["model_save_path"]), exist_ok=True)
+    
+    train_dataset, val_dataset, use_shards = make_classification_datasets()
+    train_loader = make_loader(train_dataset, device, shuffle=True, batch_size=triage_config["batch_size"])
+    val_loader = make_loader(val_dataset, device, batch_size=triage_config["batch_size"])
+    
+    # The teacher only runs forward passes; it is not wrapped for DDP
+    teacher = None
+    teacher_path = CONFIG["classifier"]["model_save_path"]
+    if os.path.exists(teacher_path):
+        teacher = precision.prepare_model(
+            load_classifier(teacher_path, device, num_classes=CONFIG["classifier"]["num_classes"]).to(device)
+        )
+        log(f"Distilling from {teacher_path} (T={triage_config['temperature']}, alpha={triage_config['alpha']})")
+    else:
+        log(f"INFO: No trained classifier at {teacher_path}, training the triage model on labels only.")
+    
+    model = TriageClassifier(
+        num_classes=CONFIG["classifier"]["num_classes"],
+        pretrained=triage_config["pretrained"],
+        arch=triage_config["arch"]
+    )
+    model = wrap_distributed(precision.prepare_model(model.to(device)), device)
+    
+    criterion = DistillationLoss(temperature=triage_config["temperature"], alpha=triage_config["alpha"])
+    val_criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=triage_config["learning_rate"])
+    scheduler = optim.lr_scheduler.ReduceLROnPlateau(
+        optimizer, 'min', patience=3, factor=0.1, verbose=True
+    )
+    
+    checkpointer = make_checkpointer("triage")
+    start_epoch, global_step, best_val_loss = 0, 0, float('inf')
+    if resume:
+        start_epoch, global_step, best_val_loss = resume_checkpoint(checkpointer, model, optimizer, scheduler)
+    
+    num_classes = CONFIG["classifier"]["num_classes"]
+    for epoch in range(start_epoch, triage_config["epochs"]):
+        model.train()
+        set_epoch(train_loader, epoch)
+        train_loss_sum = torch.zeros((), device=device)
+        epoch_start = time.perf_counter()
+        
+        for inputs, labels in train_loader:
+            inputs, labels = inputs.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+            if use_shards:
+                inputs = normalize_batch(inputs)
+            inputs = precision.prepare_input(inputs)
+            
+            optimizer.zero_grad()
+            with precision.autocast(device):
+                teacher_logits = None
+                if teacher is not None:
+                    with torch.no_grad():
+                        teacher_logits = teacher(inputs)
+                outputs = model(inputs)
+                loss = criterion(outputs, labels, teacher_logits)
+            
+            loss.backward()
+            optimizer.step()
+            global_step += 1
+            train_loss_sum += loss.detach()
+        
+        train_loss = all_reduce_sum(train_loss_sum).item() / (len(train_loader) * world_size())
+        train_throughput = len(train_dataset) / (time.perf_counter() - epoch_start)
+        
+        # Validation against the labels (the cascade's own agreement report is in scripts/bench_cascade.py)
+        val_loss, val_metrics = run_evaluation(
+            model, val_loader, device, num_classes, criterion=val_criterion, normalize=use_shards,
+            precision=precision
+        )
+        val_results = val_metrics.compute_host()
+        scheduler.step(val_loss)
+        
+        log(f"Epoch {epoch+1}/{triage_config['epochs']}")
+        log(f"Train Loss: {train_loss:.4f}, Throughput: {train_throughput:.1f} samples/sec")
+        log(f"Val Loss: {val_loss:.4f}, Val Acc: {val_results['accuracy']:.4f}, "
+            f"Recall: {val_results['recall']:.4f}, F1: {val_results['f1']:.4f}")
         
-        # Save best model
         if val_loss < best_val_loss:
             best_val_loss = val_loss
-            torch.save(model.state_dict(), CONFIG["classifier"]["model_save_path"])
-            print(f"Model saved to {CONFIG['classifier']['model_save_path']}")
+            if is_main_process():
+                torch.save(unwrap(model).state_dict(), triage_config["model_save_path"])
+                print(f"Model saved to {triage_config['model_save_path']}")
+        
+        save_checkpoint(checkpointer, model, optimizer, scheduler, epoch, global_step, best_val_loss)
     
-    print("Classification model training complete.")
+    checkpointer.close()
+    log("Triage model training complete.")
 
-def train_segmenter(device):
+def train_segmenter(device, precision=None, resume=False):
     """
     Train the segmentation model
     """
-    print("Training segmentation model...")
+    precision = precision or default_precision
+    seg_config = CONFIG["segmenter"]
+    log(f"Training segmentation model ({precision})...")
     
     # Ensure directories exist
-    os.makedirs(os.path.dirname(CONFIG["segmenter"]["model_save_path"]), exist_ok=True)
+    os.makedirs(os.path.dirname(seg_config["model_save_path"]), exist_ok=True)
+    
+    # Paired data: <dir>/images/<name>.png with <dir>/masks/<name>.png
+    train_dir = CONFIG["data"]["segmentation_train_dir"]
+    val_dir = CONFIG["data"]["segmentation_val_dir"]
+    if not all(os.path.isdir(os.path.join(d, sub)) for d in (train_dir, val_dir) for sub in ("images", "masks")):
+        log(f"Segmentation data not found. Expected images/ and masks/ under {train_dir} and {val_dir}.")
+        return
     
-    # TODO: Implement custom dataset for segmentation
-    # This requires paired data (images and masks)
-    # For brevity, this implementation is left as a placeholder
+    # Random crops at full resolution keep memory fixed regardless of image size. Inference
+    # must segment at the same scale: tiled over the original image for crops, or the
+    # 224x224 model input for resized images (see SEGMENTATION_MODE).
+    resize_to = CONFIG["loader"]["image_size"] if seg_config["input"] == "resize" else None
+    train_dataset = SegmentationDataset(train_dir, crop_size=seg_config["crop_size"], train=True, resize_to=resize_to)
+    val_dataset = SegmentationDataset(val_dir, crop_size=seg_config["crop_size"], train=False, resize_to=resize_to)
     
-    print("Segmentation model training not implemented in this version.")
-    print("For a full implementation, you'll need paired data (images and masks).")
+    # Micro-batches with gradient accumulation give the configured effective batch size
+    micro_batch_size = seg_config["micro_batch_size"]
+    accumulation_steps = max(1, seg_config["batch_size"] // micro_batch_size)
+    train_loader = make_loader(train_dataset, device, shuffle=True, batch_size=micro_batch_size)
+    val_loader = make_loader(val_dataset, device, batch_size=micro_batch_size)
+    
+    # Initialize model
+    model = UNet()
+    model.set_gradient_checkpointing(seg_config["gradient_checkpointing"])
+    model = wrap_distributed(precision.prepare_model(model.to(device)), device)
+    
+    # Loss function and optimizer
+    criterion = DiceBCELoss()
+    optimizer = optim.Adam(model.parameters(), lr=seg_config["learning_rate"])
+    
+    # Learning rate scheduler
+    scheduler = optim.lr_scheduler.ReduceLROnPlateau(
+        optimizer, 'min', patience=3, factor=0.1, verbose=True
+    )
+    
+    inputs = f"resized to {resize_to}px" if resize_to else f"crop {seg_config['crop_size']}px"
+    log(f"Input {inputs} (use SEGMENTATION_MODE={'resize' if resize_to else 'tiled'}), micro-batch {micro_batch_size} x {accumulation_steps} accumulation steps, "
+          f"gradient checkpointing {'on' if seg_config['gradient_checkpointing'] else 'off'}")
+    
+    checkpointer = make_checkpointer("segmenter")
+    start_epoch, global_step, best_val_loss = 0, 0, float('inf')
+    if resume:
+        start_epoch, global_step, best_val_loss = resume_checkpoint(checkpointer, model, optimizer, scheduler)
+    
+    # Training loop
+    for epoch in range(start_epoch, seg_config["epochs"]):
+        # Training phase
+        model.train()
+        set_epoch(train_loader, epoch)
+        train_loss_sum = torch.zeros((), device=device)
+        epoch_start = time.perf_counter()
+        optimizer.zero_grad()
+        
+        for step, (images, masks) in enumerate(train_loader):
+            images = precision.prepare_input(normalize_batch(images.to(device, non_blocking=True)))
+            masks = masks.to(device, non_blocking=True)
+            
+            # Only all-reduce gradients on the micro-batch that completes an effective batch
+            stepping = (step + 1) % accumulation_steps == 0 or step + 1 == len(train_loader)
+            sync = contextlib.nullcontext() if stepping or not is_distributed() else model.no_sync()
+            
+            with sync:
+                # Forward pass, loss scaled so accumulated gradients average over the effective batch
+                with precision.autocast(device):
+                    logits = model(images)
+                loss = criterion(logits, masks) / accumulation_steps
+                
+                # Backward pass, stepping once per effective batch
+                loss.backward()
+            if stepping:
+                optimizer.step()
+                optimizer.zero_grad()
+                global_step += 1
+            
+            train_loss_sum += loss.detach() * accumulation_steps
+        
+        train_loss = all_reduce_sum(train_loss_sum).item() / (len(train_loader) * world_size())
+        train_throughput = len(train_dataset) / (time.perf_counter() - epoch_start)
+        
+        # Validation phase: loss and Dice over the whole set, accumulated on device
+        model.eval()
+        val_loss_sum = torch.zeros((), device=device)
+        intersection = torch.zeros((), device=device)
+        total = torch.zeros((), device=device)
+        
+        with torch.inference_mode():
+            for images, masks in val_loader:
+                images = precision.prepare_input(normalize_batch(images.to(device, non_blocking=True)))
+                masks = masks.to(device, non_blocking=True)
+                
+                with precision.autocast(device):
+                    logits = model(images)
+                val_loss_sum += criterion(logits, masks)
+                predicted = (logits.float() > 0).float()
+                intersection += (predicted * masks).sum()
+                total += predicted.sum() + masks.sum()
+        
+        all_reduce_sum(val_loss_sum)
+        all_reduce_sum(intersection)
+        all_reduce_sum(total)
+        val_loss = val_loss_sum.item() / (len(val_loader) * world_size())
+        val_dice = (2 * intersection / total.clamp(min=1)).item()
+        
+        # Update learning rate
+        scheduler.step(val_loss)
+        
+        # Print statistics
+        log(f"Epoch {epoch+1}/{seg_config['epochs']}")
+        log(f"Train Loss: {train_loss:.4f}, Throughput: {train_throughput:.1f} samples/sec, "
+            f"Peak memory (rank 0): {peak_memory_mb(device):.0f} MiB")
+        log(f"Val Loss: {val_loss:.4f}, Val Dice: {val_dice:.4f}")
+        
+        # Save best model (only rank 0 writes)
+        if val_loss < best_val_loss:
+            best_val_loss = val_loss
+            if is_main_process():
+                torch.save(unwrap(model).state_dict(), seg_config["model_save_path"])
+                print(f"Model saved to {seg_config['model_save_path']}")
+        
+        save_checkpoint(checkpointer, model, optimizer, scheduler, epoch, global_step, best_val_loss)
+    
+    checkpointer.close()
+    log("Segmentation model training complete.")
 
 def main():
-    # Set device
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}")
+    parser = argparse.ArgumentParser(description="Train the classification and segmentation models")
+    parser.add_argument("--prepare-data", action="store_true",
+                        help="Decode and resize datasets into memmap shards, then exit")
+    parser.add_argument("--precision", choices=PRECISION_MODES, default=default_precision.mode,
+                        help="Numeric precision (bf16 uses CPU/GPU autocast)")
+    parser.add_argument("--channels-last", action="store_true", default=default_precision.channels_last,
+                        help="Use channels_last memory format for convolutions")
+    parser.add_argument("--models", nargs="+", choices=TRAINABLE_MODELS, default=list(TRAINABLE_MODELS),
+                        help="Models to train, in this order (the triage model distills from the classifier)")
+    parser.add_argument("--triage-arch", choices=TRIAGE_ARCHS, default=CONFIG["triage"]["arch"],
+                        help="Backbone of the triage model")
+    parser.add_argument("--segmenter-input", choices=("crop", "resize"), default=CONFIG["segmenter"]["input"],
+                        help="Train the UNet on native-resolution crops (SEGMENTATION_MODE=tiled) "
+                             "or whole resized images (SEGMENTATION_MODE=resize)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume each model from its latest checkpoint in " + CONFIG["checkpoint"]["dir"])
+    args = parser.parse_args()
+    
+    if args.prepare_data:
+        prepare_data()
+        return
+    
+    # Set device (one GPU per rank under torchrun)
+    if torch.cuda.is_available():
+        device = torch.device("cuda", local_rank())
+        torch.cuda.set_device(device)
+    else:
+        device = torch.device("cpu")
+    
+    # Multi-process data parallel when launched with torchrun, e.g.
+    #   torchrun --standalone --nproc_per_node=8 -m backend.train
+    init_distributed(device)
+    settings = pin_threads(device)
+    log(f"CPU threads: {settings['plan']['inference_threads']} for the model, "
+        f"{settings['plan']['preprocess_threads']} loader workers, affinity {settings['affinity']}")
+    log(f"Using device: {device}, world size: {world_size()}")
     
     # Train models
-    train_classifier(device)
-    train_segmenter(device)
+    precision = PrecisionConfig(args.precision, args.channels_last)
+    try:
+        CONFIG["triage"]["arch"] = args.triage_arch
+        CONFIG["segmenter"]["input"] = args.segmenter_input
+        if "classifier" in args.models:
+            train_classifier(device, precision, resume=args.resume)
+        if "triage" in args.models:
+            train_triage(device, precision, resume=args.resume)
+        if "segmenter" in args.models:
+            train_segmenter(device, precision, resume=args.resume)
+    finally:
+        cleanup_distributed()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
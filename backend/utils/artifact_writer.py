@@ -0,0 +1,131 @@
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+
+from backend.utils.storage import storage, content_key, key_for_digest
+
+# Number of background threads encoding and writing artifacts
+ARTIFACT_WRITER_WORKERS = int(os.getenv("ARTIFACT_WRITER_WORKERS", "2"))
+
+# Per-artifact-type encoding, configurable from the environment
+# format: png | webp | jpeg; png_compression: 0-9 (1 is fast); quality: 1-100 for webp/jpeg
+ARTIFACT_FORMATS = {
+    "heatmaps": {
+        "format": os.getenv("HEATMAP_FORMAT", "png"),
+        "png_compression": int(os.getenv("HEATMAP_PNG_COMPRESSION", "1")),
+        "quality": int(os.getenv("HEATMAP_QUALITY", "85")),
+    },
+}
+DEFAULT_FORMAT = {"format": "png", "png_compression": 1, "quality": 85}
+
+FORMAT_EXTENSIONS = {"png": ".png", "webp": ".webp", "jpeg": ".jpg"}
+
+def encode_image(image, format="png", png_compression=1, quality=85):
+    """
+    Encode an image array with OpenCV, returns the encoded bytes
+    """
+    if format == "png":
+        params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    elif format == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+    elif format == "jpeg":
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    else:
+        raise ValueError(f"Unsupported artifact format '{format}'. Use png, webp or jpeg.")
+
+    ok, encoded = cv2.imencode(FORMAT_EXTENSIONS[format], image, params)
+    if not ok:
+        raise ValueError(f"Failed to encode image as {format}")
+    return encoded.tobytes()
+
+class ArtifactWriter:
+    """
+    Encodes and writes artifacts on a background thread pool
+
+    Keys are derived before encoding (from the pixels and encoding settings for
+    images, from the bytes otherwise), so callers get the key as soon as the write
+    is enqueued, with a future that fails if the write does: check it before
+    persisting the key anywhere. With a prefix, keys go under it (e.g. scoring/heatmaps/...).
+    Call flush() to wait for pending writes, shutdown() on exit.
+    """
+    def __init__(self, store=None, max_workers=ARTIFACT_WRITER_WORKERS, formats=None, prefix=""):
+        self.store = store or storage
+        self.formats = formats or ARTIFACT_FORMATS
+        self.prefix = prefix
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="artifact-writer")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit_image(self, kind, image):
+        options = self.formats.get(kind, DEFAULT_FORMAT)
+        ext = FORMAT_EXTENSIONS[options["format"]]
+
+        digest = hashlib.sha256(image.tobytes())
+        digest.update(repr((image.shape, image.dtype.str, sorted(options.items()))).encode("utf-8"))
+        key = key_for_digest(self._kind(kind), digest.hexdigest(), ext)
+
+        return key, self._submit(key, lambda: encode_image(image, **options))
+
+    def submit_rendered_image(self, kind, key_material, render):
+        """
+        Render, encode and write an image in the background, returns (key, future)
+
+        The key is derived from `key_material` (bytes identifying everything the
+        rendering depends on) and the encoding settings, so it is known before
+        render() runs, and an existing artifact skips the rendering altogether.
+        """
+        options = self.formats.get(kind, DEFAULT_FORMAT)
+        ext = FORMAT_EXTENSIONS[options["format"]]
+
+        digest = hashlib.sha256(key_material)
+        digest.update(repr(sorted(options.items())).encode("utf-8"))
+        key = key_for_digest(self._kind(kind), digest.hexdigest(), ext)
+
+        return key, self._submit(key, lambda: encode_image(render(), **options))
+
+    def submit_bytes(self, kind, data, ext):
+        key = content_key(self._kind(kind), data, ext)
+        return key, self._submit(key, lambda: data)
+
+    def _kind(self, kind):
+        return f"{self.prefix}/{kind}" if self.prefix else kind
+
+    def _submit(self, key, produce):
+        future = self.executor.submit(self._write, key, produce)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def _write(self, key, produce):
+        try:
+            exists = self.store.exists(key)
+            if not exists:
+                self.store.write(key, produce())
+        except Exception as e:
+            print(f"ERROR: Failed to write artifact {key}: {e}")
+            raise  # Fails the future, so the key isn't persisted
+        if exists:
+            try:
+                self.store.touch(key)  # Reused: keep it from looking old to retention
+            except Exception as e:
+                print(f"WARNING: Could not refresh artifact {key}: {e}")
+
+    def flush(self, timeout=None):
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def shutdown(self):
+        self.flush()
+        self.executor.shutdown(wait=True)
+
+# Create a singleton instance
+artifact_writer = ArtifactWriter()
@@ -0,0 +1,125 @@
+import os
+import re
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+CHECKPOINT_PATTERN = re.compile(r"^epoch-(\d+)\.pt$")
+
+def snapshot(obj):
+    """
+    Detached CPU copy of a (nested) state dict, safe to serialize while training continues
+    """
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {k: snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(v) for v in obj)
+    return obj
+
+def capture_rng_state():
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+def restore_rng_state(state):
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+class CheckpointManager:
+    """
+    Writes full training checkpoints from a background thread and keeps the last K
+
+    save() snapshots the state to CPU memory on the calling thread (a copy, which
+    is fast), then serializes it on the writer thread. Files are written to a temp
+    file, fsynced and renamed, so a crash mid-write never leaves a truncated
+    checkpoint. At most one write is in flight: a new save() waits for the previous
+    one, which bounds memory to a single snapshot.
+    """
+    def __init__(self, directory, keep_last=3):
+        self.directory = directory
+        self.keep_last = max(1, keep_last)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoint-writer")
+        self._pending = None
+
+    def path_for(self, epoch):
+        return os.path.join(self.directory, f"epoch-{epoch:04d}.pt")
+
+    def checkpoints(self):
+        """
+        Existing checkpoint paths, oldest first
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        found = sorted(
+            (int(match.group(1)), name)
+            for name in os.listdir(self.directory)
+            if (match := CHECKPOINT_PATTERN.match(name))
+        )
+        return [os.path.join(self.directory, name) for _, name in found]
+
+    def latest(self):
+        checkpoints = self.checkpoints()
+        return checkpoints[-1] if checkpoints else None
+
+    def save(self, epoch, state):
+        """
+        Enqueue a checkpoint for `epoch`; returns as soon as the state is snapshotted
+        """
+        self.wait()
+        state = snapshot(state)
+        self._pending = self.executor.submit(self._write, self.path_for(epoch), state)
+        return self._pending
+
+    def _write(self, path, state):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                torch.save(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._prune()
+        return path
+
+    def _prune(self):
+        for path in self.checkpoints()[:-self.keep_last]:
+            os.remove(path)
+
+    def load(self, path=None, map_location="cpu"):
+        """
+        Load a checkpoint (the latest by default); returns None if there is none
+        """
+        path = path or self.latest()
+        if path is None:
+            return None
+        return torch.load(path, map_location=map_location)
+
+    def wait(self):
+        """
+        Block until the in-flight write finishes, re-raising its error if it failed
+        """
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self):
+        self.wait()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,62 @@
+import os
+import torch
+import torch.distributed as dist
+
+from backend.utils.runtime import runtime
+
+# torchrun sets these; a plain `python -m backend.train` run is a world of one
+def world_size():
+    return int(os.getenv("WORLD_SIZE", "1"))
+
+def rank():
+    return int(os.getenv("RANK", "0"))
+
+def local_rank():
+    return int(os.getenv("LOCAL_RANK", "0"))
+
+def local_world_size():
+    return int(os.getenv("LOCAL_WORLD_SIZE", str(world_size())))
+
+def is_distributed():
+    return dist.is_available() and dist.is_initialized()
+
+def is_main_process():
+    return rank() == 0
+
+def pin_threads(device):
+    """
+    Split the host's cores between the local ranks, and within a rank between loader workers and the model
+
+    CPU ranks under torchrun are also pinned to their own slice of cores (NUMA nodes kept
+    together). Without this every rank, and every loader worker, starts one OpenMP
+    thread per core and they oversubscribe. Returns the runtime settings.
+    """
+    pin = True if is_distributed() and device.type == "cpu" else None  # None: CPU_AFFINITY decides
+    return runtime.apply(workers=local_world_size(), slot=local_rank(), pin=pin, accelerator=device.type == "cuda")
+
+def init_distributed(device):
+    """
+    Initialize the process group when launched by torchrun (gloo on CPU, nccl on CUDA)
+    """
+    if world_size() <= 1:
+        return False
+    backend = "nccl" if device.type == "cuda" else "gloo"
+    dist.init_process_group(backend=backend)
+    print(f"Rank {rank()}/{world_size()} ({backend}) initialized")
+    return True
+
+def cleanup_distributed():
+    if is_distributed():
+        dist.destroy_process_group()
+
+def all_reduce_sum(tensor):
+    """
+    Sum a tensor across ranks in place (no-op when not distributed)
+    """
+    if is_distributed():
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor
+
+def barrier():
+    if is_distributed():
+        dist.barrier()
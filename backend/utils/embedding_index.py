@@ -0,0 +1,315 @@
+import os
+import fcntl
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+import torch
+
+# Where the embedding matrix, its ID map and the optional IVF-PQ index live
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", os.path.join("backend", "data", "embeddings"))
+# Rows scored per matrix multiply in exact search (bounds the float32 working set)
+EMBEDDING_BLOCK_ROWS = int(os.getenv("EMBEDDING_BLOCK_ROWS", "1024"))
+# IVF lists probed per query, and candidates re-ranked exactly, when an IVF-PQ index exists
+EMBEDDING_NPROBE = int(os.getenv("EMBEDDING_NPROBE", "16"))
+EMBEDDING_RERANK = int(os.getenv("EMBEDDING_RERANK", "1024"))
+
+EMBEDDING_DIM = 2048  # ResNet-50 pooled features
+
+VECTORS_FILE = "vectors.f16"
+ROWS_FILE = "rows.i64"  # (prediction_id, user_id) per row
+IVFPQ_FILE = "ivfpq.npz"
+
+def normalize(vectors):
+    """
+    L2-normalize rows so inner product is cosine similarity
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+def _merge_topk(scores, rows, best_scores, best_rows, k):
+    scores = torch.cat([best_scores, scores])
+    rows = torch.cat([best_rows, rows])
+    top = torch.topk(scores, min(k, scores.numel())).indices
+    return scores[top], rows[top]
+
+class EmbeddingStore:
+    """
+    Append-only float16 embedding matrix with a (prediction_id, user_id) row map
+
+    Vectors and rows live in two flat files that are only ever appended to, and
+    are read through a memory map. The vector is appended before its row, and the
+    row count is what the reader trusts, so a crash between the two writes leaves
+    a consistent prefix. Exact search scans the matrix in blocks; an optional
+    IVF-PQ index (see build_ivfpq) answers approximate queries on large corpora.
+    """
+    def __init__(self, directory=EMBEDDING_INDEX_DIR, dim=EMBEDDING_DIM, block_rows=EMBEDDING_BLOCK_ROWS):
+        self.directory = directory
+        self.dim = dim
+        self.block_rows = block_rows
+        self._lock = threading.Lock()
+        self._rows = np.zeros((0, 2), dtype=np.int64)
+        self._vectors = None
+        self._ivfpq = None
+        self._ivfpq_mtime = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def __len__(self):
+        try:
+            rows = os.path.getsize(self._path(ROWS_FILE)) // 16
+            vectors = os.path.getsize(self._path(VECTORS_FILE)) // (self.dim * 2)
+        except FileNotFoundError:
+            return 0
+        return min(rows, vectors)
+
+    def add(self, prediction_ids, user_ids, embeddings):
+        """
+        Append embeddings (N x dim, or one vector) for the given prediction IDs
+        """
+        embeddings = normalize(np.atleast_2d(embeddings)).astype(np.float16)
+        rows = np.column_stack([np.atleast_1d(prediction_ids), np.atleast_1d(user_ids)]).astype(np.int64)
+        if embeddings.shape != (rows.shape[0], self.dim):
+            raise ValueError(f"Expected {rows.shape[0]} embeddings of dimension {self.dim}, got {embeddings.shape}")
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            # The file lock serializes appends across API worker processes
+            with open(self._path(ROWS_FILE), "ab") as rows_file:
+                fcntl.flock(rows_file, fcntl.LOCK_EX)
+                try:
+                    with open(self._path(VECTORS_FILE), "ab") as vectors_file:
+                        # Drop anything past the consistent prefix (an interrupted append)
+                        n = len(self)
+                        vectors_file.truncate(n * self.dim * 2)
+                        rows_file.truncate(n * 16)
+                        vectors_file.write(embeddings.tobytes())
+                    rows_file.write(rows.tobytes())
+                finally:
+                    fcntl.flock(rows_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """
+        Map any rows appended since the last call (by this or another process)
+        """
+        n = len(self)
+        with self._lock:
+            if n != self._rows.shape[0]:
+                with open(self._path(ROWS_FILE), "rb") as f:
+                    f.seek(self._rows.shape[0] * 16)
+                    tail = np.frombuffer(f.read((n - self._rows.shape[0]) * 16), dtype=np.int64).reshape(-1, 2)
+                self._rows = np.concatenate([self._rows, tail])
+                # Copy-on-write mapping: read-only on disk, but gives torch a writable buffer without copying
+                self._vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.float16, mode="c", shape=(n, self.dim))
+            return self._rows, self._vectors
+
+    def vector(self, prediction_id):
+        """
+        Stored (normalized) embedding of a prediction, or None
+        """
+        rows, vectors = self._refresh()
+        match = np.flatnonzero(rows[:, 0] == prediction_id)
+        return np.asarray(vectors[match[-1]], dtype=np.float32) if match.size else None
+
+    def search(self, query, k=5, user_id=None, exclude_ids=(), exact=False):
+        """
+        Top-k most similar predictions by cosine similarity, as [(prediction_id, score)]
+
+        Restricted to `user_id`'s predictions when given. Uses the IVF-PQ index when
+        one has been built (unless exact=True); rows added after the build are
+        always searched exactly.
+        """
+        rows, vectors = self._refresh()
+        if not rows.shape[0]:
+            return []
+        query = torch.from_numpy(normalize(query).reshape(-1))
+        allowed = np.ones(rows.shape[0], dtype=bool) if user_id is None else rows[:, 1] == user_id
+        if len(exclude_ids):
+            allowed &= ~np.isin(rows[:, 0], np.asarray(exclude_ids, dtype=np.int64))
+        candidates = np.flatnonzero(allowed)
+        best_scores, best_rows = torch.empty(0), torch.empty(0, dtype=torch.int64)
+        # float16 blocks are widened into one reused float32 buffer (fresh allocations
+        # per block cost more than the matrix-vector product)
+        buffer = torch.empty(self.block_rows, self.dim)
+
+        if candidates.size * 4 < rows.shape[0]:
+            # Selective filter (e.g. one user's studies): gather and score just those rows
+            for i in range(0, candidates.size, self.block_rows):
+                indices = candidates[i:i + self.block_rows]
+                block = buffer[:indices.size].copy_(torch.from_numpy(vectors[indices]))
+                best_scores, best_rows = _merge_topk(block @ query, torch.from_numpy(indices),
+                                                     best_scores, best_rows, k)
+        else:
+            allowed = torch.from_numpy(allowed)
+            start = 0
+            ivfpq = None if exact else self._load_ivfpq()
+            if ivfpq is not None and ivfpq.size <= rows.shape[0]:
+                best_scores, best_rows = ivfpq.search(query, vectors, allowed, k)
+                start = ivfpq.size
+
+            # Exact blocked scan (of the whole matrix, or of the rows the index doesn't cover)
+            for block_start in range(start, rows.shape[0], self.block_rows):
+                block_end = min(block_start + self.block_rows, rows.shape[0])
+                block = buffer[:block_end - block_start].copy_(torch.from_numpy(vectors[block_start:block_end]))
+                scores = block @ query
+                scores[~allowed[block_start:block_end]] = float("-inf")
+                best_scores, best_rows = _merge_topk(scores, torch.arange(block_start, block_end),
+                                                     best_scores, best_rows, k)
+
+        keep = torch.isfinite(best_scores)
+        return [(int(rows[r, 0]), float(s)) for r, s in zip(best_rows[keep].tolist(), best_scores[keep].tolist())]
+
+    def _load_ivfpq(self):
+        path = self._path(IVFPQ_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except FileNotFoundError:
+            self._ivfpq = None
+            return None
+        if mtime != self._ivfpq_mtime:
+            self._ivfpq, self._ivfpq_mtime = IVFPQIndex.load(path), mtime
+        return self._ivfpq
+
+    def build_ivfpq(self, nlist=256, m=64, sample=16384, iterations=10, seed=0):
+        """
+        Train and persist an IVF-PQ index over all current rows
+        """
+        _, vectors = self._refresh()
+        index = IVFPQIndex.train(vectors, nlist=nlist, m=m, sample=sample, iterations=iterations, seed=seed)
+        index.save(self._path(IVFPQ_FILE))
+        return index
+
+def kmeans(data, k, iterations=10, seed=0):
+    """
+    Plain Lloyd's k-means on float32 rows, returns the centroids
+    """
+    generator = torch.Generator().manual_seed(seed)
+    data = torch.as_tensor(data, dtype=torch.float32)
+    centroids = data[torch.randperm(data.shape[0], generator=generator)[:k]].clone()
+    for _ in range(iterations):
+        assignment = torch.cdist(data, centroids).argmin(dim=1)
+        sums = torch.zeros_like(centroids).index_add_(0, assignment, data)
+        counts = torch.bincount(assignment, minlength=k).unsqueeze(1)
+        # Empty clusters keep their previous centroid
+        centroids = torch.where(counts > 0, sums / counts.clamp(min=1), centroids)
+    return centroids
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product-quantized residuals for inner-product search
+
+    Each vector is assigned to its nearest of `nlist` coarse centroids; the residual
+    is split into `m` sub-vectors, each encoded as one byte (256 centroids per
+    sub-space). For a query the inner product decomposes as q.c + sum_j q_j.r_j,
+    so one (m x 256) lookup table per query scores every code. The best candidates
+    from the `nprobe` nearest lists are re-ranked against the float16 vectors.
+    """
+    def __init__(self, centroids, codebooks, codes, order, offsets, nprobe=EMBEDDING_NPROBE,
+                 rerank=EMBEDDING_RERANK):
+        self.centroids = centroids  # (nlist, dim) float32
+        self.codebooks = codebooks  # (m, 256, dim / m) float32
+        self.codes = codes  # (n, m) uint8, grouped by list
+        self.order = order  # (n,) row index of each code
+        self.offsets = offsets  # (nlist + 1,) list boundaries in codes/order
+        self.nprobe = nprobe
+        self.rerank = rerank
+
+    @property
+    def size(self):
+        return self.order.shape[0]
+
+    @classmethod
+    def train(cls, vectors, nlist=256, m=64, sample=16384, iterations=10, seed=0, chunk_rows=4096):
+        n, dim = vectors.shape
+        if dim % m:
+            raise ValueError(f"Dimension {dim} is not divisible into {m} sub-vectors")
+        rng = np.random.default_rng(seed)
+        training = torch.from_numpy(np.asarray(vectors[np.sort(rng.choice(n, min(sample, n), replace=False))],
+                                               dtype=np.float32))
+        centroids = kmeans(training, min(nlist, training.shape[0]), iterations, seed)
+        residuals = training - centroids[torch.cdist(training, centroids).argmin(dim=1)]
+        sub = residuals.view(residuals.shape[0], m, dim // m)
+        codebooks = torch.stack([kmeans(sub[:, j], min(256, sub.shape[0]), iterations, seed) for j in range(m)])
+
+        # Encode every row in chunks so memory stays bounded (PQ distances are m x chunk x 256)
+        lists = np.empty(n, dtype=np.int64)
+        codes = np.empty((n, m), dtype=np.uint8)
+        for start in range(0, n, chunk_rows):
+            chunk = torch.from_numpy(np.asarray(vectors[start:start + chunk_rows], dtype=np.float32))
+            assignment = torch.cdist(chunk, centroids).argmin(dim=1)
+            sub = (chunk - centroids[assignment]).view(chunk.shape[0], m, dim // m).transpose(0, 1)
+            lists[start:start + chunk.shape[0]] = assignment.numpy()
+            codes[start:start + chunk.shape[0]] = torch.cdist(sub, codebooks).argmin(dim=2).T.numpy()
+
+        order = np.argsort(lists, kind="stable")
+        offsets = np.searchsorted(lists[order], np.arange(centroids.shape[0] + 1))
+        return cls(centroids.numpy(), codebooks.numpy(), codes[order], order, offsets)
+
+    def search(self, query, vectors, allowed, k):
+        """
+        Approximate top-k for a normalized query tensor, as (scores, row indices) tensors
+        """
+        centroids = torch.from_numpy(self.centroids)
+        coarse = centroids @ query
+        probe = torch.topk(coarse, min(self.nprobe, coarse.numel())).indices.tolist()
+
+        m, _, sub_dim = self.codebooks.shape
+        lut = torch.einsum("jcd,jd->jc", torch.from_numpy(self.codebooks), query.view(m, sub_dim))
+        candidate_scores, candidate_rows = [], []
+        for lst in probe:
+            start, end = self.offsets[lst], self.offsets[lst + 1]
+            if start == end:
+                continue
+            codes = torch.from_numpy(self.codes[start:end].astype(np.int64))
+            scores = coarse[lst] + lut.gather(1, codes.T).sum(dim=0)
+            rows = torch.from_numpy(self.order[start:end])
+            scores[~allowed[rows]] = float("-inf")
+            candidate_scores.append(scores)
+            candidate_rows.append(rows)
+        if not candidate_scores:
+            return torch.empty(0), torch.empty(0, dtype=torch.int64)
+
+        scores, rows = torch.cat(candidate_scores), torch.cat(candidate_rows)
+        top = torch.topk(scores, min(max(self.rerank, k), scores.numel())).indices
+        rows = rows[top][torch.isfinite(scores[top])]
+
+        # Exact re-ranking of the shortlist against the stored vectors
+        rows_sorted = torch.sort(rows).values
+        exact = torch.from_numpy(np.asarray(vectors[rows_sorted.numpy()], dtype=np.float32)) @ query
+        best = torch.topk(exact, min(k, exact.numel())).indices
+        return exact[best], rows_sorted[best]
+
+    def save(self, path):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, centroids=self.centroids, codebooks=self.codebooks, codes=self.codes,
+                         order=self.order, offsets=self.offsets)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["centroids"], data["codebooks"], data["codes"], data["order"], data["offsets"])
+
+# Shared store for the API
+embedding_store = EmbeddingStore()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the IVF-PQ index over the stored embeddings")
+    parser.add_argument("--nlist", type=int, default=256, help="Coarse clusters (inverted lists)")
+    parser.add_argument("--m", type=int, default=64, help="PQ sub-vectors (bytes per code)")
+    parser.add_argument("--sample", type=int, default=16384, help="Vectors used for training")
+    args = parser.parse_args()
+
+    print(f"Building IVF-PQ index over {len(embedding_store)} embeddings in {embedding_store.directory}...")
+    index = embedding_store.build_ivfpq(nlist=args.nlist, m=args.m, sample=args.sample)
+    print(f"Indexed {index.size} embeddings into {index.centroids.shape[0]} lists")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Response
+
+# Conditional GETs for per-user read endpoints. The validator is the user's history
+# version, bumped in the database whenever one of their predictions changes (see
+# database_models), so a poll of unchanged data is answered with 304 from the user row
+# that authentication loads anyway: no predictions query, no serialization.
+# "no-cache" lets browsers keep the response but makes them revalidate every time.
+CACHE_CONTROL = "private, no-cache"
+
+def user_etag(user, *parts):
+    """
+    Weak ETag for a representation of the user's data, e.g. user_etag(user, "history")
+    """
+    tag = ".".join(str(part) for part in (user.id, user.history_version or 0, *parts))
+    return f'W/"{tag}"'
+
+def cache_headers(etag, last_modified=None):
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+def is_not_modified(request, etag, last_modified=None):
+    """
+    Whether the request's validators (If-None-Match, else If-Modified-Since) still match
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: proxies that compress may weaken or strip the W/ prefix
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have whole seconds
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+def not_modified(headers):
+    return Response(status_code=304, headers=headers)
@@ -1,12 +1,17 @@
 import os
+import threading
 import numpy as np
 import torch
 from PIL import Image
 from torchvision import transforms
-import uuid
 import cv2
 import matplotlib.pyplot as plt
 
+from backend.utils.storage import storage
+from backend.utils.mask_encoding import encode_mask, MASK_EXT
+from backend.utils.artifact_writer import artifact_writer
+from backend.utils.medical_images import is_medical_image, load_preview
+
 # Image transformation for model input
 def get_transform():
     return transforms.Compose([
@@ -15,42 +20,39 @@ def get_transform():
         transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
     ])
 
-# Save uploaded image to disk
-def save_uploaded_image(file, upload_dir="backend/public/images/uploads"):
-    os.makedirs(upload_dir, exist_ok=True)
+# Save uploaded image to artifact storage, returns the storage key
+def save_uploaded_image(file, store=None):
+    store = store or storage
     
-    # Generate a unique filename
-    filename = f"{uuid.uuid4()}.png"
-    file_path = os.path.join(upload_dir, filename)
+    # Keep the original extension; the name itself is the content hash
+    file_ext = os.path.splitext(file.filename or "")[1].lower() or ".png"
     
     # Read image data
     contents = file.file.read()
     
-    # Save to disk
-    with open(file_path, "wb") as f:
-        f.write(contents)
-    
-    return file_path
+    return store.put("uploads", contents, file_ext)
 
 # Prepare image for model inference
 def prepare_image(image_path):
-    img = Image.open(image_path).convert('RGB')
+    if is_medical_image(image_path):
+        # DICOM / 16-bit: downscale the raw samples, then window to 8 bits
+        img = Image.fromarray(load_preview(image_path, 224))
+    else:
+        img = Image.open(image_path).convert('RGB')
     transform = get_transform()
     img_tensor = transform(img).unsqueeze(0)  # Add batch dimension
     return img_tensor
 
 # Generate Grad-CAM heatmap
-def generate_gradcam(model, img_tensor, target_layer_name):
-    gradients = []
+def generate_gradcam(model, img_tensor, target_layer_name, target_class=None):
     activations_list = [] # Changed from 'activations' to avoid potential name clashes
+    owner = threading.get_ident()
 
-    # Hook for gradients
-    def backward_hook_fn(module, grad_input, grad_output):
-        gradients.append(grad_output[0])
-
-    # Hook for activations
+    # Hook for activations; the model may be running forward passes on other threads
+    # (inference, speculative segmentation), so only this thread's pass is recorded
     def forward_hook_fn(module, input, output):
-        activations_list.append(output)
+        if threading.get_ident() == owner:
+            activations_list.append(output)
 
     # Find the target layer module
     target_module = None
@@ -62,27 +64,25 @@ def generate_gradcam(model, img_tensor, target_layer_name):
     if target_module is None:
         raise ValueError(f"Target layer '{target_layer_name}' not found in model.")
 
-    # Register hooks
-    # Use try-finally to ensure hooks are removed
+    # Register hook
+    # Use try-finally to ensure the hook is removed
     forward_handle = target_module.register_forward_hook(forward_hook_fn)
-    backward_handle = target_module.register_backward_hook(backward_hook_fn) 
 
     heatmap_generated = None # Initialize to ensure it's defined for return
     try:
-        # Forward pass to trigger hooks and get output
-        output = model(img_tensor)
+        # Forward pass to trigger the hook and get output
+        with torch.enable_grad():
+            output = model(img_tensor)
         
         if not activations_list:
              raise RuntimeError(f"Forward hook for activations on layer '{target_layer_name}' did not run or list is empty.")
         
-        pred_class = output.argmax().item()
+        # Explain the reported class when given, else the forward pass's top class
+        pred_class = output.argmax().item() if target_class is None else target_class
         
-        model.zero_grad()
-        # Backward pass with the predicted class to trigger gradient hook
-        output[0, pred_class].backward()
-
-        if not gradients:
-            raise RuntimeError(f"Backward hook for gradients on layer '{target_layer_name}' did not run or list is empty.")
+        # Gradient of the class score w.r.t. the activations only (no parameter gradients,
+        # so nothing is accumulated on the shared model)
+        gradients = torch.autograd.grad(output[0, pred_class], activations_list[0])
 
         # Get the hooked activations and gradients (using .detach() to be safe)
         act = activations_list[0].cpu().detach().numpy()[0]  # Assuming batch size 1, result shape: (C, H, W)
@@ -108,26 +108,30 @@ def generate_gradcam(model, img_tensor, target_layer_name):
         heatmap_generated = np.uint8(255 * cam)
         
     finally:
-        # Always remove hooks
+        # Always remove the hook
         forward_handle.remove()
-        backward_handle.remove()
             
     if heatmap_generated is None:
         raise RuntimeError("Heatmap generation failed unexpectedly before returning.")
 
     return heatmap_generated
 
-# Save heatmap overlay
-def save_heatmap(image_path, heatmap, save_dir="backend/public/images/heatmaps"):
-    os.makedirs(save_dir, exist_ok=True)
-    
-    # Generate unique filename
-    filename = f"{uuid.uuid4()}_heatmap.png"
-    save_path = os.path.join(save_dir, filename)
+# Save heatmap overlay to artifact storage, returns (storage key, future of the write)
+# (encoding and writing happen on the background artifact writer)
+def save_heatmap(image_path, heatmap, writer=None):
+    writer = writer or artifact_writer
     
+    # Enqueue encoding (format per HEATMAP_* settings) and save of the overlay
+    return writer.submit_image("heatmaps", render_heatmap(image_path, heatmap))
+
+# Overlay a Grad-CAM heatmap on the (224x224) original image, returns the BGR overlay
+def render_heatmap(image_path, heatmap):
     # Load original image
-    img = cv2.imread(image_path)
-    img = cv2.resize(img, (224, 224))
+    if is_medical_image(image_path):
+        img = cv2.cvtColor(load_preview(image_path, 224), cv2.COLOR_RGB2BGR)
+    else:
+        img = cv2.imread(image_path)
+        img = cv2.resize(img, (224, 224))
     
     # Resize heatmap
     heatmap = cv2.resize(heatmap, (img.shape[1], img.shape[0]))
@@ -136,25 +140,13 @@ def save_heatmap(image_path, heatmap, save_dir="backend/public/images/heatmaps")
     heatmap = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
     
     # Overlay heatmap on original image
-    superimposed = cv2.addWeighted(img, 0.6, heatmap, 0.4, 0)
-    
-    # Save overlay
-    cv2.imwrite(save_path, superimposed)
-    
-    return save_path
+    return cv2.addWeighted(img, 0.6, heatmap, 0.4, 0)
 
-# Save segmentation mask
-def save_segmentation(mask_array, save_dir="backend/public/images/segmentations"):
-    os.makedirs(save_dir, exist_ok=True)
-    
-    # Generate unique filename
-    filename = f"{uuid.uuid4()}_segmentation.png"
-    save_path = os.path.join(save_dir, filename)
-    
-    # Convert to uint8
-    mask = (mask_array * 255).astype(np.uint8)
+# Save segmentation mask to artifact storage, returns (storage key, future of the write)
+def save_segmentation(mask_array, metadata=None, writer=None):
+    writer = writer or artifact_writer
     
-    # Save mask
-    cv2.imwrite(save_path, mask)
+    # Binary masks are stored run-length encoded or bit-packed; PNGs are rendered on request
+    encoded = encode_mask(mask_array, metadata)
     
-    return save_path 
\ No newline at end of file
+    return writer.submit_bytes("segmentations", encoded, MASK_EXT) 
\ No newline at end of file
@@ -0,0 +1,94 @@
+import os
+
+import cv2
+import numpy as np
+
+# Components smaller than this (in mask pixels) are treated as noise, not lesions
+MIN_LESION_AREA = int(os.getenv("MIN_LESION_AREA", "10"))
+
+def label_batch(masks, connectivity=8):
+    """
+    Label connected components of a batch of binary masks in a single OpenCV call
+
+    Masks are stacked vertically with a zero separator row so components never
+    touch across images. Returns (image index, stats, centroids) per component,
+    with stats/centroids translated back into each image's own coordinates.
+    """
+    masks = np.asarray(masks) > 0.5
+    n, h, w = masks.shape
+
+    stacked = np.zeros((n, h + 1, w), dtype=np.uint8)
+    stacked[:, :h] = masks
+    _, _, stats, centroids = cv2.connectedComponentsWithStats(
+        stacked.reshape(n * (h + 1), w), connectivity=connectivity
+    )
+
+    # Drop the background component
+    stats, centroids = stats[1:].copy(), centroids[1:].copy()
+    image_idx = stats[:, cv2.CC_STAT_TOP] // (h + 1)
+    stats[:, cv2.CC_STAT_TOP] -= image_idx * (h + 1)
+    centroids[:, 1] -= image_idx * (h + 1)
+    return image_idx, stats, centroids
+
+def quantify_lesions(masks, lung_masks=None, min_area=MIN_LESION_AREA):
+    """
+    Compute lesion count, area, bounding boxes and involvement for a batch of masks
+
+    Involvement is the lesion area as a percentage of the lung field when lung
+    masks are given, otherwise of the whole image.
+    """
+    masks = np.asarray(masks) > 0.5
+    if masks.ndim == 2:
+        masks = masks[None]
+    n, h, w = masks.shape
+
+    if lung_masks is not None:
+        lung_masks = np.asarray(lung_masks).reshape(n, h, w) > 0.5
+        masks = masks & lung_masks
+        field_area = lung_masks.sum(axis=(1, 2)).astype(np.float64)
+    else:
+        field_area = np.full(n, float(h * w))
+
+    image_idx, stats, centroids = label_batch(masks)
+    keep = stats[:, cv2.CC_STAT_AREA] >= min_area
+    # Group components by image (label order is not guaranteed across parallel scans)
+    order = np.flatnonzero(keep)[np.argsort(image_idx[keep], kind="stable")]
+    image_idx, stats, centroids = image_idx[order], stats[order], centroids[order]
+
+    counts = np.bincount(image_idx, minlength=n)
+    areas = np.bincount(image_idx, weights=stats[:, cv2.CC_STAT_AREA], minlength=n)
+    involvement = np.divide(100.0 * areas, field_area, out=np.zeros(n), where=field_area > 0)
+
+    splits = np.cumsum(counts)[:-1]
+    per_image_stats = np.split(stats, splits)
+    per_image_centroids = np.split(centroids, splits)
+
+    results = []
+    for i in range(n):
+        lesions = [
+            {
+                "bbox": [int(v) for v in s[:4]],  # x, y, width, height
+                "area": int(s[cv2.CC_STAT_AREA]),
+                "centroid": [round(float(c[0]), 1), round(float(c[1]), 1)],
+            }
+            for s, c in zip(per_image_stats[i], per_image_centroids[i])
+        ]
+        results.append({
+            "lesion_count": int(counts[i]),
+            "lesion_area": int(areas[i]),
+            "involvement_pct": float(involvement[i]),
+            "lesions": lesions,
+        })
+    return results
+
+def pack_boxes(lesions):
+    """
+    Pack lesion bounding boxes into a compact (N, 4) uint16 byte string for storage
+    """
+    boxes = np.array([lesion["bbox"] for lesion in lesions], dtype=np.uint16).reshape(-1, 4)
+    return boxes.tobytes()
+
+def unpack_boxes(data):
+    if not data:
+        return []
+    return np.frombuffer(data, dtype=np.uint16).reshape(-1, 4).tolist()
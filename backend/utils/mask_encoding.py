@@ -0,0 +1,95 @@
+import json
+import struct
+
+import cv2
+import numpy as np
+
+# Compact container for binary segmentation masks:
+#   MAGIC | uint32 header length | JSON header | payload
+# The header carries the mask shape, the payload encoding and free-form metadata
+# (e.g. per-lesion statistics), so masks stay self-describing without a PNG.
+MASK_MAGIC = b"MSK1"
+MASK_EXT = ".msk"
+
+# Overlay colour (BGRA) for rendered lesion regions
+OVERLAY_COLOR = (0, 0, 255, 110)
+
+def _rle_encode(flat):
+    # Run lengths alternate 0-runs and 1-runs, always starting with a (possibly empty) 0-run
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    boundaries = np.concatenate(([0], change, [flat.size]))
+    runs = np.diff(boundaries)
+    if flat.size and flat[0]:
+        runs = np.concatenate(([0], runs))
+    dtype = np.uint16 if runs.size == 0 or runs.max() <= np.iinfo(np.uint16).max else np.uint32
+    return runs.astype(dtype)
+
+def _rle_decode(runs, size):
+    values = (np.arange(runs.size) % 2).astype(np.uint8)
+    flat = np.repeat(values, runs.astype(np.int64))
+    if flat.size != size:
+        raise ValueError(f"Corrupt RLE mask: decoded {flat.size} pixels, expected {size}")
+    return flat
+
+def encode_mask(mask_array, metadata=None):
+    """
+    Encode a binary mask as run lengths or packed bits, whichever is smaller
+    """
+    mask = np.asarray(mask_array)
+    flat = (mask.ravel() > 0.5).astype(np.uint8)
+
+    runs = _rle_encode(flat)
+    packed = np.packbits(flat)
+    if runs.nbytes <= packed.nbytes:
+        encoding, dtype, payload = "rle", runs.dtype.name, runs.tobytes()
+    else:
+        encoding, dtype, payload = "bits", "uint8", packed.tobytes()
+
+    header = json.dumps({
+        "shape": list(mask.shape),
+        "encoding": encoding,
+        "dtype": dtype,
+        "meta": metadata or {},
+    }, separators=(",", ":")).encode("utf-8")
+    return MASK_MAGIC + struct.pack("<I", len(header)) + header + payload
+
+def read_mask_header(data):
+    """
+    Parse only the header of an encoded mask (no pixel decoding)
+    """
+    if data[:4] != MASK_MAGIC:
+        raise ValueError("Not an encoded mask")
+    (header_len,) = struct.unpack_from("<I", data, 4)
+    header = json.loads(data[8:8 + header_len].decode("utf-8"))
+    return header, 8 + header_len
+
+def decode_mask(data):
+    """
+    Decode an encoded mask back to a uint8 {0,1} array, returns (mask, metadata)
+    """
+    header, offset = read_mask_header(data)
+    shape = tuple(header["shape"])
+    size = int(np.prod(shape))
+    payload = np.frombuffer(data, dtype=np.dtype(header["dtype"]), offset=offset)
+
+    if header["encoding"] == "rle":
+        flat = _rle_decode(payload, size)
+    elif header["encoding"] == "bits":
+        flat = np.unpackbits(payload, count=size)
+    else:
+        raise ValueError(f"Unknown mask encoding '{header['encoding']}'")
+
+    return flat.reshape(shape), header["meta"]
+
+def render_mask_png(mask, overlay=False):
+    """
+    Render a decoded mask as PNG bytes: grayscale 0/255, or a transparent colour overlay
+    """
+    if overlay:
+        rgba = np.zeros(mask.shape + (4,), dtype=np.uint8)
+        rgba[mask.astype(bool)] = OVERLAY_COLOR
+        image = rgba
+    else:
+        image = mask.astype(np.uint8) * 255
+    _, encoded = cv2.imencode(".png", image)
+    return encoded.tobytes()
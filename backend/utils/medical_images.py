@@ -0,0 +1,255 @@
+from collections.abc import Sequence
+
+import cv2
+import numpy as np
+from PIL import Image
+
+DICOM_EXTENSIONS = (".dcm", ".dicom")
+# Formats that may carry more than 8 bits per sample
+HIGH_BIT_DEPTH_EXTENSIONS = (".png", ".tif", ".tiff")
+UPLOAD_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff") + DICOM_EXTENSIONS
+
+# Transfer syntaxes whose pixel data is stored as plain little-endian samples
+NATIVE_LITTLE_ENDIAN = ("1.2.840.10008.1.2", "1.2.840.10008.1.2.1")
+UNDEFINED_LENGTH = 0xFFFFFFFF
+
+def _pydicom():
+    try:
+        import pydicom
+    except ImportError:
+        raise ValueError("DICOM input requires pydicom (pip install pydicom).")
+    return pydicom
+
+def is_dicom(path):
+    """
+    True for DICOM files, by extension or by the "DICM" marker at byte 128
+    """
+    if path.lower().endswith(DICOM_EXTENSIONS):
+        return True
+    with open(path, "rb") as f:
+        f.seek(128)
+        return f.read(4) == b"DICM"
+
+def _first(value):
+    # Window center/width may be multi-valued; the first pair is the default
+    if value is None:
+        return None
+    if isinstance(value, Sequence) and not isinstance(value, str):
+        return float(value[0]) if len(value) else None
+    return float(value)
+
+def _image_bit_depth(img):
+    if img.format == "PNG":
+        # IHDR bit depth: byte 24 of the file, right after the signature and chunk header
+        img.fp.seek(24)
+        return img.fp.read(1)[0]
+    if img.format == "TIFF":
+        bits = img.tag_v2.get(258, (8,))
+        return int(bits[0] if isinstance(bits, tuple) else bits)
+    return 8
+
+def read_metadata(path):
+    """
+    Image geometry and display settings, read from the header only (no pixel decoding)
+    """
+    if is_dicom(path):
+        ds = _pydicom().dcmread(path, stop_before_pixels=True)
+        return {
+            "format": "dicom",
+            "rows": int(ds.Rows),
+            "columns": int(ds.Columns),
+            "frames": int(ds.get("NumberOfFrames", 1) or 1),
+            "samples": int(ds.get("SamplesPerPixel", 1)),
+            "bits": int(ds.get("BitsStored", ds.get("BitsAllocated", 8))),
+            "window_center": _first(ds.get("WindowCenter")),
+            "window_width": _first(ds.get("WindowWidth")),
+            "slope": float(ds.get("RescaleSlope", 1) or 1),
+            "intercept": float(ds.get("RescaleIntercept", 0) or 0),
+            "invert": ds.get("PhotometricInterpretation") == "MONOCHROME1",
+        }
+    with Image.open(path) as img:
+        return {
+            "format": img.format.lower() if img.format else "image",
+            "rows": img.height,
+            "columns": img.width,
+            "frames": getattr(img, "n_frames", 1),
+            "samples": len(img.getbands()),
+            "bits": _image_bit_depth(img),
+            "window_center": None,
+            "window_width": None,
+            "slope": 1.0,
+            "intercept": 0.0,
+            "invert": False,
+        }
+
+def is_medical_image(path):
+    """
+    True for images that need windowing rather than a plain 8-bit decode (DICOM, 16-bit PNG/TIFF)
+    """
+    lower = path.lower()
+    if lower.endswith((".jpg", ".jpeg", ".bmp")):
+        return False
+    if is_dicom(path):
+        return True
+    return lower.endswith(HIGH_BIT_DEPTH_EXTENSIONS) and read_metadata(path)["bits"] > 8
+
+def _dicom_frames(path, indices):
+    pydicom = _pydicom()
+    # Large elements (the pixel data) are deferred: only their file offset is read
+    ds = pydicom.dcmread(path, defer_size=1024)
+    frames = int(ds.get("NumberOfFrames", 1) or 1)
+    indices = range(frames) if indices is None else indices
+    pixel_data = ds.get_item("PixelData", keep_deferred=True)
+    bits_allocated = int(ds.BitsAllocated)
+    bits_stored = int(ds.get("BitsStored", bits_allocated))
+    signed = int(ds.get("PixelRepresentation", 0)) == 1
+    samples = int(ds.get("SamplesPerPixel", 1))
+
+    mappable = (
+        ds.file_meta.TransferSyntaxUID in NATIVE_LITTLE_ENDIAN
+        and bits_allocated in (8, 16, 32)
+        and not (signed and bits_stored < bits_allocated)
+        and samples in (1, 3)
+        and pixel_data is not None
+        and pixel_data.value_tell is not None
+        and pixel_data.length != UNDEFINED_LENGTH
+    )
+    if not mappable:
+        # Compressed (or unusual) pixel data: decode one frame at a time
+        yield from pydicom.pixels.iter_pixels(path, indices=list(indices))
+        return
+
+    # Uncompressed pixel data: map the file and read each frame's samples in place
+    dtype = np.dtype(f"<{'i' if signed else 'u'}{bits_allocated // 8}")
+    rows, columns = int(ds.Rows), int(ds.Columns)
+    planar = samples > 1 and int(ds.get("PlanarConfiguration", 0)) == 1
+    if samples == 1:
+        shape = (frames, rows, columns)
+    elif planar:
+        shape = (frames, samples, rows, columns)
+    else:
+        shape = (frames, rows, columns, samples)
+    pixels = np.memmap(path, dtype=dtype, mode="r", offset=pixel_data.value_tell, shape=shape)
+    # Bits above BitsStored may hold overlay data
+    mask = (1 << bits_stored) - 1 if not signed and bits_stored < bits_allocated else None
+    for index in indices:
+        frame = np.moveaxis(pixels[index], 0, -1) if planar else pixels[index]
+        yield frame & mask if mask is not None else frame
+
+def _image_frames(path, indices):
+    with Image.open(path) as img:
+        frames = getattr(img, "n_frames", 1)
+    if frames == 1:
+        if indices is not None and list(indices) != [0]:
+            raise IndexError(f"{path} has a single frame")
+        # OpenCV keeps 16-bit samples (PIL would truncate 16-bit RGB to 8 bits)
+        frame = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if frame is None:
+            raise ValueError(f"Could not read image {path}")
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame[..., :3], cv2.COLOR_BGR2RGB)
+        yield frame
+        return
+    # Multi-page TIFF: PIL decodes one page per seek()
+    with Image.open(path) as img:
+        for index in (range(frames) if indices is None else indices):
+            img.seek(index)
+            yield np.asarray(img)
+
+def iter_frames(path, indices=None):
+    """
+    Yield the raw pixel frames of an image one at a time, in the file's own dtype
+
+    Uncompressed DICOM pixel data is memory-mapped, so a frame is only read when
+    it is used; compressed DICOM is decoded frame by frame. Multi-frame files are
+    never fully loaded into memory.
+    """
+    if is_dicom(path):
+        yield from _dicom_frames(path, indices)
+    else:
+        yield from _image_frames(path, indices)
+
+def apply_window(frame, center=None, width=None, slope=1.0, intercept=0.0, invert=False):
+    """
+    Map raw samples to uint8 with the modality rescale and a linear VOI window
+
+    Without a window, the frame's own min/max range is used.
+    """
+    values = frame.astype(np.float32)
+    if slope != 1.0 or intercept != 0.0:
+        values *= slope
+        values += intercept
+    if center is None or width is None:
+        low, high = float(values.min()), float(values.max())
+    else:
+        # DICOM PS3.3 C.11.2.1.2 linear window
+        low = center - 0.5 - (width - 1) / 2
+        high = center - 0.5 + (width - 1) / 2
+    values -= low
+    values *= 255.0 / max(high - low, 1e-6)
+    np.clip(values, 0, 255, out=values)
+    if invert:
+        np.subtract(255, values, out=values)
+    return values.astype(np.uint8)
+
+def downsample(frame, size):
+    """
+    Resize a frame to size x size, block-averaging by the largest integer factor first
+
+    The block mean reads each source sample once and shrinks the frame before the
+    final (small) interpolation, so large frames never go through a full-size float copy.
+    """
+    height, width = frame.shape[:2]
+    factor = max(1, min(height // size, width // size))
+    if factor > 1:
+        height, width = height - height % factor, width - width % factor
+        # Sum the factor x factor strided sub-grids: each pass is a cheap vectorized add,
+        # several times faster than reshape + mean over non-contiguous axes
+        blocks = np.zeros((height // factor, width // factor, *frame.shape[2:]), dtype=np.float32)
+        for i in range(factor):
+            for j in range(factor):
+                blocks += frame[i:height:factor, j:width:factor]
+        blocks /= factor * factor
+        frame = blocks
+    return cv2.resize(frame.astype(np.float32, copy=False), (size, size), interpolation=cv2.INTER_LINEAR)
+
+def _to_rgb(image):
+    if image.ndim == 2:
+        return np.repeat(image[..., None], 3, axis=2)
+    return image[..., :3]
+
+def _window_settings(metadata):
+    return {
+        "center": metadata["window_center"],
+        "width": metadata["window_width"],
+        "slope": metadata["slope"],
+        "intercept": metadata["intercept"],
+        "invert": metadata["invert"],
+    }
+
+def load_frame(path, index=0):
+    """
+    One frame at full resolution, windowed to uint8 RGB (H, W, 3)
+    """
+    metadata = read_metadata(path)
+    frame = next(iter_frames(path, [index]))
+    return _to_rgb(apply_window(frame, **_window_settings(metadata)))
+
+def load_preview(path, size=224, index=0):
+    """
+    One frame downscaled to size x size and windowed to uint8 RGB
+
+    Downscaling runs on the raw samples before windowing, so the float windowing
+    math only touches size x size samples instead of the full frame.
+    """
+    metadata = read_metadata(path)
+    frame = downsample(next(iter_frames(path, [index])), size)
+    return _to_rgb(apply_window(frame, **_window_settings(metadata)))
+
+def iter_previews(path, size=224):
+    """
+    Yield every frame of a (multi-frame) image as a uint8 RGB preview, one at a time
+    """
+    settings = _window_settings(read_metadata(path))
+    for frame in iter_frames(path):
+        yield _to_rgb(apply_window(downsample(frame, size), **settings))
@@ -0,0 +1,83 @@
+import torch
+
+from backend.utils.distributed import all_reduce_sum
+
+class ConfusionMatrix:
+    """
+    Streaming confusion matrix that lives on the training device
+
+    update() is a single bincount on device, so it never forces a host sync;
+    compute() derives accuracy and weighted precision/recall/F1 (matching sklearn's
+    average='weighted', zero_division=0) in O(classes^2).
+    """
+    def __init__(self, num_classes, device="cpu"):
+        self.num_classes = num_classes
+        self.matrix = torch.zeros(num_classes, num_classes, dtype=torch.int64, device=device)
+
+    def reset(self):
+        self.matrix.zero_()
+
+    @torch.no_grad()
+    def update(self, preds, targets):
+        # Rows are true classes, columns predicted classes
+        idx = targets.reshape(-1).to(torch.int64) * self.num_classes + preds.reshape(-1).to(torch.int64)
+        self.matrix += torch.bincount(idx, minlength=self.num_classes ** 2).view(self.num_classes, self.num_classes)
+
+    def reduce(self):
+        """
+        Sum the matrix across distributed ranks (no-op in a single process)
+        """
+        all_reduce_sum(self.matrix)
+
+    @torch.no_grad()
+    def compute(self):
+        """
+        Returns a dict of 0-d tensors on the accumulator's device
+        """
+        matrix = self.matrix.double()
+        tp = matrix.diag()
+        support = matrix.sum(dim=1)
+        predicted = matrix.sum(dim=0)
+        total = support.sum()
+
+        zero = torch.zeros_like(tp)
+        precision = torch.where(predicted > 0, tp / predicted.clamp(min=1), zero)
+        recall = torch.where(support > 0, tp / support.clamp(min=1), zero)
+        f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall).clamp(min=1e-12), zero)
+
+        weights = support / total.clamp(min=1)
+        return {
+            "accuracy": tp.sum() / total.clamp(min=1),
+            "precision": (precision * weights).sum(),
+            "recall": (recall * weights).sum(),
+            "f1": (f1 * weights).sum(),
+        }
+
+    def compute_host(self):
+        """
+        compute() moved to host as plain floats (one device sync)
+        """
+        metrics = self.compute()
+        values = torch.stack(list(metrics.values())).cpu().tolist()
+        return dict(zip(metrics.keys(), values))
+
+class StepLog:
+    """
+    Records per-step scalars on device and only syncs when the log is flushed
+    """
+    def __init__(self):
+        self._steps = []
+
+    def append(self, **values):
+        self._steps.append({k: v.detach() for k, v in values.items()})
+
+    def flush(self):
+        """
+        Returns {name: [per-step floats]} for steps since the last flush
+        """
+        if not self._steps:
+            return {}
+        names = self._steps[0].keys()
+        stacked = torch.stack([torch.stack([step[k].float() for k in names]) for step in self._steps]).cpu()
+        self._steps = []
+        return {k: stacked[:, i].tolist() for i, k in enumerate(names)}
@@ -0,0 +1,53 @@
+import os
+import contextlib
+import torch
+
+# Opt-in numeric precision and memory layout, shared by training and inference
+# PRECISION_MODE: "fp32" (default) or "bf16" (autocast to bfloat16, fast on AVX-512 BF16 / AMX CPUs)
+# CHANNELS_LAST: "1" to run convolutions in NHWC, which oneDNN prefers on CPU
+PRECISION_MODE = os.getenv("PRECISION_MODE", "fp32")
+CHANNELS_LAST = os.getenv("CHANNELS_LAST", "0") == "1"
+
+PRECISION_MODES = ("fp32", "bf16")
+
+class PrecisionConfig:
+    def __init__(self, mode=PRECISION_MODE, channels_last=CHANNELS_LAST):
+        if mode not in PRECISION_MODES:
+            raise ValueError(f"Unknown precision mode '{mode}'. Use one of {PRECISION_MODES}.")
+        self.mode = mode
+        self.channels_last = channels_last
+
+    def __repr__(self):
+        return f"PrecisionConfig(mode={self.mode!r}, channels_last={self.channels_last})"
+
+    def autocast(self, device):
+        """
+        Autocast context for the configured mode (a no-op for fp32)
+        """
+        if self.mode == "bf16":
+            return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
+    def prepare_model(self, model):
+        if self.channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        return model
+
+    def prepare_input(self, x):
+        if self.channels_last and x.dim() == 4:
+            x = x.contiguous(memory_format=torch.channels_last)
+        return x
+
+def cpu_supports_bf16():
+    """
+    Whether the host CPU has native bfloat16 instructions (AVX-512 BF16 or AMX)
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+# Default configuration from the environment
+precision = PrecisionConfig()
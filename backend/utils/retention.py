@@ -0,0 +1,225 @@
+import os
+import time
+import fcntl
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from backend.database import SessionLocal
+from backend.models.database_models import Prediction, bump_history_versions, migrate_schema
+from backend.utils.storage import storage
+
+# Retention of uploads and derived artifacts. Once the newest prediction using an artifact is
+# older than its kind's TTL in days (0 keeps it forever), the file is deleted and the prediction
+# columns pointing at it are cleared. Files no prediction references (e.g. saved by analyses that
+# failed before their row was written) are deleted once RETENTION_ORPHAN_GRACE seconds old.
+# Ages also count from the file's last write, and storing identical content again refreshes it,
+# so an analysis in flight never loses its files. Batch-scoring artifacts live under their own
+# prefix (see backend.score), which is never swept.
+RETENTION_TTLS = os.getenv("RETENTION_TTLS", "uploads:0,heatmaps:30,segmentations:30")
+RETENTION_ORPHAN_GRACE = float(os.getenv("RETENTION_ORPHAN_GRACE", "86400"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))  # Files per lookup/update/delete
+RETENTION_DRY_RUN = os.getenv("RETENTION_DRY_RUN", "false").lower() in ("1", "true", "yes")
+# Seconds between runs inside the API (one worker per host runs it); 0 leaves it to
+# `python -m backend.utils.retention` from cron
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "0"))
+RETENTION_LOCK_FILE = os.getenv("RETENTION_LOCK_FILE", "/tmp/retention.lock")
+
+# Storage kind -> the prediction column holding its keys
+ARTIFACT_COLUMNS = {
+    "uploads": Prediction.image_path,
+    "heatmaps": Prediction.heatmap_path,
+    "segmentations": Prediction.segmentation_path
+}
+
+def parse_ttls(value):
+    """
+    Parse "uploads:0,heatmaps:30" into {"uploads": 0.0, "heatmaps": 30.0} (days)
+    """
+    ttls = {}
+    for item in value.split(","):
+        if item.strip():
+            kind, days = item.split(":")
+            if kind.strip() not in ARTIFACT_COLUMNS:
+                raise ValueError(f"Unknown artifact kind '{kind.strip()}'. Use one of {tuple(ARTIFACT_COLUMNS)}.")
+            ttls[kind.strip()] = float(days)
+    return ttls
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class RetentionJob:
+    """
+    Deletes expired and orphaned artifacts, batch by batch
+
+    The storage is scanned as a stream; each batch of files is looked up against the
+    predictions in one indexed query, then cleared and deleted in one UPDATE and one
+    bulk delete, each in its own short transaction so the table is never held for long.
+    """
+    def __init__(self, store=None, session_factory=SessionLocal, ttls=None,
+                 orphan_grace=RETENTION_ORPHAN_GRACE, batch_size=RETENTION_BATCH_SIZE, dry_run=RETENTION_DRY_RUN):
+        self.store = store or storage
+        self.session_factory = session_factory
+        self.ttls = {kind: 0.0 for kind in ARTIFACT_COLUMNS}
+        self.ttls.update(parse_ttls(RETENTION_TTLS) if ttls is None else ttls)
+        self.orphan_grace = orphan_grace
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self._last_run = None
+        self._migrated = False
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def run(self, now=None):
+        """
+        One pass over every artifact kind; returns its stats
+        """
+        now = time.time() if now is None else now
+        started = time.perf_counter()
+        stats = {"dry_run": self.dry_run, "kinds": {}}
+        db = self.session_factory()
+        try:
+            self._ensure_schema(db)
+            for kind, column in ARTIFACT_COLUMNS.items():
+                stats["kinds"][kind] = self._sweep_kind(db, kind, column, now)
+        finally:
+            db.close()
+        for total in ("scanned", "expired", "orphaned", "deleted_bytes", "rows_cleared"):
+            stats[total] = sum(kind_stats[total] for kind_stats in stats["kinds"].values())
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        stats["finished_at"] = datetime.utcfromtimestamp(now).isoformat()
+        self._last_run = stats
+        verb = "Would delete" if self.dry_run else "Deleted"
+        print(f"INFO: Retention: {verb} {stats['expired']} expired and {stats['orphaned']} orphaned artifacts "
+              f"({stats['deleted_bytes'] / 1e6:.1f} MB) of {stats['scanned']}, "
+              f"cleared {stats['rows_cleared']} prediction columns in {stats['seconds']:.1f}s")
+        return stats
+
+    def _sweep_kind(self, db, kind, column, now):
+        ttl = self.ttls.get(kind, 0.0)
+        cutoff = datetime.utcfromtimestamp(now) - timedelta(days=ttl) if ttl > 0 else None
+        stats = dict.fromkeys(("scanned", "expired", "orphaned", "deleted_bytes", "rows_cleared"), 0)
+        for batch in _batches(self.store.scan(kind), self.batch_size):
+            stats["scanned"] += len(batch)
+            # Rows written before content addressing hold full paths (see LocalStorage.local_path)
+            aliases = {}
+            for key, _, _ in batch:
+                aliases[key] = key
+                if getattr(self.store, "root", None):
+                    aliases[os.path.join(self.store.root, key)] = key
+            newest = {}
+            for path, created_at in db.execute(
+                select(column, func.max(Prediction.created_at)).where(column.in_(list(aliases))).group_by(column)
+            ):
+                key = aliases[path]
+                newest[key] = max(newest.get(key, created_at), created_at)
+            db.rollback()  # End the read transaction before any slow deletes
+
+            expired, orphaned, sizes = [], [], {}
+            for key, mtime, size in batch:
+                if now - mtime < self.orphan_grace:
+                    continue  # Just written, possibly for an analysis in flight
+                if key not in newest:
+                    orphaned.append(key)
+                elif cutoff is not None and newest[key] < cutoff:
+                    expired.append(key)
+                sizes[key] = size
+            if expired and not self.dry_run:
+                expired = self._clear_columns(db, column, aliases, expired, cutoff, stats)
+            if not self.dry_run:
+                # Files that failed to delete aren't counted; unreferenced now, they're retried as orphans
+                deleted = set(self.store.delete_many(expired + orphaned))
+                expired = [key for key in expired if key in deleted]
+                orphaned = [key for key in orphaned if key in deleted]
+            stats["expired"] += len(expired)
+            stats["orphaned"] += len(orphaned)
+            stats["deleted_bytes"] += sum(sizes[key] for key in expired + orphaned)
+        return stats
+
+    def _clear_columns(self, db, column, aliases, expired, cutoff, stats):
+        """
+        Null the column on the expired rows in one UPDATE; returns the keys now unreferenced
+        """
+        paths = [path for path, key in aliases.items() if key in set(expired)]
+        stale = column.in_(paths) & (Prediction.created_at < cutoff)
+        user_ids = [user_id for (user_id,) in db.execute(select(Prediction.user_id).where(stale).distinct())]
+        result = db.execute(update(Prediction).where(stale).values({column.key: None}))
+        # Bulk updates skip the mapper events that invalidate cached history reads
+        bump_history_versions(db.connection(), user_ids)
+        # A row written since the lookup still uses its key: keep that file
+        still_used = {aliases[path] for (path,) in db.execute(select(column).where(column.in_(paths)).distinct())}
+        db.commit()
+        stats["rows_cleared"] += result.rowcount
+        return [key for key in expired if key not in still_used]
+
+    def _ensure_schema(self, db):
+        # Run from cron, the job may see a database the API hasn't migrated yet (indexes included)
+        if not self._migrated:
+            migrate_schema(db.get_bind())
+            self._migrated = True
+
+    def run_exclusive(self):
+        """
+        Run unless another process on this host is already running (returns None then)
+        """
+        with open(RETENTION_LOCK_FILE, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+            return self.run()
+
+    def start(self, interval=RETENTION_INTERVAL):
+        """
+        Run every `interval` seconds on a background thread
+        """
+        def loop():
+            while not self._stopping.wait(interval):
+                try:
+                    self.run_exclusive()
+                except Exception as e:
+                    print(f"ERROR: Retention run failed: {e}")
+        self._thread = threading.Thread(target=loop, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def stats(self):
+        return {
+            "ttl_days": self.ttls,
+            "orphan_grace": self.orphan_grace,
+            "interval": RETENTION_INTERVAL,
+            "last_run": self._last_run
+        }
+
+# Default configuration from the environment
+retention = RetentionJob()
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete expired and orphaned uploads and artifacts")
+    parser.add_argument("--dry-run", action="store_true", default=RETENTION_DRY_RUN,
+                        help="Report what would be deleted without deleting anything")
+    parser.add_argument("--ttls", default=RETENTION_TTLS, help="Days per kind, e.g. uploads:0,heatmaps:30 (0 keeps)")
+    parser.add_argument("--orphan-grace", type=float, default=RETENTION_ORPHAN_GRACE,
+                        help="Seconds before an unreferenced file counts as orphaned")
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    job = RetentionJob(ttls=parse_ttls(args.ttls), orphan_grace=args.orphan_grace,
+                       batch_size=args.batch_size, dry_run=args.dry_run)
+    stats = job.run_exclusive()
+    if stats is None:
+        print("INFO: Another retention run is in progress; nothing to do.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import os
+import glob
+import math
+import fcntl
+import tempfile
+
+import cv2
+import torch
+
+# CPU thread budgets, shared by the API workers, training and batch scoring.
+# Left alone, every process (and every DataLoader worker) starts one OpenMP thread per core,
+# so N uvicorn workers oversubscribe the host N times over.
+# API_WORKERS: processes sharing the host (defaults to WEB_CONCURRENCY, which uvicorn reads too)
+# INFERENCE_THREADS / INTEROP_THREADS / PREPROCESS_THREADS: per-process budgets (0 derives them
+# from the cores each worker gets: a quarter for decoding, the rest for the models)
+# CPU_AFFINITY: "none", or "pin" to bind each worker to its own slice of cores (NUMA nodes kept together)
+API_WORKERS = int(os.getenv("API_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))
+INTEROP_THREADS = int(os.getenv("INTEROP_THREADS", "0"))
+PREPROCESS_THREADS = int(os.getenv("PREPROCESS_THREADS", "0"))
+CPU_AFFINITY = os.getenv("CPU_AFFINITY", "none")
+CPU_SLOT_DIR = os.getenv("CPU_SLOT_DIR", os.path.join(tempfile.gettempdir(), "medical-image-analysis-cpu-slots"))
+
+CPU_AFFINITY_MODES = ("none", "pin")
+
+def parse_cpu_list(text):
+    """
+    Parse a kernel cpulist ("0-3,8,10-11") into a list of CPU ids
+    """
+    cpus = []
+    for part in text.strip().split(","):
+        if part:
+            start, _, end = part.partition("-")
+            cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+def format_cpu_list(cpus):
+    """
+    Inverse of parse_cpu_list
+    """
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+def detect_topology(node_root="/sys/devices/system/node", cgroup_root="/sys/fs/cgroup"):
+    """
+    CPUs this process may run on, grouped by NUMA node, and the cgroup CPU quota (in cores, or None)
+    """
+    try:
+        available = set(os.sched_getaffinity(0))
+    except AttributeError:  # Not Linux
+        available = set(range(os.cpu_count() or 1))
+
+    nodes = []
+    paths = glob.glob(os.path.join(node_root, "node[0-9]*", "cpulist"))
+    for path in sorted(paths, key=lambda p: int(os.path.basename(os.path.dirname(p))[4:])):
+        with open(path) as f:
+            cpus = [cpu for cpu in parse_cpu_list(f.read()) if cpu in available]
+        if cpus:
+            nodes.append(cpus)
+    if not nodes:
+        nodes = [sorted(available)]
+
+    # Containers limited with --cpus keep every core in the affinity mask but get throttled
+    quota = None
+    try:
+        with open(os.path.join(cgroup_root, "cpu.max")) as f:
+            limit, period = f.read().split()
+        if limit != "max":
+            quota = max(1, math.ceil(int(limit) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return {"cpus": sorted(available), "numa_nodes": nodes, "cpu_quota": quota}
+
+def plan_threads(cores, workers=1, inference_threads=0, interop_threads=0, preprocess_threads=0, accelerator=False):
+    """
+    Split `cores` between `workers` processes, and within each between decoding and the models
+
+    With an accelerator the models run on the GPU, so one core drives it and the rest decode.
+    """
+    workers = max(1, workers)
+    per_worker = max(1, cores // workers)
+    if accelerator:
+        preprocess = preprocess_threads or max(1, per_worker - 1)
+        inference = inference_threads or 1
+    else:
+        preprocess = preprocess_threads or max(1, per_worker // 4)
+        inference = inference_threads or max(1, per_worker - preprocess)
+    return {
+        "workers": workers,
+        "cores_per_worker": per_worker,
+        "inference_threads": inference,
+        "interop_threads": interop_threads or 1,  # Nothing here forks inter-op work
+        "preprocess_threads": preprocess,
+        "opencv_threads": 1  # Decoding parallelism comes from the preprocessing pool / loader workers
+    }
+
+def worker_cpus(numa_nodes, workers, slot):
+    """
+    The slice of cores for worker `slot` of `workers`, taken in NUMA node order
+
+    Slices are contiguous in that order, so when the worker count is a multiple of
+    the node count no worker straddles two nodes.
+    """
+    ordered = [cpu for node in numa_nodes for cpu in node]
+    per_worker = max(1, len(ordered) // max(1, workers))
+    return ordered[slot * per_worker:(slot + 1) * per_worker] or ordered
+
+class CPURuntime:
+    """
+    Detects the host's cores and applies this process's thread budgets (and optional pinning)
+
+    Call apply() once per process, before the models start running.
+    """
+    def __init__(self, workers=API_WORKERS, affinity=CPU_AFFINITY, inference_threads=INFERENCE_THREADS,
+                 interop_threads=INTEROP_THREADS, preprocess_threads=PREPROCESS_THREADS, topology=None):
+        if affinity not in CPU_AFFINITY_MODES:
+            raise ValueError(f"Unknown CPU affinity mode '{affinity}'. Use one of {CPU_AFFINITY_MODES}.")
+        self.affinity = affinity
+        self.overrides = {"inference_threads": inference_threads, "interop_threads": interop_threads,
+                          "preprocess_threads": preprocess_threads}
+        self.topology = topology or detect_topology()
+        self.cores = min(len(self.topology["cpus"]), self.topology["cpu_quota"] or len(self.topology["cpus"]))
+        self.plan = plan_threads(self.cores, workers, **self.overrides)
+        self.slot = None
+        self._slot_lock = None
+
+    def apply(self, workers=None, slot=None, pin=None, accelerator=False):
+        """
+        Apply the budgets for one of `workers` processes sharing the host, returns describe()
+
+        With pinning (CPU_AFFINITY=pin unless `pin` says otherwise) the process is bound to
+        the cores of its `slot`; API workers don't know their index, so they claim the first
+        free slot through a lock file held for the life of the process.
+        """
+        self.plan = plan_threads(self.cores, workers or self.plan["workers"], accelerator=accelerator, **self.overrides)
+        if (self.affinity == "pin" if pin is None else pin) and hasattr(os, "sched_setaffinity"):
+            self.slot = slot if slot is not None else self._claim_slot()
+            if self.slot is not None:
+                os.sched_setaffinity(0, worker_cpus(self.topology["numa_nodes"], self.plan["workers"], self.slot))
+
+        torch.set_num_threads(self.plan["inference_threads"])
+        try:
+            torch.set_num_interop_threads(self.plan["interop_threads"])
+        except RuntimeError:
+            pass  # Only settable once, before any inter-op work; the first setting stands
+        cv2.setNumThreads(self.plan["opencv_threads"])
+        return self.describe()
+
+    def _claim_slot(self):
+        os.makedirs(CPU_SLOT_DIR, exist_ok=True)
+        for slot in range(self.plan["workers"]):
+            lock = open(os.path.join(CPU_SLOT_DIR, f"slot-{slot}.lock"), "w")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                continue
+            self._slot_lock = lock  # Released by the OS when the process exits
+            return slot
+        print(f"WARNING: All {self.plan['workers']} CPU slots are taken (is API_WORKERS too low?); not pinning.")
+        return None
+
+    def describe(self):
+        """
+        Detected topology, the plan and the settings in effect for the calling thread
+        """
+        try:
+            affinity = format_cpu_list(os.sched_getaffinity(0))
+        except AttributeError:
+            affinity = None
+        return {
+            "pid": os.getpid(),
+            "cpus": format_cpu_list(self.topology["cpus"]),
+            "cpu_quota": self.topology["cpu_quota"],
+            "numa_nodes": [format_cpu_list(node) for node in self.topology["numa_nodes"]],
+            "plan": dict(self.plan),
+            "slot": self.slot,
+            "affinity": affinity,
+            "torch_threads": torch.get_num_threads(),
+            "torch_interop_threads": torch.get_num_interop_threads(),
+            "opencv_threads": cv2.getNumThreads()
+        }
+
+# Default configuration from the environment
+runtime = CPURuntime()
@@ -0,0 +1,79 @@
+import os
+
+import cv2
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+from backend.utils.shards import IMAGE_EXTENSIONS
+
+def list_image_mask_pairs(root):
+    """
+    Pair root/images/<name>.* with root/masks/<name>.* by file stem
+    """
+    image_dir, mask_dir = os.path.join(root, "images"), os.path.join(root, "masks")
+    masks = {os.path.splitext(f)[0]: f for f in os.listdir(mask_dir) if f.lower().endswith(IMAGE_EXTENSIONS)}
+    pairs = []
+    for filename in sorted(os.listdir(image_dir)):
+        stem, ext = os.path.splitext(filename)
+        if ext.lower() in IMAGE_EXTENSIONS and stem in masks:
+            pairs.append((os.path.join(image_dir, filename), os.path.join(mask_dir, masks[stem])))
+    return pairs
+
+class SegmentationDataset(Dataset):
+    """
+    Paired image/mask dataset that decodes one pair at a time and returns a crop
+
+    Nothing is held in memory between items, so dataset size doesn't affect RSS.
+    Training mode takes random crops (plus flips); eval mode takes a center crop.
+    With resize_to set, the whole image is resized to that square size instead of
+    cropped (the scale SEGMENTATION_MODE=resize segments at).
+    Returns (CHW uint8 image tensor, 1HW float mask tensor).
+    """
+    def __init__(self, root, crop_size=256, train=True, resize_to=None):
+        self.pairs = list_image_mask_pairs(root)
+        self.crop_size = crop_size
+        self.train = train
+        self.resize_to = resize_to
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def _crop_origin(self, h, w):
+        if self.train:
+            top = int(torch.randint(0, h - self.crop_size + 1, (1,)))
+            left = int(torch.randint(0, w - self.crop_size + 1, (1,)))
+        else:
+            top, left = (h - self.crop_size) // 2, (w - self.crop_size) // 2
+        return top, left
+
+    def __getitem__(self, idx):
+        image_path, mask_path = self.pairs[idx]
+        image = cv2.cvtColor(cv2.imread(image_path, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+        mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+        if mask.shape != image.shape[:2]:
+            mask = cv2.resize(mask, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_NEAREST)
+
+        if self.resize_to:
+            image = cv2.resize(image, (self.resize_to, self.resize_to), interpolation=cv2.INTER_LINEAR)
+            mask = cv2.resize(mask, (self.resize_to, self.resize_to), interpolation=cv2.INTER_NEAREST)
+            return self._to_tensors(image, mask)
+
+        # Pad images smaller than the crop
+        pad_h, pad_w = max(0, self.crop_size - image.shape[0]), max(0, self.crop_size - image.shape[1])
+        if pad_h or pad_w:
+            image = np.pad(image, ((0, pad_h), (0, pad_w), (0, 0)))
+            mask = np.pad(mask, ((0, pad_h), (0, pad_w)))
+
+        top, left = self._crop_origin(*mask.shape)
+        image = image[top:top + self.crop_size, left:left + self.crop_size]
+        mask = mask[top:top + self.crop_size, left:left + self.crop_size]
+        return self._to_tensors(image, mask)
+
+    def _to_tensors(self, image, mask):
+        if self.train and torch.rand(1).item() < 0.5:
+            image, mask = image[:, ::-1], mask[:, ::-1]
+
+        image = torch.from_numpy(np.ascontiguousarray(image)).permute(2, 0, 1)
+        mask = torch.from_numpy((mask > 127).astype(np.float32))[None]
+        return image, mask
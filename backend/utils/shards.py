@@ -0,0 +1,140 @@
+import os
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+INDEX_FILE = "index.json"
+
+# ImageNet normalization, applied on-device to whole uint8 batches
+MEAN = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+STD = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+
+def list_image_folder(root):
+    """
+    List (path, label) pairs and class names for an ImageFolder-style directory
+    """
+    classes = sorted(d.name for d in os.scandir(root) if d.is_dir())
+    samples = []
+    for label, class_name in enumerate(classes):
+        for dirpath, _, filenames in sorted(os.walk(os.path.join(root, class_name))):
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    samples.append((os.path.join(dirpath, filename), label))
+    return samples, classes
+
+def _decode_resize(args):
+    path, size = args
+    img = Image.open(path).convert("RGB").resize((size, size), Image.BILINEAR)
+    return np.asarray(img, dtype=np.uint8)
+
+def build_shards(image_dir, out_dir, size=224, shard_size=4096, workers=None):
+    """
+    Decode and resize an ImageFolder-style directory once into uint8 memmap shards
+
+    Writes shard_XXXXX.npy files of shape (N, size, size, 3), labels.npy and an
+    index.json describing them. Decoding runs in a process pool.
+    """
+    samples, classes = list_image_folder(image_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count()
+
+    shards = []
+    num_shards = math.ceil(len(samples) / shard_size)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for shard_idx in range(num_shards):
+            chunk = samples[shard_idx * shard_size:(shard_idx + 1) * shard_size]
+            filename = f"shard_{shard_idx:05d}.npy"
+            shard = np.lib.format.open_memmap(
+                os.path.join(out_dir, filename), mode="w+", dtype=np.uint8,
+                shape=(len(chunk), size, size, 3)
+            )
+            for i, img in enumerate(pool.map(_decode_resize, [(p, size) for p, _ in chunk], chunksize=16)):
+                shard[i] = img
+            shard.flush()
+            del shard
+            shards.append({"file": filename, "count": len(chunk)})
+            print(f"Wrote {filename} ({len(chunk)} images)")
+
+    np.save(os.path.join(out_dir, "labels.npy"), np.array([label for _, label in samples], dtype=np.int64))
+    with open(os.path.join(out_dir, INDEX_FILE), "w") as f:
+        json.dump({"size": size, "classes": classes, "shards": shards}, f, indent=2)
+    print(f"Prepared {len(samples)} images from {image_dir} into {out_dir}")
+
+def shards_exist(shard_dir):
+    return os.path.exists(os.path.join(shard_dir, INDEX_FILE))
+
+def augment_uint8(img, max_rotation=10):
+    """
+    Random horizontal flip and small rotation directly on an HWC uint8 array
+
+    Uses the torch RNG, which DataLoader seeds differently in every worker. The input
+    is only read: the flip is folded into the rotation's warp, so each augmented
+    sample is written once, and an unaugmented draw returns the input itself.
+    """
+    flip = torch.rand(1).item() < 0.5
+    if max_rotation:
+        angle = (torch.rand(1).item() * 2 - 1) * max_rotation
+        h, w = img.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        if flip:  # Mirror first: x -> w - 1 - x, then rotate
+            matrix = matrix @ np.array([[-1, 0, w - 1], [0, 1, 0], [0, 0, 1]], dtype=np.float64)
+        return cv2.warpAffine(img, matrix, (w, h), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    return cv2.flip(img, 1) if flip else img
+
+class ShardDataset(Dataset):
+    """
+    Dataset over pre-decoded uint8 memmap shards, returns (CHW uint8 tensor, label)
+
+    Shards are opened lazily so each DataLoader worker maps them itself; reads hit
+    the page cache instead of decoding JPEGs every epoch.
+    """
+    def __init__(self, shard_dir, augment=False):
+        with open(os.path.join(shard_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+        self.shard_dir = shard_dir
+        self.augment = augment
+        self.classes = index["classes"]
+        self.size = index["size"]
+        self.shard_files = [s["file"] for s in index["shards"]]
+        self.offsets = np.cumsum([0] + [s["count"] for s in index["shards"]])
+        self.labels = np.load(os.path.join(shard_dir, "labels.npy"))
+        self._shards = None
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def _open(self):
+        # Copy-on-write maps: samples are writable views of the page cache, so torch can
+        # wrap them without a copy (nothing writes to them; collate copies into the batch)
+        self._shards = [np.load(os.path.join(self.shard_dir, f), mmap_mode="c") for f in self.shard_files]
+
+    def __getitem__(self, idx):
+        if self._shards is None:
+            self._open()
+        shard_idx = int(np.searchsorted(self.offsets, idx, side="right") - 1)
+        img = self._shards[shard_idx][idx - self.offsets[shard_idx]]
+        if self.augment:
+            img = augment_uint8(img)
+        tensor = torch.from_numpy(img).permute(2, 0, 1)
+        return tensor, int(self.labels[idx])
+
+    def __getstate__(self):
+        # Don't ship open memmaps to worker processes; each worker re-opens them
+        state = self.__dict__.copy()
+        state["_shards"] = None
+        return state
+
+def normalize_batch(inputs):
+    """
+    Convert a uint8 NCHW batch to normalized float on whatever device it lives on
+    """
+    inputs = inputs.float().div_(255)
+    return (inputs - MEAN.to(inputs.device)) / STD.to(inputs.device)
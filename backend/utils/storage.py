@@ -0,0 +1,268 @@
+import os
+import hashlib
+import tempfile
+
+from fastapi.staticfiles import StaticFiles
+
+# Artifact storage configuration from environment variables
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # "local" or "s3"
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", os.path.join("backend", "public", "images"))
+LOCAL_STORAGE_URL_PREFIX = "/static/images"
+S3_ARTIFACT_BUCKET = os.getenv("S3_ARTIFACT_BUCKET")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # Set for MinIO/moto or other S3-compatible stores
+S3_PUBLIC_BASE_URL = os.getenv("S3_PUBLIC_BASE_URL")  # e.g. a CloudFront distribution; presigned URLs otherwise
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "/tmp/artifacts")
+PRESIGNED_URL_EXPIRES = 3600  # Seconds
+
+# Artifacts are content-addressed, so a given URL never changes content
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def content_key(kind, data, ext):
+    """
+    Build a sharded content-addressed key, e.g. heatmaps/ab/cd/abcd1234...png
+
+    Two levels of hash-prefix directories keep every directory small (65536 leaves)
+    no matter how many studies are stored, and identical content maps to one key.
+    """
+    return key_for_digest(kind, hashlib.sha256(data).hexdigest(), ext)
+
+def key_for_digest(kind, digest, ext):
+    return f"{kind}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class LocalStorage:
+    """
+    Sharded content-addressed storage on the local file system, served by StaticFiles
+    """
+    def __init__(self, root=LOCAL_STORAGE_ROOT, url_prefix=LOCAL_STORAGE_URL_PREFIX):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.url_expires = None  # URLs are stable
+
+    def put(self, kind, data, ext):
+        key = content_key(kind, data, ext)
+        self.write(key, data)
+        return key
+
+    def write(self, key, data):
+        path = self.local_path(key)
+        if not os.path.exists(path):  # Dedup: identical content is already stored
+            _atomic_write(path, data)
+        else:
+            self.touch(key)
+
+    def touch(self, key):
+        """
+        Mark a deduplicated artifact as just written (retention counts age from the last write)
+        """
+        try:
+            os.utime(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        with open(self.local_path(key), "rb") as f:
+            return f.read()
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def delete_many(self, keys):
+        """
+        Delete keys, returns those deleted (keys already gone count as deleted)
+        """
+        deleted = []
+        for key in keys:
+            try:
+                self.delete(key)
+            except OSError as e:
+                print(f"ERROR: Could not delete artifact {key}: {e}")
+                continue
+            deleted.append(key)
+        return deleted
+
+    def scan(self, kind):
+        """
+        Yield (key, mtime, size) for every artifact of a kind, walking the shards lazily
+        """
+        stack = [os.path.join(self.root, kind)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat()
+                        key = os.path.relpath(entry.path, self.root).replace(os.sep, "/")
+                        yield key, stat.st_mtime, stat.st_size
+
+    def local_path(self, key):
+        # Rows written before content addressing store a full path rather than a key
+        if os.path.isabs(key) or key.startswith(self.root):
+            return key
+        return os.path.join(self.root, key)
+
+    def url(self, key):
+        if key.startswith(self.root):
+            key = os.path.relpath(key, self.root)
+        return f"{self.url_prefix}/{key}"
+
+class S3Storage:
+    """
+    Content-addressed storage in an S3-compatible bucket (AWS S3, MinIO, moto server)
+
+    Objects written by this replica are also kept in a local read-through cache so
+    the model pipeline, which reads images from disk, never re-downloads them.
+    """
+    def __init__(self, bucket=S3_ARTIFACT_BUCKET, endpoint_url=S3_ENDPOINT_URL,
+                 public_base_url=S3_PUBLIC_BASE_URL, cache_dir=ARTIFACT_CACHE_DIR, client=None):
+        if not bucket:
+            raise ValueError("S3_ARTIFACT_BUCKET must be set when STORAGE_BACKEND=s3")
+        if client is None:
+            import boto3
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.public_base_url = public_base_url
+        self.url_expires = None if public_base_url else PRESIGNED_URL_EXPIRES
+        self.cache = LocalStorage(root=cache_dir)
+
+    def put(self, kind, data, ext):
+        key = content_key(kind, data, ext)
+        self.write(key, data)
+        return key
+
+    def write(self, key, data):
+        if not self.exists(key):
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=key,
+                Body=data,
+                CacheControl=IMMUTABLE_CACHE_CONTROL,
+            )
+        else:
+            self.touch(key)  # Dedup: identical content is already stored
+        self.cache.write(key, data)
+
+    def get(self, key):
+        if self.cache.exists(key):
+            return self.cache.get(key)
+        return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        self.cache.delete(key)
+
+    def delete_many(self, keys):
+        """
+        Delete keys in bulk, returns those deleted; keys S3 reports errors for keep their cached copy
+        """
+        keys = list(keys)
+        deleted = []
+        for start in range(0, len(keys), 1000):  # DeleteObjects takes at most 1000 keys
+            chunk = keys[start:start + 1000]
+            # Quiet mode still lists the keys that failed
+            response = self.client.delete_objects(
+                Bucket=self.bucket, Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True}
+            )
+            failed = set()
+            for error in response.get("Errors", []):
+                failed.add(error["Key"])
+                print(f"ERROR: Could not delete artifact {error['Key']}: {error.get('Code')} {error.get('Message')}")
+            chunk = [key for key in chunk if key not in failed]
+            self.cache.delete_many(chunk)
+            deleted += chunk
+        return deleted
+
+    def touch(self, key):
+        """
+        Mark a deduplicated artifact as just written: copying the object onto itself resets LastModified
+        """
+        from botocore.exceptions import ClientError
+        try:
+            self.client.copy_object(
+                Bucket=self.bucket,
+                Key=key,
+                CopySource={"Bucket": self.bucket, "Key": key},
+                MetadataDirective="REPLACE",  # Required to copy onto itself; headers must be set again
+                CacheControl=IMMUTABLE_CACHE_CONTROL,
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchKey", "NotFound"):
+                raise
+        self.cache.touch(key)
+
+    def scan(self, kind):
+        """
+        Yield (key, mtime, size) for every object of a kind, one listing page at a time
+        """
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{kind}/"):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["LastModified"].timestamp(), obj["Size"]
+
+    def local_path(self, key):
+        path = self.cache.local_path(key)
+        if not os.path.exists(path):
+            _atomic_write(path, self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read())
+        return path
+
+    def url(self, key):
+        if self.public_base_url:
+            return f"{self.public_base_url.rstrip('/')}/{key}"
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=PRESIGNED_URL_EXPIRES,
+        )
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles that marks every response as immutable for long-lived browser/CDN caching
+    """
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+def create_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage()
+    if STORAGE_BACKEND == "local":
+        return LocalStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Use 'local' or 's3'.")
+
+# Create a singleton instance
+storage = create_storage()
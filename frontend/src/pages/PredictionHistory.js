@@ -221,7 +221,7 @@ const PredictionHistory = () => {
                       Heatmap Visualization
                     </Typography>
                     <img 
-                      src={`/static/images/heatmaps/${selectedPrediction.heatmap_path.split('/').pop()}`} 
+                      src={selectedPrediction.heatmap_url} 
                       alt="Heatmap" 
                       style={{ width: '100%', borderRadius: '8px' }}
                     />
@@ -234,7 +234,7 @@ const PredictionHistory = () => {
                       Segmentation Mask
                     </Typography>
                     <img 
-                      src={`/static/images/segmentations/${selectedPrediction.segmentation_path.split('/').pop()}`} 
+                      src={selectedPrediction.segmentation_url} 
                       alt="Segmentation" 
                       style={{ width: '100%', borderRadius: '8px' }}
                     />
@@ -0,0 +1,81 @@
+"""
+Benchmark: encode time vs size for heatmap overlay formats
+
+Builds realistic Grad-CAM overlays (a chest-film-like grayscale image with a
+blurred activation map blended in JET, exactly as save_heatmap does) and times
+every encoding option the artifact writer supports.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_artifact_encoding.py --size 224 --repeat 50
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from backend.utils.artifact_writer import encode_image
+
+OPTIONS = [
+    ("png", {"png_compression": 0}),
+    ("png", {"png_compression": 1}),
+    ("png", {"png_compression": 3}),
+    ("png", {"png_compression": 6}),
+    ("png", {"png_compression": 9}),
+    ("webp", {"quality": 75}),
+    ("webp", {"quality": 90}),
+    ("webp", {"quality": 101}),  # >100 selects lossless WebP in OpenCV
+    ("jpeg", {"quality": 75}),
+    ("jpeg", {"quality": 90}),
+    ("jpeg", {"quality": 95}),
+]
+
+
+def make_overlay(size, rng):
+    """Synthetic chest film with a Grad-CAM style overlay, as produced by save_heatmap"""
+    yy, xx = np.mgrid[0:size, 0:size] / size
+    # Two bright lung fields on a darker mediastinum, plus film grain
+    lungs = np.exp(-((xx - 0.3) ** 2 / 0.02 + (yy - 0.5) ** 2 / 0.08))
+    lungs += np.exp(-((xx - 0.7) ** 2 / 0.02 + (yy - 0.5) ** 2 / 0.08))
+    film = 40 + 170 * lungs + rng.normal(0, 8, size=(size, size))
+    img = cv2.cvtColor(np.clip(film, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+    # Grad-CAM from ResNet-50 layer4 is 7x7, upsampled to image size
+    cam = np.uint8(255 * rng.random((7, 7)) ** 2)
+    cam = cv2.resize(cam, (size, size))
+    heatmap = cv2.applyColorMap(cam, cv2.COLORMAP_JET)
+    return cv2.addWeighted(img, 0.6, heatmap, 0.4, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=224)
+    parser.add_argument("--images", type=int, default=8, help="Distinct overlays to average over")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    overlays = [make_overlay(args.size, rng) for _ in range(args.images)]
+    raw_bytes = overlays[0].nbytes
+
+    print(f"{args.size}x{args.size} overlays, raw {raw_bytes} bytes")
+    print(f"{'option':<22}{'bytes':>10}{'ratio':>8}{'encode ms':>12}{'PSNR dB':>10}")
+    for fmt, params in OPTIONS:
+        sizes, times, psnrs = [], [], []
+        for overlay in overlays:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                data = encode_image(overlay, format=fmt, **params)
+            times.append((time.perf_counter() - start) / args.repeat)
+            sizes.append(len(data))
+            decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            psnrs.append(cv2.PSNR(overlay, decoded))
+        label = f"{fmt} " + " ".join(f"{k}={v}" for k, v in params.items())
+        psnr = np.mean(psnrs)
+        psnr_text = "lossless" if psnr > 100 else f"{psnr:.1f}"  # cv2.PSNR caps identical images at ~361
+        print(f"{label:<22}{np.mean(sizes):>10.0f}{raw_bytes / np.mean(sizes):>8.1f}"
+              f"{np.mean(times) * 1000:>12.2f}{psnr_text:>10}")
+
+
+if __name__ == "__main__":
+    main()
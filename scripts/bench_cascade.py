@@ -0,0 +1,81 @@
+"""
+Benchmark: cascaded inference tradeoff across triage thresholds
+
+Runs the triage model and the full classifier (MC dropout, as configured by
+the MC_* settings) over a labelled ImageFolder directory once, then reports
+for each threshold: how many images escalate to the full model, how often the
+cascade's final call agrees with the full model alone, accuracy of both against
+the labels, and the resulting mean classification cost per image.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_cascade.py --data-dir backend/data/val \
+        --thresholds 0.8,0.9,0.95,0.99
+"""
+import argparse
+import time
+
+import torch
+from torchvision import datasets
+
+from backend.models import inference
+from backend.models.classification_model import load_model, load_triage_model
+from backend.train import CONFIG
+from backend.utils.image_processing import get_transform
+
+
+def run(model_fn, loader):
+    probs, labels, elapsed = [], [], 0.0
+    for inputs, targets in loader:
+        start = time.perf_counter()
+        probs.append(model_fn(inputs))
+        elapsed += time.perf_counter() - start
+        labels.append(targets)
+    return torch.cat(probs), torch.cat(labels), elapsed * 1000 / len(loader.dataset)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-dir", default=CONFIG["data"]["val_dir"])
+    parser.add_argument("--classifier", default=CONFIG["classifier"]["model_save_path"])
+    parser.add_argument("--triage", default=CONFIG["triage"]["model_save_path"])
+    parser.add_argument("--arch", default=CONFIG["triage"]["arch"])
+    parser.add_argument("--thresholds", default="0.8,0.9,0.95,0.98,0.99")
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    device = torch.device("cpu")
+    num_classes = len(inference.CLASS_LABELS)
+    classifier = load_model(args.classifier, device, num_classes=num_classes)
+    triage = load_triage_model(args.triage, device, num_classes=num_classes, arch=args.arch)
+    dataset = datasets.ImageFolder(args.data_dir, transform=get_transform())
+    loader = torch.utils.data.DataLoader(dataset, batch_size=args.batch_size)
+
+    def full(x):
+        if inference.MC_SAMPLING == "adaptive":
+            mean, _, _ = classifier.adaptive_monte_carlo_inference(
+                x, min_samples=inference.MC_MIN_SAMPLES, max_samples=inference.MC_MAX_SAMPLES,
+                tolerance=inference.MC_TOLERANCE
+            )
+            return mean
+        return classifier.monte_carlo_inference(x, inference.MC_SAMPLES)[0]
+
+    triage_probs, labels, triage_ms = run(triage.predict, loader)
+    full_probs, _, full_ms = run(full, loader)
+    triage_conf, triage_pred = triage_probs.max(dim=1)
+    full_pred = full_probs.argmax(dim=1)
+    accept_classes = torch.tensor([inference.CLASS_LABELS.index(c) for c in inference.CASCADE_ACCEPT_CLASSES])
+
+    print(f"{len(dataset)} images; triage {triage_ms:.1f} ms/image, full classifier {full_ms:.1f} ms/image; "
+          f"full-model accuracy {(full_pred == labels).float().mean():.3f}")
+    print(f"{'threshold':>10}{'escalated':>11}{'agreement':>11}{'accuracy':>10}{'ms/image':>10}{'speedup':>9}")
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        accepted = torch.isin(triage_pred, accept_classes) & (triage_conf >= threshold)
+        final = torch.where(accepted, triage_pred, full_pred)
+        escalated = 1 - accepted.float().mean().item()
+        cost = triage_ms + escalated * full_ms
+        print(f"{threshold:>10.2f}{escalated:>11.1%}{(final == full_pred).float().mean():>11.1%}"
+              f"{(final == labels).float().mean():>10.3f}{cost:>10.1f}{full_ms / cost:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
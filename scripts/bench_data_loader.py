@@ -0,0 +1,64 @@
+"""
+Benchmark: training input pipeline throughput, ImageFolder/PIL vs memmap shards
+
+Iterates one epoch of each loader (no model) and reports samples/sec, so the
+input pipeline can be compared against model compute time per batch.
+
+Usage:
+    PYTHONPATH=. python -m backend.train --prepare-data
+    PYTHONPATH=. python scripts/bench_data_loader.py --workers 8
+"""
+import argparse
+import time
+
+import torch
+from torch.utils.data import DataLoader
+from torchvision import datasets, transforms
+
+from backend.train import CONFIG
+from backend.utils.shards import ShardDataset, normalize_batch
+
+
+def measure(loader, normalize=False, max_batches=None):
+    samples = 0
+    start = time.perf_counter()
+    for i, (inputs, _) in enumerate(loader):
+        if normalize:
+            inputs = normalize_batch(inputs)
+        samples += inputs.shape[0]
+        if max_batches and i + 1 >= max_batches:
+            break
+    return samples / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image-dir", default=CONFIG["data"]["train_dir"])
+    parser.add_argument("--shard-dir", default=CONFIG["data"]["train_shards"])
+    parser.add_argument("--workers", type=int, default=CONFIG["loader"]["num_workers"])
+    parser.add_argument("--batch-size", type=int, default=CONFIG["classifier"]["batch_size"])
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+
+    image_folder = datasets.ImageFolder(args.image_dir, transform=transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.RandomHorizontalFlip(),
+        transforms.RandomRotation(10),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ]))
+    shards = ShardDataset(args.shard_dir, augment=True)
+
+    loader_kwargs = {"batch_size": args.batch_size, "shuffle": True, "num_workers": args.workers,
+                     "persistent_workers": args.workers > 0}
+
+    print(f"{len(shards)} samples, batch {args.batch_size}, {args.workers} workers, "
+          f"{torch.get_num_threads()} torch threads")
+    baseline = measure(DataLoader(image_folder, **loader_kwargs), max_batches=args.max_batches)
+    print(f"ImageFolder + PIL decode:   {baseline:10.1f} samples/sec")
+    sharded = measure(DataLoader(shards, **loader_kwargs), normalize=True, max_batches=args.max_batches)
+    print(f"uint8 memmap shards:        {sharded:10.1f} samples/sec ({sharded / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
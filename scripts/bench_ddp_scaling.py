@@ -0,0 +1,91 @@
+"""
+Benchmark: CPU DistributedDataParallel (gloo) scaling on one machine
+
+Launches torchrun with 1, 2, 4 and 8 ranks. Each rank trains ResNet-50 on
+synthetic batches with its own pinned core slice. The script reports aggregate
+samples/sec and scaling efficiency relative to one rank (weak scaling, fixed
+per-rank batch).
+
+Usage:
+    PYTHONPATH=. python scripts/bench_ddp_scaling.py --ranks 1,2,4,8 --steps 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+
+
+def worker(args):
+    from backend.models.classification_model import MedicalImageClassifier
+    from backend.utils.distributed import init_distributed, cleanup_distributed, is_main_process, world_size
+
+    device = torch.device("cpu")
+    init_distributed(device)
+    torch.manual_seed(0)
+    model = MedicalImageClassifier(pretrained=False)
+    if world_size() > 1:
+        model = DistributedDataParallel(model)
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    criterion = nn.CrossEntropyLoss()
+    inputs = torch.randn(args.batch_size, 3, args.size, args.size)
+    labels = torch.randint(0, 2, (args.batch_size,))
+
+    def step():
+        optimizer.zero_grad()
+        criterion(model(inputs), labels).backward()
+        optimizer.step()
+
+    step()  # Warm-up
+    if world_size() > 1:
+        dist.barrier()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        step()
+    elapsed = torch.tensor(time.perf_counter() - start)
+    if world_size() > 1:
+        dist.all_reduce(elapsed, op=dist.ReduceOp.MAX)  # The slowest rank bounds throughput
+
+    if is_main_process():
+        samples = args.steps * args.batch_size * world_size()
+        print(json.dumps({"ranks": world_size(), "samples_per_sec": samples / elapsed.item(),
+                          "threads_per_rank": torch.get_num_threads()}))
+    cleanup_distributed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker", action="store_true", help="Run as a torchrun rank (used internally)")
+    parser.add_argument("--ranks", default="1,2,4,8")
+    parser.add_argument("--batch-size", type=int, default=16, help="Per-rank batch size")
+    parser.add_argument("--size", type=int, default=224)
+    parser.add_argument("--steps", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    print(f"{os.cpu_count()} logical cores")
+    print(f"{'ranks':>6}{'threads/rank':>14}{'samples/s':>12}{'speedup':>9}{'efficiency':>12}")
+    baseline = None
+    for ranks in [int(r) for r in args.ranks.split(",")]:
+        cmd = [sys.executable, "-m", "torch.distributed.run", "--standalone", f"--nproc_per_node={ranks}",
+               __file__, "--worker", "--batch-size", str(args.batch_size), "--size", str(args.size),
+               "--steps", str(args.steps)]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True, env={**os.environ, "OMP_NUM_THREADS": "1"})
+        result = json.loads([line for line in out.stdout.splitlines() if line.startswith("{")][-1])
+        baseline = baseline or result["samples_per_sec"]
+        speedup = result["samples_per_sec"] / baseline
+        print(f"{ranks:>6}{result['threads_per_rank']:>14}{result['samples_per_sec']:>12.2f}"
+              f"{speedup:>9.2f}{speedup / ranks * 100:>11.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: DICOM ingestion, eager decode vs lazy memory-mapped frames
+
+The eager path is what converting upstream amounts to: read the whole dataset,
+decode all pixel data, window it at full resolution, then resize. The lazy path
+reads the header, maps the pixel data, downsamples the raw samples and windows
+the small result. Reports time and peak traced (heap) memory per file.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_dicom_ingest.py --size 3000 --frames 24
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, SecondaryCaptureImageStorage, generate_uid
+
+from backend.utils.medical_images import apply_window, iter_previews, load_preview
+
+
+def write_dicom(path, frames, rows, columns):
+    meta = FileMetaDataset()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    meta.MediaStorageSOPClassUID = SecondaryCaptureImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Rows, ds.Columns, ds.NumberOfFrames = rows, columns, frames
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated, ds.BitsStored, ds.HighBit, ds.PixelRepresentation = 16, 12, 11, 0
+    ds.WindowCenter, ds.WindowWidth = 2048, 2048
+    rng = np.random.default_rng(0)
+    ds.PixelData = rng.integers(0, 4096, size=(frames, rows, columns), dtype=np.uint16).tobytes()
+    ds.save_as(path, enforce_file_format=True)
+
+
+def eager(path, size):
+    ds = pydicom.dcmread(path)
+    pixels = ds.pixel_array
+    pixels = pixels[None] if pixels.ndim == 2 else pixels
+    return [
+        cv2.resize(apply_window(frame, float(ds.WindowCenter), float(ds.WindowWidth)), (size, size),
+                   interpolation=cv2.INTER_AREA)
+        for frame in pixels
+    ]
+
+
+def lazy(path, size):
+    return list(iter_previews(path, size))
+
+
+def measure(fn, *args):
+    fn(*args)  # Warm-up (page cache)
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=3000, help="Rows/columns of the single-frame study")
+    parser.add_argument("--frames", type=int, default=24, help="Frames in the multi-frame study (1024x1024)")
+    parser.add_argument("--preview", type=int, default=224)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        studies = {
+            f"1 x {args.size}x{args.size}": (os.path.join(tmp, "single.dcm"), 1, args.size, args.size),
+            f"{args.frames} x 1024x1024": (os.path.join(tmp, "multi.dcm"), args.frames, 1024, 1024),
+        }
+        for path, frames, rows, columns in studies.values():
+            write_dicom(path, frames, rows, columns)
+
+        print(f"{'study':<20}{'method':<26}{'ms':>10}{'peak MiB':>11}")
+        for name, (path, *_) in studies.items():
+            for method, fn in (("eager decode + window", eager), ("lazy mmap + downsample", lazy)):
+                ms, peak = measure(fn, path, args.preview)
+                print(f"{name:<20}{method:<26}{ms:>10.1f}{peak:>11.1f}")
+            ms, peak = measure(load_preview, path, args.preview)
+            print(f"{name:<20}{'lazy, first frame only':<26}{ms:>10.1f}{peak:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: dashboard polling of /api/predictions/history
+
+Seeds a scratch SQLite database with one user and --predictions rows, then
+polls the history endpoint in-process (no network) three ways: unconditional
+GETs (query + serialization every time), conditional GETs that come back 304,
+and unconditional GETs accepting gzip. It also times serializing the rows
+through the pydantic schema + json versus the direct orjson path the
+endpoint now uses.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_history_polling.py --predictions 500 --requests 300
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def rate(fn, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--predictions", type=int, default=500, help="Rows in the user's history")
+    parser.add_argument("--requests", type=int, default=300, help="Polls per mode")
+    args = parser.parse_args()
+
+    # Imported here: the database URL has to be set first
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    import orjson
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from backend.database import SessionLocal
+    from backend.models.database_models import User, Prediction
+    from backend.models.schemas import Prediction as PredictionSchema
+    from backend.api.predictions import prediction_dict
+    from backend.utils.auth import create_access_token
+
+    db = SessionLocal()
+    user = User(email="poll@example.com", username="poll", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.add_all(
+        Prediction(user_id=user.id, image_path=f"uploads/{i:064x}.png", prediction_result="Normal",
+                   confidence_score=0.9, uncertainty_score=0.01, mc_samples=8, classified_by="full",
+                   heatmap_path=f"heatmaps/{i:064x}.png")
+        for i in range(args.predictions)
+    )
+    db.commit()
+    rows = db.query(Prediction).all()
+
+    client = TestClient(app)
+    auth = {"Authorization": f"Bearer {create_access_token({'sub': user.email})}"}
+    first = client.get("/api/predictions/history", headers=auth)
+    conditional = {**auth, "If-None-Match": first.headers["etag"]}
+    compressed = client.get("/api/predictions/history", headers={**auth, "Accept-Encoding": "gzip"})
+
+    results = {
+        "unconditional (200)": rate(lambda: client.get("/api/predictions/history", headers=auth), args.requests),
+        "conditional (304)": rate(lambda: client.get("/api/predictions/history", headers=conditional), args.requests),
+        "unconditional, gzip": rate(
+            lambda: client.get("/api/predictions/history", headers={**auth, "Accept-Encoding": "gzip"}), args.requests
+        ),
+    }
+    print(f"{args.predictions} predictions: {len(first.content)} bytes JSON, "
+          f"{compressed.headers['content-length']} bytes gzip")
+    for name, requests_per_s in results.items():
+        print(f"{name:<22}{requests_per_s:>10.0f} requests/s")
+
+    runs = 20
+    pydantic_s = time.perf_counter()
+    for _ in range(runs):
+        json.dumps([PredictionSchema.model_validate(p).model_dump(mode="json") for p in rows])
+    pydantic_s = (time.perf_counter() - pydantic_s) / runs
+    direct_s = time.perf_counter()
+    for _ in range(runs):
+        orjson.dumps([prediction_dict(p) for p in rows])
+    direct_s = (time.perf_counter() - direct_s) / runs
+    print(f"serialize: pydantic + json {pydantic_s * 1000:.2f} ms, direct + orjson {direct_s * 1000:.2f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
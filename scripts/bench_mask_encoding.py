@@ -0,0 +1,55 @@
+"""
+Benchmark: stored size and encode/decode time of segmentation masks, PNG vs compact
+
+Usage:
+    PYTHONPATH=. python scripts/bench_mask_encoding.py --size 224 --repeat 200
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from backend.utils.mask_encoding import encode_mask, decode_mask
+
+
+def make_lesion_mask(size, num_lesions, rng):
+    """Binary mask with a few elliptical lesions, like thresholded UNet output"""
+    mask = np.zeros((size, size), dtype=np.uint8)
+    for _ in range(num_lesions):
+        center = tuple(int(c) for c in rng.integers(size // 8, size - size // 8, size=2))
+        axes = tuple(int(a) for a in rng.integers(size // 40 + 1, size // 8, size=2))
+        cv2.ellipse(mask, center, axes, float(rng.integers(0, 180)), 0, 360, 1, -1)
+    return mask.astype(np.float32)
+
+
+def time_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=224)
+    parser.add_argument("--lesions", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    mask = make_lesion_mask(args.size, args.lesions, np.random.default_rng(0))
+
+    png_time, png = time_call(lambda: cv2.imencode(".png", (mask * 255).astype(np.uint8))[1].tobytes(), args.repeat)
+    png_decode, _ = time_call(lambda: cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_GRAYSCALE), args.repeat)
+    msk_time, msk = time_call(lambda: encode_mask(mask), args.repeat)
+    msk_decode, _ = time_call(lambda: decode_mask(msk), args.repeat)
+
+    print(f"{args.size}x{args.size} mask, {args.lesions} lesions, {int(mask.sum())} positive pixels")
+    print(f"{'format':<10}{'bytes':>10}{'encode us':>12}{'decode us':>12}")
+    print(f"{'png':<10}{len(png):>10}{png_time * 1e6:>12.1f}{png_decode * 1e6:>12.1f}")
+    print(f"{'msk':<10}{len(msk):>10}{msk_time * 1e6:>12.1f}{msk_decode * 1e6:>12.1f}")
+    print(f"size ratio {len(png) / len(msk):.1f}x, encode speedup {png_time / msk_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
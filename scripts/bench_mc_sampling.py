@@ -0,0 +1,78 @@
+"""
+Benchmark: Monte Carlo dropout cost and accuracy, fixed vs adaptive sampling
+
+Compares the previous approach (a full forward pass per sample), fixed sampling
+of the dropout head on shared backbone features, and adaptive sampling. Each
+mode is measured against a 512-sample reference estimate of the predicted-class
+probability and standard deviation.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_mc_sampling.py --batch-size 8 --samples 10
+"""
+import argparse
+import time
+
+import torch
+import torch.nn.functional as F
+
+from backend.models.classification_model import MedicalImageClassifier
+
+
+def full_forward_mc(model, x, num_samples):
+    # Previous implementation: the whole network runs once per sample
+    model.eval()
+    model.resnet.fc.train()
+    with torch.inference_mode():
+        outputs = torch.stack([F.softmax(model(x).float(), dim=1) for _ in range(num_samples)])
+    model.resnet.fc.eval()
+    return outputs.mean(dim=0), outputs.var(dim=0), torch.full((x.shape[0],), num_samples)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=10, help="Fixed sample count")
+    parser.add_argument("--min-samples", type=int, default=8, help="Adaptive initial sample count")
+    parser.add_argument("--max-samples", type=int, default=32)
+    parser.add_argument("--tolerance", type=float, default=0.01)
+    parser.add_argument("--logit-scale", type=float, default=5.0,
+                        help="Scale the random head so predictions range from clear to borderline")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    model = MedicalImageClassifier(pretrained=False).eval()
+    # Push predictions away from uniform, so there are both clear and borderline cases
+    with torch.no_grad():
+        model.resnet.fc[-1].weight.mul_(args.logit_scale)
+    x = torch.randn(args.batch_size, 3, 224, 224)
+
+    mean, var = model.monte_carlo_inference(x, 512)
+    pred = mean.argmax(dim=1, keepdim=True)
+    ref_conf, ref_std = mean.gather(1, pred).squeeze(1), var.gather(1, pred).sqrt().squeeze(1)
+
+    modes = {
+        f"full forward x{args.samples}": lambda: full_forward_mc(model, x, args.samples),
+        f"shared features x{args.samples}": lambda: (*model.monte_carlo_inference(x, args.samples),
+                                                     torch.full((x.shape[0],), args.samples)),
+        "adaptive": lambda: model.adaptive_monte_carlo_inference(
+            x, min_samples=args.min_samples, max_samples=args.max_samples, tolerance=args.tolerance),
+    }
+    full_forward_mc(model, x, 1)  # Warm-up
+    print(f"{'mode':<24}{'ms/image':>10}{'samples':>16}{'conf err':>10}{'std err':>10}  (mean abs vs reference)")
+    for name, fn in modes.items():
+        (mean, var, samples), elapsed = timed(fn)
+        conf = mean.gather(1, pred).squeeze(1)
+        std = var.gather(1, pred).sqrt().squeeze(1)
+        print(f"{name:<24}{elapsed * 1000 / args.batch_size:>10.1f}"
+              f"{f'{samples.float().mean():.1f} ({samples.min()}-{samples.max()})':>16}"
+              f"{(conf - ref_conf).abs().mean():>10.4f}{(std - ref_std).abs().mean():>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: per-study latency of the serial vs concurrent inference pipeline
+
+Runs single-image studies through the analyzer the way the analyze endpoint
+does: analyze_batch, then the database write (simulated with --db-ms), then
+waiting for the heatmap when it renders in the background. The classifier's
+answer is forced so positive (segmented) and negative studies can be timed
+separately; everything else uses the real models and settings.
+
+Speculative segmentation needs spare cores to overlap classification; without
+them it is off by default (SPECULATIVE_MAX_BATCH) and only the Grad-CAM /
+database-write overlap remains.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_pipeline.py --image backend/data/val/PNEUMONIA/x.jpeg --runs 20
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from backend.models import inference
+from backend.utils.artifact_writer import ArtifactWriter
+from backend.utils.image_processing import prepare_image
+from backend.utils.storage import LocalStorage
+
+
+def forced(predict_with_uncertainty, class_idx):
+    def predict(x, **kwargs):
+        pred_class, *rest = predict_with_uncertainty(x, **kwargs)
+        return (torch.full_like(pred_class, class_idx), *rest)
+    return predict
+
+
+def study(analyzer, img_tensor, image_path, db_ms):
+    start = time.perf_counter()
+    result = analyzer.analyze_batch(img_tensor, [image_path])[0]
+    time.sleep(db_ms / 1000)
+    if result.get("heatmap_future") is not None:
+        result["heatmap_future"].result()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image", required=True, help="Image to analyze (any supported format)")
+    parser.add_argument("--runs", type=int, default=20, help="Studies per mode and class")
+    parser.add_argument("--db-ms", type=float, default=20.0, help="Simulated database write")
+    args = parser.parse_args()
+
+    # Write artifacts to an empty scratch store; distinct inputs per run defeat the heatmap cache
+    scratch = tempfile.TemporaryDirectory()
+    inference.artifact_writer = ArtifactWriter(store=LocalStorage(root=scratch.name))
+    analyzer = inference.MedicalImageAnalyzer()
+    original = analyzer.classifier.predict_with_uncertainty
+    base = prepare_image(args.image)
+    rng = torch.Generator().manual_seed(0)
+    print(f"{torch.get_num_threads()} intra-op threads, SEGMENTATION_THREADS={inference.SEGMENTATION_THREADS}")
+
+    print(f"{'pipeline':<12}{'study':<10}{'p50 ms':>10}{'p95 ms':>10}{'studies/s':>11}")
+    for pipeline in ("serial", "concurrent"):
+        inference.INFERENCE_PIPELINE = pipeline
+        for name, class_idx in (("positive", 1), ("negative", 0)):
+            analyzer.classifier.predict_with_uncertainty = forced(original, class_idx)
+            study(analyzer, base, args.image, args.db_ms)  # Warm-up
+            latencies = [
+                study(analyzer, base + 1e-3 * torch.randn(base.shape, generator=rng), args.image, args.db_ms)
+                for _ in range(args.runs)
+            ]
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(f"{pipeline:<12}{name:<10}{p50:>10.0f}{p95:>10.0f}{1000 * len(latencies) / sum(latencies):>11.2f}")
+    inference.artifact_writer.shutdown()
+    scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: ResNet-50 and UNet throughput under each precision / memory-format mode
+
+Reports images/sec for fp32 vs bf16 autocast, NCHW vs channels_last, for
+inference (inference_mode) and optionally a training step. bf16 only pays
+off on CPUs with AVX-512 BF16 or AMX; the script prints what the host has.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_precision.py --batch-size 16 --iters 10
+    PYTHONPATH=. python scripts/bench_precision.py --train
+"""
+import argparse
+import time
+
+import torch
+import torch.nn as nn
+
+from backend.models.classification_model import MedicalImageClassifier
+from backend.models.segmentation_model import UNet
+from backend.utils.precision import PrecisionConfig, cpu_supports_bf16
+
+CONFIGS = [
+    PrecisionConfig("fp32", False),
+    PrecisionConfig("fp32", True),
+    PrecisionConfig("bf16", False),
+    PrecisionConfig("bf16", True),
+]
+
+
+def bench_inference(make_model, x, config, iters, warmup=2):
+    model = config.prepare_model(make_model().eval())
+    x = config.prepare_input(x)
+    with torch.inference_mode(), config.autocast(x.device):
+        for _ in range(warmup):
+            model(x)
+        start = time.perf_counter()
+        for _ in range(iters):
+            model(x)
+    return iters * x.shape[0] / (time.perf_counter() - start)
+
+
+def bench_train(make_model, x, config, iters, warmup=1):
+    model = config.prepare_model(make_model().train())
+    x = config.prepare_input(x)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.01)
+
+    def step():
+        optimizer.zero_grad()
+        with config.autocast(x.device):
+            out = model(x)
+        out.float().mean().backward()
+        optimizer.step()
+
+    for _ in range(warmup):
+        step()
+    start = time.perf_counter()
+    for _ in range(iters):
+        step()
+    return iters * x.shape[0] / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--size", type=int, default=224)
+    parser.add_argument("--iters", type=int, default=10)
+    parser.add_argument("--train", action="store_true", help="Also benchmark a training step")
+    args = parser.parse_args()
+
+    print(f"torch {torch.__version__}, {torch.get_num_threads()} threads, "
+          f"native bf16: {'yes' if cpu_supports_bf16() else 'no'}")
+    x = torch.randn(args.batch_size, 3, args.size, args.size)
+    models = {
+        "resnet50": lambda: MedicalImageClassifier(pretrained=False),
+        "unet": lambda: UNet(),
+    }
+
+    for name, make_model in models.items():
+        baseline = None
+        for config in CONFIGS:
+            rate = bench_inference(make_model, x, config, args.iters)
+            baseline = baseline or rate
+            line = f"{name:<10} infer {config.mode} channels_last={str(config.channels_last):<5} " \
+                   f"{rate:8.1f} img/s ({rate / baseline:4.2f}x)"
+            if args.train:
+                line += f"   train {bench_train(make_model, x, config, max(1, args.iters // 2)):8.1f} img/s"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
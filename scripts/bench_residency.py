@@ -0,0 +1,82 @@
+"""
+Benchmark: memory and load latency of lazy vs eager model residency
+
+Each setup starts a fresh analyzer process and reports its RSS after startup:
+eager with the weights read into memory (no cache), eager with memory-mapped
+weights (pages only count once touched) and lazy. The lazy process then segments
+an image (first load, from the weights file), unloads the idle segmenter and
+segments again (reload from the mmap cache), and reports both latencies. Run it
+with the real weights in backend/models/weights.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_residency.py --runs 5
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import torch
+
+
+def rss_mb():
+    from backend.models.residency import process_rss_bytes
+    return process_rss_bytes() / 1e6
+
+
+def run_mode(mode, cache_dir, runs, queue):
+    os.environ["MODEL_RESIDENCY"] = mode
+    os.environ["MODEL_CACHE_DIR"] = cache_dir
+    from backend.models.inference import MedicalImageAnalyzer
+
+    analyzer = MedicalImageAnalyzer()
+    report = {"startup_rss_mb": rss_mb()}
+    if mode == "lazy":
+        images = torch.randn(1, 3, 224, 224)
+        first = time.perf_counter()
+        analyzer._segment(images, ["x"])
+        report["first_segment_ms"] = (time.perf_counter() - first) * 1000
+        report["resident_rss_mb"] = rss_mb()
+        reloads = []
+        for _ in range(runs):
+            analyzer.models.sweep(now=time.monotonic() + analyzer.models.idle_timeout + 1)
+            start = time.perf_counter()
+            analyzer._segment(images, ["x"])
+            reloads.append((time.perf_counter() - start) * 1000)
+        warm = time.perf_counter()
+        analyzer._segment(images, ["x"])
+        report["warm_segment_ms"] = (time.perf_counter() - warm) * 1000
+        report["reload_segment_ms"] = sorted(reloads)[len(reloads) // 2]
+        report["stats"] = analyzer.residency_stats()["models"]["segmenter"]
+    queue.put(report)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="Unload/reload cycles")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode, cache in (("eager", ""), ("eager", cache_dir), ("lazy", cache_dir)):
+            queue = ctx.Queue()
+            process = ctx.Process(target=run_mode, args=(mode, cache, args.runs, queue))
+            process.start()
+            report = queue.get()
+            process.join()
+            label = f"{mode}, {'mmap cache' if cache else 'no cache'}"
+            print(f"{label:<18} startup RSS {report['startup_rss_mb']:.0f} MB")
+            if mode == "lazy":
+                stats = report["stats"]
+                print(f"{'':<18} RSS with the segmenter resident {report['resident_rss_mb']:.0f} MB "
+                      f"(segmenter {stats['resident_bytes'] / 1e6:.0f} MB)")
+                print(f"{'':<18} segment: first load {report['first_segment_ms']:.0f} ms, "
+                      f"after an unload {report['reload_segment_ms']:.0f} ms (median), "
+                      f"resident {report['warm_segment_ms']:.0f} ms")
+                print(f"{'':<18} loads {stats['loads']}, from the mmap cache {stats['cache_loads']}, "
+                      f"p50 load {stats['p50_load_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: retention pass over a synthetic artifact store, per batch size
+
+Creates --files heatmaps in a temporary store, references most of them from
+predictions in a temporary SQLite database (half of them past the TTL, the rest
+unreferenced orphans), then times a dry run and a real run of RetentionJob for
+each batch size on a fresh copy. Files/s and the longest single UPDATE (how long
+the predictions table is write-locked at a time) are reported.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_retention.py --files 20000 --batch-sizes 100,500,2000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.database_models import User, Prediction
+from backend.utils.retention import RetentionJob
+from backend.utils.storage import LocalStorage
+
+
+def build(root, db_path, files):
+    store = LocalStorage(root=root)
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    user = User(email="bench@example.com", username="bench", hashed_password="x")
+    db.add(user)
+    db.commit()
+    old = time.time() - 90 * 86400
+    rows = []
+    for i in range(files):
+        key = store.put("heatmaps", i.to_bytes(8, "little"), ".png")
+        os.utime(store.local_path(key), (old, old))
+        if i % 10:  # Every tenth file is an orphan
+            created_at = datetime.utcnow() - timedelta(days=60 if i % 2 else 1)
+            rows.append({"user_id": user.id, "image_path": "uploads/x.png", "prediction_result": "Normal",
+                         "confidence_score": 0.9, "heatmap_path": key, "created_at": created_at})
+    db.bulk_insert_mappings(Prediction, rows)
+    db.commit()
+    db.close()
+
+
+def timed_run(root, db_path, batch_size, dry_run):
+    engine = create_engine(f"sqlite:///{db_path}")
+    updates = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE predictions"):
+            updates.append((time.perf_counter() - conn.info["start"]) * 1000)
+
+    job = RetentionJob(store=LocalStorage(root=root), session_factory=sessionmaker(bind=engine),
+                       ttls={"heatmaps": 30}, orphan_grace=3600, batch_size=batch_size, dry_run=dry_run)
+    stats = job.run()
+    return stats, max(updates, default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--batch-sizes", default="100,500,2000")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source_root, source_db = os.path.join(tmp, "store"), os.path.join(tmp, "source.db")
+        build(source_root, source_db, args.files)
+        print(f"{args.files} files, {args.files - args.files // 10} referenced; TTL 30 days")
+        for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+            for dry_run in (True, False):
+                root, db_path = os.path.join(tmp, "run"), os.path.join(tmp, "run.db")
+                shutil.rmtree(root, ignore_errors=True)
+                shutil.copytree(source_root, root)
+                shutil.copy(source_db, db_path)
+                stats, longest_update = timed_run(root, db_path, batch_size, dry_run)
+                print(f"batch {batch_size:>5} {'dry run' if dry_run else 'delete ':<8} "
+                      f"{stats['scanned'] / stats['seconds']:>8.0f} files/s  expired {stats['expired']:>6}  "
+                      f"orphaned {stats['orphaned']:>5}  longest UPDATE {longest_update:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
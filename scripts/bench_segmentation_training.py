@@ -0,0 +1,94 @@
+"""
+Benchmark: UNet training peak memory and throughput per configuration
+
+Each configuration (crop size, micro-batch, gradient checkpointing, precision)
+runs a few optimizer steps on synthetic data in its own subprocess, so peak RSS
+is measured independently per configuration.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_segmentation_training.py --steps 3
+    PYTHONPATH=. python scripts/bench_segmentation_training.py --single --crop 512 --micro-batch 2 --checkpointing
+"""
+import argparse
+import itertools
+import json
+import subprocess
+import sys
+import time
+
+import torch
+
+from backend.models.segmentation_model import UNet, DiceBCELoss
+from backend.train import peak_memory_mb
+from backend.utils.precision import PrecisionConfig
+
+
+def run_single(args):
+    device = torch.device("cpu")
+    precision = PrecisionConfig(args.precision, args.channels_last)
+    model = UNet()
+    model.set_gradient_checkpointing(args.checkpointing)
+    model = precision.prepare_model(model).train()
+    criterion = DiceBCELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+
+    images = precision.prepare_input(torch.randn(args.micro_batch, 3, args.crop, args.crop))
+    masks = (torch.rand(args.micro_batch, 1, args.crop, args.crop) > 0.9).float()
+
+    def step():
+        optimizer.zero_grad()
+        with precision.autocast(device):
+            logits = model(images)
+        criterion(logits, masks).backward()
+        optimizer.step()
+
+    step()  # Warm-up (allocates optimizer state)
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        step()
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "samples_per_sec": args.steps * args.micro_batch / elapsed,
+        "peak_mb": peak_memory_mb(device),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--single", action="store_true", help="Run one configuration (used internally)")
+    parser.add_argument("--crop", type=int, default=256)
+    parser.add_argument("--micro-batch", type=int, default=4)
+    parser.add_argument("--checkpointing", action="store_true")
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--channels-last", action="store_true")
+    parser.add_argument("--steps", type=int, default=3)
+    parser.add_argument("--crops", default="256,512", help="Crop sizes to sweep")
+    parser.add_argument("--micro-batches", default="1,4", help="Micro-batch sizes to sweep")
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args)
+        return
+
+    print(f"{'crop':>6}{'micro':>7}{'ckpt':>6}{'precision':>11}{'peak MiB':>10}{'samples/s':>11}")
+    sweep = itertools.product(
+        [int(c) for c in args.crops.split(",")],
+        [int(m) for m in args.micro_batches.split(",")],
+        [False, True],
+        ["fp32", "bf16"],
+    )
+    for crop, micro, ckpt, prec in sweep:
+        cmd = [sys.executable, __file__, "--single", "--crop", str(crop), "--micro-batch", str(micro),
+               "--precision", prec, "--steps", str(args.steps)]
+        if ckpt:
+            cmd.append("--checkpointing")
+        if prec == "bf16":
+            cmd.append("--channels-last")
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+        result = json.loads(out)
+        print(f"{crop:>6}{micro:>7}{'on' if ckpt else 'off':>6}{prec:>11}"
+              f"{result['peak_mb']:>10.0f}{result['samples_per_sec']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: sweep CPU thread splits to find the best configuration for this host
+
+For each worker count, every worker process decodes uploads on a preprocessing
+pool and classifies them on the inference threads, like an API worker does.
+The sweep tries several splits of each worker's cores between the two (see
+backend.utils.runtime) and, as a baseline, the unmanaged default where every
+worker takes one inference thread per core, decodes on 4 threads and is never
+pinned. Aggregate images/s is reported per setup. The winning row maps onto API_WORKERS, INFERENCE_THREADS and PREPROCESS_THREADS.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_thread_split.py --duration 10 --pin
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+
+from backend.models.classification_model import MedicalImageClassifier
+from backend.utils.image_processing import prepare_image
+from backend.utils.runtime import runtime, worker_cpus
+
+
+def worker(slot, workers, threads, preprocess, pin, image, duration, barrier, results):
+    if pin:
+        os.sched_setaffinity(0, worker_cpus(runtime.topology["numa_nodes"], workers, slot))
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(1)
+    model = MedicalImageClassifier(pretrained=False).eval()
+    pool = ThreadPoolExecutor(max_workers=preprocess)
+    with torch.inference_mode():
+        model(prepare_image(image))  # Warm-up
+    barrier.wait()
+
+    done = 0
+    pending = deque(pool.submit(prepare_image, image) for _ in range(2 * preprocess))
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        img_tensor = pending.popleft().result()
+        pending.append(pool.submit(prepare_image, image))
+        with torch.inference_mode():
+            model(img_tensor)
+        done += 1
+    pool.shutdown(wait=False, cancel_futures=True)
+    results.put(done)
+
+
+def run(workers, threads, preprocess, pin, args):
+    ctx = mp.get_context("spawn")
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(slot, workers, threads, preprocess, pin, args.image,
+                                         args.duration, barrier, results))
+        for slot in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total / args.duration
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cores", type=int, default=runtime.cores, help="Cores to split (default: detected)")
+    parser.add_argument("--workers", default=None, help="Worker counts to try, e.g. 1,2,4 (default: powers of 2)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per setup")
+    parser.add_argument("--image", default=None, help="Upload to decode (default: a synthetic 2048x2048 PNG)")
+    parser.add_argument("--pin", action="store_true", help="Pin each worker to its slice of cores")
+    args = parser.parse_args()
+
+    if args.image is None:
+        args.image = os.path.join(tempfile.mkdtemp(), "upload.png")
+        noise = np.random.default_rng(0).integers(0, 4096, size=(2048, 2048), dtype=np.uint16)
+        cv2.imwrite(args.image, cv2.GaussianBlur(noise, (15, 15), 0))
+    worker_counts = [int(w) for w in args.workers.split(",")] if args.workers else \
+        [2 ** i for i in range(args.cores.bit_length()) if 2 ** i <= args.cores]
+
+    setups = []
+    for workers in worker_counts:
+        per_worker = max(1, args.cores // workers)
+        setups.append(("unmanaged", workers, args.cores, 4))
+        for preprocess in sorted({1, max(1, per_worker // 4), max(1, per_worker // 2)}):
+            setups.append(("split", workers, max(1, per_worker - preprocess), preprocess))
+
+    print(f"{args.cores} cores, {len(runtime.topology['numa_nodes'])} NUMA node(s), pinning {'on' if args.pin else 'off'}")
+    print(f"{'setup':<11}{'workers':>8}{'inference':>10}{'preprocess':>11}{'images/s':>10}")
+    rows = []
+    for name, workers, threads, preprocess in setups:
+        throughput = run(workers, threads, preprocess, args.pin and name == "split", args)
+        rows.append((throughput, name, workers, threads, preprocess))
+        print(f"{name:<11}{workers:>8}{threads:>10}{preprocess:>11}{throughput:>10.1f}")
+    throughput, name, workers, threads, preprocess = max(rows)
+    print(f"Best: API_WORKERS={workers} INFERENCE_THREADS={threads} PREPROCESS_THREADS={preprocess} "
+          f"({throughput:.1f} images/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: tiled full-resolution UNet inference vs one whole-image pass
+
+Each image size and mode runs in its own subprocess so peak RSS is measured
+independently. "whole" pushes the entire image through the UNet at once (the
+memory a naive full-resolution pass needs); "tiled" uses predict_tiled.
+Throughput is reported in megapixels/sec of input image.
+
+Usage:
+    PYTHONPATH=. python scripts/bench_tiled_segmentation.py --sizes 512,1024,2048 --tile 512 --stride 384
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+import torch
+
+from backend.models.segmentation_model import UNet
+from backend.train import peak_memory_mb
+from backend.utils.precision import PrecisionConfig
+
+
+def run_single(args):
+    device = torch.device("cpu")
+    precision = PrecisionConfig(args.precision, args.channels_last)
+    torch.manual_seed(0)
+    model = precision.prepare_model(UNet()).eval()
+    image = (np.random.default_rng(0).random((args.size, args.size, 3)) * 255).astype(np.uint8)
+
+    start = time.perf_counter()
+    with precision.autocast(device):
+        if args.mode == "tiled":
+            model.predict_tiled(image, tile_size=args.tile, stride=args.stride, batch_size=args.batch_size)
+        else:
+            x = torch.from_numpy(image).permute(2, 0, 1)[None].float().div_(255)
+            model.predict(precision.prepare_input(x))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"mpix_per_sec": args.size ** 2 / 1e6 / elapsed, "peak_mb": peak_memory_mb(device)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--single", action="store_true", help="Run one configuration (used internally)")
+    parser.add_argument("--mode", default="tiled", choices=["tiled", "whole"])
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--sizes", default="512,1024,2048")
+    parser.add_argument("--tile", type=int, default=512)
+    parser.add_argument("--stride", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--channels-last", action="store_true")
+    parser.add_argument("--skip-whole-above", type=int, default=2048,
+                        help="Don't run the whole-image pass above this size (it may not fit in memory)")
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args)
+        return
+
+    print(f"tile {args.tile}, stride {args.stride}, batch {args.batch_size}, {args.precision}")
+    print(f"{'size':>6}{'mode':>7}{'peak MiB':>10}{'MPix/s':>9}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for mode in ["whole", "tiled"]:
+            if mode == "whole" and size > args.skip_whole_above:
+                continue
+            cmd = [sys.executable, __file__, "--single", "--mode", mode, "--size", str(size),
+                   "--tile", str(args.tile), "--stride", str(args.stride), "--batch-size", str(args.batch_size),
+                   "--precision", args.precision]
+            if args.channels_last:
+                cmd.append("--channels-last")
+            out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+            result = json.loads(out)
+            print(f"{size:>6}{mode:>7}{result['peak_mb']:>10.0f}{result['mpix_per_sec']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: latency of test-time augmentation (TTA) settings with MC dropout
+
+For each TTA setting, compares the naive approach (every view and every MC
+sample is a full forward pass) with the batched one (the views go through the
+backbone as one batch and share it across all MC head samples).
+
+Usage:
+    PYTHONPATH=. python scripts/bench_tta.py --batch-size 4 --samples 10
+"""
+import argparse
+import time
+
+import torch
+import torch.nn.functional as F
+
+from backend.models.classification_model import MedicalImageClassifier, tta_views
+from backend.utils.precision import PrecisionConfig
+
+SETTINGS = {
+    "none": {"flip": False, "angles": ()},
+    "flip": {"flip": True, "angles": ()},
+    "flip + rotate +-5": {"flip": True, "angles": (-5.0, 5.0)},
+}
+
+
+def naive(model, x, num_samples, flip, angles):
+    # One full forward pass per view per sample
+    model.eval()
+    model.resnet.fc.train()
+    views, num_views = tta_views(x, flip, angles)
+    with torch.inference_mode():
+        outputs = [F.softmax(model(view).float(), dim=1)
+                   for view in views.chunk(num_views) for _ in range(num_samples)]
+    model.resnet.fc.eval()
+    return torch.stack(outputs).mean(dim=0)
+
+
+def timed(fn, repeats):
+    fn()  # Warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--channels-last", action="store_true")
+    parser.add_argument("--skip-naive", action="store_true")
+    args = parser.parse_args()
+
+    precision = PrecisionConfig(args.precision, args.channels_last)
+    device = torch.device("cpu")
+    model = precision.prepare_model(MedicalImageClassifier(pretrained=False)).eval()
+    x = precision.prepare_input(torch.randn(args.batch_size, 3, 224, 224))
+
+    print(f"{args.samples} MC samples, {precision}")
+    print(f"{'TTA':<20}{'views':>6}{'naive ms/img':>14}{'batched ms/img':>16}{'vs no TTA':>11}")
+    baseline = None
+    for name, tta in SETTINGS.items():
+        num_views = tta_views(x[:1], **tta)[1]
+        with precision.autocast(device):
+            batched = timed(lambda: model.monte_carlo_inference(x, args.samples, **tta), args.repeats)
+            slow = None if args.skip_naive else timed(lambda: naive(model, x, args.samples, **tta), 1)
+        baseline = baseline or batched
+        naive_ms = "-" if slow is None else f"{slow * 1000 / args.batch_size:.0f}"
+        print(f"{name:<20}{num_views:>6}{naive_ms:>14}{batched * 1000 / args.batch_size:>16.0f}"
+              f"{batched / baseline:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
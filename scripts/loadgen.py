@@ -0,0 +1,144 @@
+"""
+Load generator: drive /login, /analyze and /history of a running API at a fixed concurrency
+
+Registers --users accounts, then --concurrency clients loop over a weighted mix of
+endpoints for --duration seconds and the script reports throughput and latency
+percentiles per endpoint. Run the server with the stub analyzer to measure the API
+layer (FastAPI, auth, database, file I/O) without the models:
+
+Usage:
+    ANALYZER_BACKEND=stub STUB_CALL_MS=40 STUB_IMAGE_MS=25 uvicorn backend.main:app --workers 2
+    PYTHONPATH=. python scripts/loadgen.py --url http://localhost:8000 --concurrency 32 --duration 30
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+import cv2
+import httpx
+import numpy as np
+
+ENDPOINTS = ("login", "analyze", "history")
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split(":")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}'. Use one of {ENDPOINTS}.")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def make_images(path, count):
+    """
+    Upload payloads; distinct pixels give distinct content-addressed keys
+    """
+    if path:
+        with open(path, "rb") as f:
+            return [f.read()]
+    rng = np.random.default_rng(0)
+    base = cv2.GaussianBlur(rng.integers(0, 255, size=(512, 512), dtype=np.uint8), (9, 9), 0)
+    images = []
+    for i in range(count):
+        image = base.copy()
+        image[0, :4] = np.frombuffer(i.to_bytes(4, "little"), dtype=np.uint8)
+        images.append(cv2.imencode(".png", image)[1].tobytes())
+    return images
+
+
+async def setup_users(client, count, password):
+    run = uuid.uuid4().hex[:8]
+    users = []
+    for i in range(count):
+        email = f"loadgen-{run}-{i}@example.com"
+        response = await client.post("/api/register", json={"email": email, "username": f"loadgen-{run}-{i}",
+                                                             "password": password})
+        response.raise_for_status()
+        token = (await login(client, email, password)).json()["access_token"]
+        users.append({"email": email, "headers": {"Authorization": f"Bearer {token}"}, "etag": None})
+    return users
+
+
+async def login(client, email, password):
+    return await client.post("/api/login", data={"username": email, "password": password})
+
+
+async def request(client, endpoint, user, args, images, rng):
+    if endpoint == "login":
+        return await login(client, user["email"], args.password)
+    if endpoint == "analyze":
+        files = {"file": ("xray.png", rng.choice(images), "image/png")}
+        return await client.post("/api/predictions/analyze", files=files, data={"priority": args.priority},
+                                 headers=user["headers"])
+    headers = dict(user["headers"])
+    if args.conditional and user["etag"]:
+        headers["If-None-Match"] = user["etag"]
+    response = await client.get("/api/predictions/history", headers=headers)
+    user["etag"] = response.headers.get("etag", user["etag"])
+    return response
+
+
+async def client_loop(worker, client, users, mix, args, images, deadline, samples):
+    rng = random.Random(worker)
+    user = users[worker % len(users)]
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        endpoint = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await request(client, endpoint, user, args, images, rng)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        samples.append((endpoint, (time.perf_counter() - start) * 1000, ok))
+
+
+async def run(args):
+    mix = parse_mix(args.mix)
+    images = make_images(args.image, args.images)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        users = await setup_users(client, args.users, args.password)
+        samples = []
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*[
+            client_loop(worker, client, users, mix, args, images, deadline, samples)
+            for worker in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+    print(f"{args.concurrency} clients, {args.users} users, {elapsed:.1f}s, mix {args.mix}")
+    print(f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint in (*mix, "all"):
+        rows = [s for s in samples if endpoint in ("all", s[0])]
+        if not rows:
+            continue
+        latencies = [latency for _, latency, _ in rows]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        errors = sum(not ok for _, _, ok in rows)
+        print(f"{endpoint:<10}{len(rows):>10}{errors:>8}{len(rows) / elapsed:>9.1f}{p50:>9.1f}{p95:>9.1f}{p99:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load")
+    parser.add_argument("--users", type=int, default=8, help="Accounts the clients are spread over")
+    parser.add_argument("--mix", default="login:1,analyze:2,history:7", help="Endpoint weights")
+    parser.add_argument("--priority", default="routine", help="Priority of analyze requests")
+    parser.add_argument("--conditional", action="store_true", help="Poll history with If-None-Match")
+    parser.add_argument("--image", default=None, help="Upload this file (default: synthetic 512x512 PNGs)")
+    parser.add_argument("--images", type=int, default=64, help="Distinct synthetic uploads")
+    parser.add_argument("--password", default="loadgen-password")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Load test: does a burst of logins slow down concurrent analyze requests?
+
+Runs against the in-process ASGI app by default, or a live server with --base-url.
+Measures /api/predictions/analyze latency on its own, then again while a burst
+of concurrent /api/login calls is in flight, and prints p50/p95 for both.
+
+Usage:
+    PYTHONPATH=. python scripts/loadtest_login_burst.py --logins 32 --analyze 10
+    python scripts/loadtest_login_burst.py --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import io
+import time
+import uuid
+
+import httpx
+import numpy as np
+from PIL import Image
+
+
+def make_sample_png():
+    """Create a synthetic grayscale chest-film-sized PNG in memory"""
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 255, size=(512, 512), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).convert("RGB").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+async def timed_analyze(client, token, image_bytes):
+    start = time.perf_counter()
+    response = await client.post(
+        "/api/predictions/analyze",
+        headers={"Authorization": f"Bearer {token}"},
+        files={"file": ("sample.png", image_bytes, "image/png")},
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def login(client, email, password):
+    response = await client.post("/api/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run(args):
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=600)
+    else:
+        from backend.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=600)
+
+    async with client:
+        suffix = uuid.uuid4().hex[:8]
+        email, password = f"loadtest-{suffix}@example.com", "loadtest-password"
+        response = await client.post(
+            "/api/register",
+            json={"email": email, "username": f"loadtest-{suffix}", "password": password},
+        )
+        response.raise_for_status()
+        token = await login(client, email, password)
+        image_bytes = make_sample_png()
+
+        # Warm up the model path once so the first request doesn't skew numbers
+        await timed_analyze(client, token, image_bytes)
+
+        baseline = [await timed_analyze(client, token, image_bytes) for _ in range(args.analyze)]
+
+        async def analyze_loop():
+            return [await timed_analyze(client, token, image_bytes) for _ in range(args.analyze)]
+
+        burst_start = time.perf_counter()
+        logins = [login(client, email, password) for _ in range(args.logins)]
+        results = await asyncio.gather(analyze_loop(), *logins)
+        burst_elapsed = time.perf_counter() - burst_start
+        under_burst = results[0]
+
+    print(f"Analyze latency, idle:        p50={percentile(baseline, 50) * 1000:8.1f} ms  "
+          f"p95={percentile(baseline, 95) * 1000:8.1f} ms")
+    print(f"Analyze latency, login burst: p50={percentile(under_burst, 50) * 1000:8.1f} ms  "
+          f"p95={percentile(under_burst, 95) * 1000:8.1f} ms")
+    print(f"{args.logins} logins completed in {burst_elapsed:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="Target a running server instead of the in-process app")
+    parser.add_argument("--logins", type=int, default=32, help="Concurrent logins in the burst")
+    parser.add_argument("--analyze", type=int, default=10, help="Sequential analyze requests per phase")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()